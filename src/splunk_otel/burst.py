@@ -0,0 +1,213 @@
+# Copyright Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+On-demand burst profiling.
+
+A burst samples all threads at a high frequency for a limited time and then stops, without restarting the process.
+It is triggered with the signal named by SPLUNK_PROFILER_BURST_SIGNAL, or by writing a command to the Unix domain
+socket at SPLUNK_PROFILER_BURST_SOCKET:
+
+    echo "profile 30 5" | socat - UNIX-CONNECT:/tmp/splunk-otel-burst.sock
+
+which profiles for 30 seconds every 5 milliseconds. Both numbers are optional and default to
+SPLUNK_PROFILER_BURST_DURATION and SPLUNK_PROFILER_BURST_INTERVAL.
+"""
+
+import atexit
+import contextlib
+import errno
+import logging
+import os
+import queue
+import socket
+import stat
+import threading
+
+from opentelemetry.sdk.environment_variables import OTEL_SERVICE_NAME
+
+from splunk_otel.env import (
+    SPLUNK_PROFILER_BURST_DURATION,
+    SPLUNK_PROFILER_BURST_INTERVAL,
+    SPLUNK_PROFILER_BURST_SIGNAL,
+    SPLUNK_PROFILER_BURST_SOCKET,
+    Env,
+)
+from splunk_otel.profile import ProfilingContext, _install_signal_handler
+
+_DEFAULT_DURATION_SECONDS = 30
+_DEFAULT_INTERVAL_MILLIS = 5
+_MAX_DURATION_SECONDS = 600
+_MIN_INTERVAL_MILLIS = 1
+_COMMAND = "profile"
+_MAX_COMMAND_BYTES = 1024
+_CONNECTION_TIMEOUT_SECONDS = 5
+
+_pylogger = logging.getLogger(__name__)
+
+
+class _BurstProfiler:
+    """
+    Owns a profiler that is paused outside of bursts. Requests are queued and applied on a control thread, since
+    they may come from a signal handler.
+    """
+
+    def __init__(self, service_name: str, duration_seconds: float, interval_millis: int, mk_profiling_context=None):
+        self._service_name = service_name
+        self._default_duration_seconds = duration_seconds
+        self._default_interval_millis = interval_millis
+        self._mk_profiling_context = mk_profiling_context or ProfilingContext
+        self._profiling_context = None
+        # SimpleQueue.put() is reentrant, so it is safe to call from a signal handler
+        self._requests: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._requests.put(None)
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def request(self, duration_seconds: float | None = None, interval_millis: int | None = None) -> tuple[float, int]:
+        duration_seconds = min(
+            _MAX_DURATION_SECONDS, self._default_duration_seconds if duration_seconds is None else duration_seconds
+        )
+        interval_millis = max(
+            _MIN_INTERVAL_MILLIS, self._default_interval_millis if interval_millis is None else interval_millis
+        )
+        self._requests.put((duration_seconds, interval_millis))
+        return duration_seconds, interval_millis
+
+    def _loop(self):
+        while True:
+            request = self._requests.get()
+            if request is None:
+                break
+            self._burst(*request)
+        if self._profiling_context is not None:
+            # takes a last sample if a burst is in progress and exports what the burst collected
+            self._profiling_context.shutdown()
+
+    def _burst(self, duration_seconds: float, interval_millis: int):
+        _pylogger.info("Profiling every %d ms for %s seconds", interval_millis, duration_seconds)
+        if self._profiling_context is None:
+            self._profiling_context = self._mk_profiling_context(self._service_name, interval_millis)
+        else:
+            # a request during a burst replaces its rate and restarts its duration
+            self._profiling_context.set_interval(interval_millis)
+        self._profiling_context.start()
+        self._profiling_context.pause_after(duration_seconds)
+
+
+def _parse_command(command: str) -> tuple[float | None, int | None]:
+    """
+    Parses "profile [<duration seconds> [<interval millis>]]", raising ValueError if the command is malformed.
+    """
+    parts = command.split()
+    if not parts or parts[0] != _COMMAND or len(parts) > 3:  # noqa PLR2004
+        raise ValueError(command)
+    duration_seconds = float(parts[1]) if len(parts) > 1 else None
+    interval_millis = int(parts[2]) if len(parts) > 2 else None  # noqa PLR2004
+    if (duration_seconds is not None and duration_seconds <= 0) or (
+        interval_millis is not None and interval_millis <= 0
+    ):
+        raise ValueError(command)
+    return duration_seconds, interval_millis
+
+
+class _ControlSocket:
+    def __init__(self, path: str, burst_profiler: _BurstProfiler):
+        self._path = path
+        self._burst_profiler = burst_profiler
+        try:
+            mode = os.lstat(path).st_mode
+        except FileNotFoundError:
+            pass
+        else:
+            # a socket is left over from a previous process, anything else at the path is not ours to remove
+            if not stat.S_ISSOCK(mode):
+                raise FileExistsError(errno.EEXIST, "Not a socket", path)
+            os.unlink(path)
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._socket.bind(path)
+        os.chmod(path, 0o600)
+        self._socket.listen()
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def close(self):
+        self._socket.close()
+        with contextlib.suppress(OSError):
+            os.unlink(self._path)
+
+    def _serve(self):
+        while True:
+            try:
+                connection, _ = self._socket.accept()
+            except OSError:
+                return  # closed
+            with connection:
+                connection.settimeout(_CONNECTION_TIMEOUT_SECONDS)
+                try:
+                    connection.sendall(self._handle(connection.recv(_MAX_COMMAND_BYTES)).encode())
+                except OSError:
+                    _pylogger.debug("Burst control connection failed", exc_info=True)
+
+    def _handle(self, data: bytes) -> str:
+        try:
+            duration_seconds, interval_millis = _parse_command(data.decode(errors="replace"))
+        except ValueError:
+            return f"error: expected '{_COMMAND} [<duration seconds> [<interval millis>]]'\n"
+        duration_seconds, interval_millis = self._burst_profiler.request(duration_seconds, interval_millis)
+        return f"ok: profiling every {interval_millis} ms for {duration_seconds:g} seconds\n"
+
+
+def _start_burst_profiling_if_enabled(env=None):
+    env = env or Env()
+    if env.getval(SPLUNK_PROFILER_BURST_SIGNAL).strip() or env.getval(SPLUNK_PROFILER_BURST_SOCKET).strip():
+        start_burst_profiling(env)
+
+
+def start_burst_profiling(env=None) -> _BurstProfiler:
+    env = env or Env()
+    burst_profiler = _BurstProfiler(
+        env.getval(OTEL_SERVICE_NAME),
+        env.getfloat(SPLUNK_PROFILER_BURST_DURATION, _DEFAULT_DURATION_SECONDS),
+        env.getint(SPLUNK_PROFILER_BURST_INTERVAL, _DEFAULT_INTERVAL_MILLIS),
+    )
+    burst_profiler.start()
+    atexit.register(burst_profiler.stop)
+
+    signal_name = env.getval(SPLUNK_PROFILER_BURST_SIGNAL).strip()
+    if signal_name:
+        _install_signal_handler(signal_name, burst_profiler.request)
+
+    socket_path = env.getval(SPLUNK_PROFILER_BURST_SOCKET).strip()
+    if socket_path:
+        if not hasattr(socket, "AF_UNIX"):
+            _pylogger.warning("Unix domain sockets are not available on this platform")
+        else:
+            try:
+                control_socket = _ControlSocket(socket_path, burst_profiler)
+            except OSError:
+                _pylogger.warning("Could not listen on %s", socket_path, exc_info=True)
+            else:
+                control_socket.start()
+                atexit.register(control_socket.close)
+
+    return burst_profiler
@@ -1,17 +1,84 @@
+import atexit
+import logging
+
 from opentelemetry import trace
 from opentelemetry.sdk.environment_variables import OTEL_SERVICE_NAME
 
-from splunk_otel.callgraphs.span_processor import CallgraphsSpanProcessor
+from splunk_otel.callgraphs.span_processor import (
+    _DEFAULT_BUNDLE_TIMEOUT_MILLIS,
+    _DEFAULT_LATENCY_THRESHOLD_MILLIS,
+    _DEFAULT_MAX_BUFFERED_SAMPLES,
+    _MODE_SAMPLING,
+    _MODE_TRACING,
+    _TRIGGER_LATENCY,
+    _TRIGGER_SELECTION,
+    CallgraphsSpanProcessor,
+)
 from splunk_otel.env import (
     Env,
+    SPLUNK_SNAPSHOT_BUNDLE_ENABLED,
+    SPLUNK_SNAPSHOT_BUNDLE_TIMEOUT,
+    SPLUNK_SNAPSHOT_LATENCY_THRESHOLD,
+    SPLUNK_SNAPSHOT_MAX_CONCURRENT_TRACES,
+    SPLUNK_SNAPSHOT_MAX_SAMPLES_PER_TRACE,
+    SPLUNK_SNAPSHOT_PROFILER_MODE,
     SPLUNK_SNAPSHOT_PROFILER_ENABLED,
+    SPLUNK_SNAPSHOT_PROFILER_TRIGGER,
     SPLUNK_SNAPSHOT_SAMPLING_INTERVAL,
 )
 
+_pylogger = logging.getLogger(__name__)
+
+# the processor added by _configure_callgraphs_if_enabled(), kept so it can be reconfigured at runtime
+_processor: CallgraphsSpanProcessor | None = None
+
 
 def _configure_callgraphs_if_enabled(env=None):
+    global _processor  # noqa PLW0603
     env = env or Env()
     if env.is_true(SPLUNK_SNAPSHOT_PROFILER_ENABLED):
-        trace.get_tracer_provider().add_span_processor(
-            CallgraphsSpanProcessor(env.getval(OTEL_SERVICE_NAME), env.getint(SPLUNK_SNAPSHOT_SAMPLING_INTERVAL, 10))
+        processor = CallgraphsSpanProcessor(
+            env.getval(OTEL_SERVICE_NAME),
+            env.getint(SPLUNK_SNAPSHOT_SAMPLING_INTERVAL, 10),
+            trigger=_get_trigger(env),
+            latency_threshold_millis=env.getint(SPLUNK_SNAPSHOT_LATENCY_THRESHOLD, _DEFAULT_LATENCY_THRESHOLD_MILLIS),
+            max_buffered_samples=env.getint(SPLUNK_SNAPSHOT_MAX_SAMPLES_PER_TRACE, _DEFAULT_MAX_BUFFERED_SAMPLES),
+            max_concurrent_traces=env.getint(SPLUNK_SNAPSHOT_MAX_CONCURRENT_TRACES, 0),
+            bundle_traces=env.is_true(SPLUNK_SNAPSHOT_BUNDLE_ENABLED),
+            bundle_timeout_millis=env.getint(SPLUNK_SNAPSHOT_BUNDLE_TIMEOUT, _DEFAULT_BUNDLE_TIMEOUT_MILLIS),
+            mode=_get_mode(env),
         )
+        trace.get_tracer_provider().add_span_processor(processor)
+        # the tracer provider shuts down after the logger provider at exit, which would drop the final profile
+        atexit.register(processor.shutdown)
+        _processor = processor
+
+
+def _reconfigure_callgraphs(env=None):
+    """
+    Applies the current SPLUNK_SNAPSHOT_PROFILER_ENABLED and SPLUNK_SNAPSHOT_SAMPLING_INTERVAL values to the snapshot
+    profiler, adding it to the tracer provider if it was never added. The selection probability lives in the
+    propagator, see SplunkDistro.set_callgraphs_propagator.
+    """
+    env = env or Env()
+    if _processor is None:
+        _configure_callgraphs_if_enabled(env)
+        return
+    _processor.set_enabled(env.is_true(SPLUNK_SNAPSHOT_PROFILER_ENABLED))
+    _processor.set_sampling_interval(env.getint(SPLUNK_SNAPSHOT_SAMPLING_INTERVAL, 10))
+
+
+def _get_trigger(env):
+    trigger = env.getval(SPLUNK_SNAPSHOT_PROFILER_TRIGGER, _TRIGGER_SELECTION).strip().lower()
+    if trigger not in {_TRIGGER_SELECTION, _TRIGGER_LATENCY}:
+        _pylogger.warning("Invalid value of '%s' for env var '%s'", trigger, SPLUNK_SNAPSHOT_PROFILER_TRIGGER)
+        return _TRIGGER_SELECTION
+    return trigger
+
+
+def _get_mode(env):
+    mode = env.getval(SPLUNK_SNAPSHOT_PROFILER_MODE, _MODE_SAMPLING).strip().lower()
+    if mode not in {_MODE_SAMPLING, _MODE_TRACING}:
+        _pylogger.warning("Invalid value of '%s' for env var '%s'", mode, SPLUNK_SNAPSHOT_PROFILER_MODE)
+        return _MODE_SAMPLING
+    return mode
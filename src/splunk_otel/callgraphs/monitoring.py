@@ -0,0 +1,251 @@
+# Copyright Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import sys
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Collection, Container
+
+from splunk_otel import profile_pb2
+from splunk_otel.profile import _get_location, _StringTable, _thread_states
+
+_TOOL_NAME = "splunk-otel-callgraphs"
+# PROFILER_ID first, then the ids CPython leaves unassigned
+_TOOL_IDS = (2, 3, 4)
+
+_pylogger = logging.getLogger(__name__)
+
+
+def _is_supported() -> bool:
+    return hasattr(sys, "monitoring")
+
+
+class _CallNode:
+    __slots__ = ("calls", "children", "code", "self_nanos")
+
+    def __init__(self, code=None):
+        self.code = code
+        self.children: dict = {}
+        self.calls = 0
+        self.self_nanos = 0
+
+    def child(self, code) -> "_CallNode":
+        node = self.children.get(code)
+        if node is None:
+            node = _CallNode(code)
+            self.children[code] = node
+        return node
+
+    def merge(self, other: "_CallNode"):
+        self.calls += other.calls
+        self.self_nanos += other.self_nanos
+        for code, other_child in other.children.items():
+            self.child(code).merge(other_child)
+
+
+class _ThreadCallState:
+    __slots__ = ("root", "stack", "trace_id")
+
+    def __init__(self, trace_id: int, root: _CallNode):
+        self.trace_id = trace_id
+        self.root = root
+        # [node, start_nanos, child_nanos] for every open Python frame entered while serving the trace
+        self.stack: list[list] = []
+
+
+class _CallTreeRecorder:
+    """
+    Builds an exact call tree with call counts and self wall time for each selected trace using PEP 669
+    `sys.monitoring` (Python 3.12+).
+
+    `sys.monitoring` events can't be enabled for a single thread, so events are enabled for the whole interpreter
+    while at least one selected trace is in progress and the callbacks return immediately on threads that are not
+    serving one of those traces. A thread's open frames are dropped as soon as it stops serving the trace they were
+    entered for. Time spent in C functions is counted as self time of the calling Python function, and a generator or
+    coroutine counts one call however often it is resumed.
+    """
+
+    def __init__(self, thread_states=_thread_states, time_func=time.perf_counter_ns):
+        self._thread_states = thread_states
+        self._time = time_func
+        self._active_trace_ids: Container[int] = frozenset()
+        self._local = threading.local()
+        # per-thread trees of each trace, merged when the trace ends so callbacks never share nodes across threads
+        self._trees: dict[int, list[_CallNode]] = {}
+        self._lock = threading.Lock()
+        self._tool_id = None
+        self._events_enabled = False
+
+    def register(self) -> bool:
+        monitoring = sys.monitoring
+        for tool_id in _TOOL_IDS:
+            if monitoring.get_tool(tool_id) is None:
+                monitoring.use_tool_id(tool_id, _TOOL_NAME)
+                self._tool_id = tool_id
+                break
+        else:
+            _pylogger.warning("No free sys.monitoring tool id, call graphs fall back to sampling")
+            return False
+
+        events = monitoring.events
+        monitoring.register_callback(self._tool_id, events.PY_START, self.on_call)
+        monitoring.register_callback(self._tool_id, events.PY_RESUME, self.on_call)
+        monitoring.register_callback(self._tool_id, events.PY_RETURN, self.on_return)
+        monitoring.register_callback(self._tool_id, events.PY_YIELD, self.on_yield)
+        monitoring.register_callback(self._tool_id, events.PY_UNWIND, self.on_return)
+        return True
+
+    def unregister(self):
+        if self._tool_id is None:
+            return
+        sys.monitoring.set_events(self._tool_id, 0)
+        sys.monitoring.free_tool_id(self._tool_id)
+        self._tool_id = None
+        self._events_enabled = False
+
+    def set_active_traces(self, trace_ids: Collection[int]):
+        """
+        Records calls on threads serving one of `trace_ids`. The callbacks only test it for membership, so the caller
+        may keep updating it in place and calls this again when it becomes empty or non-empty.
+        """
+        self._active_trace_ids = trace_ids
+        if self._tool_id is None:
+            return
+        enable = bool(trace_ids)
+        if enable != self._events_enabled:
+            events = sys.monitoring.events
+            mask = events.PY_START | events.PY_RESUME | events.PY_RETURN | events.PY_YIELD | events.PY_UNWIND
+            sys.monitoring.set_events(self._tool_id, mask if enable else 0)
+            self._events_enabled = enable
+
+    def pop_tree(self, trace_id: int) -> _CallNode | None:
+        with self._lock:
+            trees = self._trees.pop(trace_id, None)
+        if not trees:
+            return None
+        root = _CallNode()
+        for tree in trees:
+            root.merge(tree)
+        return root
+
+    def on_call(self, code, _offset):
+        trace_context = self._thread_states.get(threading.get_ident())
+        if trace_context is None or trace_context[0] not in self._active_trace_ids:
+            if getattr(self._local, "state", None) is not None:
+                self._local.state = None
+            return
+
+        trace_id = trace_context[0]
+        state = getattr(self._local, "state", None)
+        if state is None or state.trace_id != trace_id:
+            state = self._begin(trace_id)
+
+        parent = state.stack[-1][0] if state.stack else state.root
+        state.stack.append([parent.child(code), self._time(), 0])
+
+    def on_return(self, code, _offset, _retval):
+        self._leave(code, 1)
+
+    def on_yield(self, code, _offset, _retval):
+        # the frame is suspended, not finished: its time so far counts but the call is counted when it returns
+        self._leave(code, 0)
+
+    def _leave(self, code, calls: int):
+        state = getattr(self._local, "state", None)
+        if state is None or not state.stack:
+            return
+
+        trace_context = self._thread_states.get(threading.get_ident())
+        if trace_context is None or trace_context[0] != state.trace_id or state.trace_id not in self._active_trace_ids:
+            # the trace ended or the thread moved on while frames entered for it were still open
+            self._local.state = None
+            return
+
+        node, start_nanos, child_nanos = state.stack[-1]
+        if node.code is not code:
+            # returning from a frame entered before the trace reached this thread
+            return
+        state.stack.pop()
+
+        elapsed = self._time() - start_nanos
+        node.calls += calls
+        node.self_nanos += elapsed - child_nanos
+        if state.stack:
+            state.stack[-1][2] += elapsed
+
+    def _begin(self, trace_id: int) -> _ThreadCallState:
+        root = _CallNode()
+        with self._lock:
+            self._trees.setdefault(trace_id, []).append(root)
+        state = _ThreadCallState(trace_id, root)
+        self._local.state = state
+        return state
+
+
+def _frame_of(code):
+    return (code.co_filename, getattr(code, "co_qualname", code.co_name), code.co_firstlineno)
+
+
+def _call_tree_to_profile(root: _CallNode, trace_id: int, time_seconds: float):
+    """
+    Returns a pprof profile with one sample per call path, valued with its call count and self wall time in
+    nanoseconds, and the number of frames across all samples. Inclusive time is the sum over the call paths a path is
+    a prefix of, which is how pprof tools aggregate it.
+    """
+    str_table = _StringTable()
+    str_table.index("")
+    locations_table = OrderedDict()
+    functions_table = OrderedDict()
+
+    pb_profile = profile_pb2.Profile()
+    for value_type, unit in (("calls", "count"), ("wall", "nanoseconds")):
+        sample_type = profile_pb2.ValueType()
+        sample_type.type = str_table.index(value_type)
+        sample_type.unit = str_table.index(unit)
+        pb_profile.sample_type.append(sample_type)
+    pb_profile.default_sample_type = str_table.index("wall")
+    pb_profile.time_nanos = int(time_seconds * 1e9)
+
+    trace_id_label = profile_pb2.Label()
+    trace_id_label.key = str_table.index("trace_id")
+    trace_id_label.str = str_table.index(f"{trace_id:016x}")
+
+    timestamp_label = profile_pb2.Label()
+    timestamp_label.key = str_table.index("source.event.time")
+    timestamp_label.num = int(time_seconds * 1e3)
+
+    total_frame_count = 0
+    pending = [(child, ()) for child in root.children.values()]
+    while pending:
+        node, parent_location_ids = pending.pop()
+        location = _get_location(functions_table, str_table, locations_table, _frame_of(node.code))
+        location_ids = (location.id, *parent_location_ids)
+
+        if node.calls or node.self_nanos:
+            sample = profile_pb2.Sample()
+            sample.location_id.extend(location_ids)
+            sample.value.extend([node.calls, node.self_nanos])
+            sample.label.extend([timestamp_label, trace_id_label])
+            pb_profile.sample.append(sample)
+            total_frame_count += len(location_ids)
+
+        pending.extend((child, location_ids) for child in node.children.values())
+
+    pb_profile.string_table.extend(str_table.keys())
+    pb_profile.function.extend(list(functions_table.values()))
+    pb_profile.location.extend(list(locations_table.values()))
+
+    return pb_profile, total_frame_count
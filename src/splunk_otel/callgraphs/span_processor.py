@@ -13,14 +13,31 @@
 # limitations under the License.
 
 
-from opentelemetry import baggage, trace
+from collections import deque
+from typing import Literal
+
+from opentelemetry import trace
 from opentelemetry.context import Context
 from opentelemetry.sdk.trace import ReadableSpan, Span, SpanProcessor
+from opentelemetry.trace import StatusCode
 
+from splunk_otel.callgraphs.monitoring import _call_tree_to_profile, _CallTreeRecorder, _is_supported
 from splunk_otel.profile import ProfilingContext
-from splunk_otel.propagator import _SPLUNK_TRACE_SNAPSHOT_VOLUME
+from splunk_otel.propagator import _get_snapshot_volume
 
+import logging
 import threading
+import time
+
+_TRIGGER_SELECTION = "selection"
+_TRIGGER_LATENCY = "latency"
+_DEFAULT_LATENCY_THRESHOLD_MILLIS = 1000
+_DEFAULT_MAX_BUFFERED_SAMPLES = 1000
+_DEFAULT_BUNDLE_TIMEOUT_MILLIS = 30000
+_MODE_SAMPLING = "sampling"
+_MODE_TRACING = "tracing"
+
+_pylogger = logging.getLogger(__name__)
 
 
 def _should_process_context(context: Context | None) -> bool:
@@ -31,58 +48,217 @@ def _should_process_context(context: Context | None) -> bool:
     return is_root_span or parent_span.is_remote
 
 
+def _is_slow_or_failed(span: ReadableSpan, latency_threshold_nanos: int) -> bool:
+    if span.status.status_code is StatusCode.ERROR:
+        return True
+    if span.start_time is None or span.end_time is None:
+        return False
+    return span.end_time - span.start_time >= latency_threshold_nanos
+
+
+class _TraceSamples:
+    def __init__(self, maxlen: int | None = None):
+        self.samples = deque(maxlen=maxlen)
+        self.started_at = time.monotonic()
+
+
 class CallgraphsSpanProcessor(SpanProcessor):
-    def __init__(self, service_name: str, sampling_interval: int | None = 10):
+    """
+    With the default "selection" trigger, profiles local root spans of traces selected by CallgraphsPropagator
+    and emits samples as they are collected. With `bundle_traces`, samples are instead accumulated per trace and
+    emitted as one profile once the last local root span of the trace in this process ends, or earlier if the trace
+    reaches `max_buffered_samples` or has been buffering for `bundle_timeout_millis`.
+
+    With the "tracing" mode (Python 3.12+, "selection" trigger only), selected traces are not sampled; instead
+    `sys.monitoring` records every Python call made while serving them and an exact call tree is emitted when the
+    last local root span of the trace in this process ends.
+
+    With the "latency" trigger, keeps a rolling buffer of the most recent samples for every in-flight local root span
+    and only emits it if the span ends in error or takes at least `latency_threshold_millis`.
+    """
+
+    def __init__(
+        self,
+        service_name: str,
+        sampling_interval: int | None = 10,
+        trigger: Literal["selection", "latency"] = _TRIGGER_SELECTION,
+        latency_threshold_millis: int = _DEFAULT_LATENCY_THRESHOLD_MILLIS,
+        max_buffered_samples: int = _DEFAULT_MAX_BUFFERED_SAMPLES,
+        max_concurrent_traces: int = 0,
+        bundle_traces: bool = False,  # noqa FBT001 FBT002
+        bundle_timeout_millis: int = _DEFAULT_BUNDLE_TIMEOUT_MILLIS,
+        mode: Literal["sampling", "tracing"] = _MODE_SAMPLING,
+    ):
         self._span_id_to_trace_id: dict[int, int] = {}
+        # number of tracked local root spans per trace, only updated with _lock held; the sampler thread and the
+        # sys.monitoring callbacks only test it for membership, a single dict lookup, so they read it without _lock
+        self._trace_refcounts: dict[int, int] = {}
+        self._trace_id_to_samples: dict[int, _TraceSamples] = {}
+        self._trigger = trigger
+        self._bundle_traces = bundle_traces and trigger == _TRIGGER_SELECTION
+        self._bundle_timeout_seconds = bundle_timeout_millis / 1e3
+        self._latency_threshold_nanos = latency_threshold_millis * 1_000_000
+        self._max_buffered_samples = max_buffered_samples
+        self._max_concurrent_traces = max_concurrent_traces
         self._lock = threading.Lock()
         self._profiler = ProfilingContext(
-            service_name, sampling_interval, self._filter_stacktraces, instrumentation_source="snapshot"
+            service_name,
+            sampling_interval,
+            self._filter_stacktraces,
+            instrumentation_source="snapshot",
+            on_flush=self._flush_bundles,
         )
+        self._call_tree = self._mk_call_tree_recorder() if mode == _MODE_TRACING else None
+        self._enabled = True
+        self._shutdown = False
+
+    def _mk_call_tree_recorder(self) -> _CallTreeRecorder | None:
+        if self._trigger != _TRIGGER_SELECTION:
+            _pylogger.warning("Call graph tracing mode requires the selection trigger, falling back to sampling")
+            return None
+        if not _is_supported():
+            _pylogger.warning("Call graph tracing mode requires Python 3.12 or newer, falling back to sampling")
+            return None
+        recorder = _CallTreeRecorder()
+        return recorder if recorder.register() else None
+
+    def set_enabled(self, enabled: bool) -> None:  # noqa FBT001
+        """
+        Stops or resumes profiling new local root spans; traces that are already being profiled are not affected.
+        """
+        self._enabled = enabled
+
+    def set_sampling_interval(self, sampling_interval: int) -> None:
+        self._profiler.set_interval(sampling_interval)
 
     def on_start(self, span: Span, parent_context: Context | None = None) -> None:
-        if not _should_process_context(parent_context):
+        if self._shutdown or not self._enabled or not _should_process_context(parent_context):
+            return
+
+        if self._trigger == _TRIGGER_LATENCY:
+            self._track(span)
             return
 
-        ctx_baggage = baggage.get_baggage(_SPLUNK_TRACE_SNAPSHOT_VOLUME, parent_context)
+        volume = _get_snapshot_volume(parent_context)
 
-        if ctx_baggage is None:
+        if volume is None:
             return
 
-        if ctx_baggage == "highest":
+        if volume == "highest" and self._track(span):
             span.set_attribute("splunk.snapshot.profiling", True)
 
-            span_ctx = span.get_span_context()
+    def _track(self, span: Span) -> bool:
+        span_ctx = span.get_span_context()
 
-            if span_ctx is None:
-                return
+        if span_ctx is None:
+            return False
 
-            with self._lock:
-                self._span_id_to_trace_id[span_ctx.span_id] = span_ctx.trace_id
+        trace_id = span_ctx.trace_id
+        with self._lock:
+            refcount = self._trace_refcounts.get(trace_id, 0)
+            if refcount == 0 and 0 < self._max_concurrent_traces <= len(self._trace_refcounts):
+                return False
+            self._span_id_to_trace_id[span_ctx.span_id] = trace_id
+            self._trace_refcounts[trace_id] = refcount + 1
+            if refcount == 0:
+                if self._call_tree is not None:
+                    self._call_tree.set_active_traces(self._trace_refcounts)
+                if self._buffers_samples():
+                    self._trace_id_to_samples[trace_id] = self._new_trace_samples()
+        if self._call_tree is None:
             self._profiler.start()
+        return True
 
     def on_end(self, span: ReadableSpan) -> None:
-        span_id = span.get_span_context().span_id
-        trace_id = self._span_id_to_trace_id.get(span_id)
-
-        if trace_id is None:
+        if self._shutdown:
             return
 
+        span_id = span.get_span_context().span_id
+
+        samples = None
         with self._lock:
-            self._span_id_to_trace_id.pop(span_id, None)
+            trace_id = self._span_id_to_trace_id.pop(span_id, None)
 
-            if len(self._span_id_to_trace_id) == 0:
+            if trace_id is None:
+                return
+
+            refcount = self._trace_refcounts.pop(trace_id) - 1
+            trace_ended = refcount == 0
+            if trace_ended:
+                if self._call_tree is not None:
+                    self._call_tree.set_active_traces(self._trace_refcounts)
+            else:
+                self._trace_refcounts[trace_id] = refcount
+
+            if self._trigger == _TRIGGER_LATENCY:
+                # the buffer is shared by the trace's local root spans, other ones may still be in flight
+                if trace_ended:
+                    trace_samples = self._trace_id_to_samples.pop(trace_id, None)
+                else:
+                    trace_samples = self._trace_id_to_samples.get(trace_id)
+                if trace_samples is not None and _is_slow_or_failed(span, self._latency_threshold_nanos):
+                    samples = list(trace_samples.samples)
+                    # emitted samples are not emitted again if another root span of the trace is slow too
+                    trace_samples.samples.clear()
+            elif self._bundle_traces and trace_ended:
+                trace_samples = self._trace_id_to_samples.pop(trace_id, None)
+                if trace_samples is not None:
+                    samples = list(trace_samples.samples)
+
+            if not self._trace_refcounts:
                 self._profiler.pause_after(60.0)
 
+        if samples:
+            self._profiler.emit(samples)
+
+        if trace_ended and self._call_tree is not None:
+            self._emit_call_tree(trace_id)
+
+    def _emit_call_tree(self, trace_id: int):
+        root = self._call_tree.pop_tree(trace_id)
+        if root is None:
+            return
+        pb_profile, total_frame_count = _call_tree_to_profile(root, trace_id, time.time())
+        if total_frame_count:
+            self._profiler.emit_profile(pb_profile, total_frame_count)
+
     def shutdown(self) -> None:
-        self._profiler.stop()
+        # spans still start and end after shutdown, e.g. in other atexit hooks, and must not restart the profiler
+        self._shutdown = True
+        if self._call_tree is not None:
+            self._call_tree.unregister()
+        self._profiler.shutdown()
 
     def force_flush(self, timeout_millis: int = 30000) -> bool:
-        return True
+        return self._profiler.force_flush(timeout_millis)
+
+    def _flush_bundles(self):
+        # latency trigger buffers are left alone: whether they get emitted depends on how their span ends
+        if not self._bundle_traces:
+            return
+        with self._lock:
+            bundles = [list(trace_samples.samples) for trace_samples in self._trace_id_to_samples.values()]
+            for trace_id in self._trace_id_to_samples:
+                self._trace_id_to_samples[trace_id] = self._new_trace_samples()
+        for samples in bundles:
+            if samples:
+                self._profiler.emit(samples)
+
+    def _buffers_samples(self) -> bool:
+        return self._trigger == _TRIGGER_LATENCY or self._bundle_traces
+
+    def _new_trace_samples(self) -> _TraceSamples:
+        # the latency trigger keeps a rolling window, bundles are flushed when full instead
+        return _TraceSamples(self._max_buffered_samples if self._trigger == _TRIGGER_LATENCY else None)
 
     def _filter_stacktraces(self, stacktraces, active_trace_contexts):
+        if self._buffers_samples():
+            for samples in self._buffer_stacktraces(stacktraces, active_trace_contexts):
+                self._profiler.emit(samples)
+            return []
+
         filtered = []
-        with self._lock:
-            trace_ids = set(self._span_id_to_trace_id.values())
+        trace_ids = self._trace_refcounts
 
         for stacktrace in stacktraces:
             thread_id = stacktrace["tid"]
@@ -95,3 +271,39 @@ class CallgraphsSpanProcessor(SpanProcessor):
                     filtered.append(stacktrace)
 
         return filtered
+
+    def _buffer_stacktraces(self, stacktraces, active_trace_contexts):
+        """
+        Appends stacktraces to their trace's buffer and returns the bundles that are full or timed out.
+        """
+        time_seconds = time.time()
+        trace_ids = self._trace_refcounts
+        matched = []
+        for stacktrace in stacktraces:
+            maybe_context = active_trace_contexts.get(stacktrace["tid"])
+            if maybe_context is not None and maybe_context[0] in trace_ids:
+                matched.append((stacktrace, maybe_context))
+
+        # only bundles need the lock without new samples, to check their timeout
+        if not matched and not (self._bundle_traces and trace_ids):
+            return []
+
+        ready = []
+        with self._lock:
+            for stacktrace, maybe_context in matched:
+                trace_samples = self._trace_id_to_samples.get(maybe_context[0])
+                if trace_samples is not None:
+                    trace_samples.samples.append(
+                        {**stacktrace, "trace_context": maybe_context, "time_seconds": time_seconds}
+                    )
+
+            if self._bundle_traces:
+                now = time.monotonic()
+                for trace_id, trace_samples in list(self._trace_id_to_samples.items()):
+                    if len(trace_samples.samples) >= self._max_buffered_samples or (
+                        now - trace_samples.started_at >= self._bundle_timeout_seconds
+                    ):
+                        if trace_samples.samples:
+                            ready.append(list(trace_samples.samples))
+                        self._trace_id_to_samples[trace_id] = self._new_trace_samples()
+        return ready
@@ -13,13 +13,36 @@
 #  limitations under the License.
 
 from opentelemetry.sdk._configuration import _OTelSDKConfigurator
+from opentelemetry.sdk.trace.export import BatchSpanProcessor
 
 from splunk_otel.profile import _start_profiling_if_enabled
 from splunk_otel.callgraphs import _configure_callgraphs_if_enabled
+from splunk_otel.flight_recorder import _start_flight_recorder_if_enabled
+from splunk_otel.perf import _start_perf_map_if_enabled
+from splunk_otel.sidecar import _start_shared_context_if_enabled
+from splunk_otel.burst import _start_burst_profiling_if_enabled
+from splunk_otel.span_size import _get_export_span_processor as _get_span_size_processor
+from splunk_otel.tail_retention import _get_export_span_processor as _get_tail_retention_processor
+from splunk_otel.log_sampling import _get_export_log_record_processor
+from splunk_otel.log_handler import _close_async_logging_handler_at_exit
 
 
 class SplunkConfigurator(_OTelSDKConfigurator):
     def _configure(self, **kwargs):
+        # tail retention decides on untrimmed spans, and only the spans it keeps are measured and trimmed
+        span_size_processor = _get_span_size_processor()
+        export_span_processor = _get_tail_retention_processor(mk_delegate=span_size_processor or BatchSpanProcessor)
+        export_span_processor = export_span_processor or span_size_processor
+        if export_span_processor is not None:
+            kwargs.setdefault("export_span_processor", export_span_processor)
+        export_log_record_processor = _get_export_log_record_processor()
+        if export_log_record_processor is not None:
+            kwargs.setdefault("export_log_record_processor", export_log_record_processor)
         super()._configure(**kwargs)
+        _close_async_logging_handler_at_exit()
         _start_profiling_if_enabled()
         _configure_callgraphs_if_enabled()
+        _start_flight_recorder_if_enabled()
+        _start_perf_map_if_enabled()
+        _start_shared_context_if_enabled()
+        _start_burst_profiling_if_enabled()
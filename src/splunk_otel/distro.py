@@ -18,6 +18,11 @@ import re
 from opentelemetry.instrumentation.distro import BaseDistro
 from opentelemetry.instrumentation.environment_variables import OTEL_PYTHON_DISABLED_INSTRUMENTATIONS
 from opentelemetry.instrumentation.logging import LoggingInstrumentor
+from opentelemetry.instrumentation.logging.environment_variables import (
+    OTEL_PYTHON_LOG_AUTO_INSTRUMENTATION,
+    OTEL_PYTHON_LOG_CODE_ATTRIBUTES,
+    OTEL_PYTHON_LOG_HANDLER_LEVEL,
+)
 from opentelemetry.instrumentation.propagators import set_global_response_propagator
 from opentelemetry.propagators.composite import CompositePropagator
 from opentelemetry.sdk.environment_variables import (
@@ -32,18 +37,30 @@ from opentelemetry.sdk.environment_variables import (
 from opentelemetry.propagate import get_global_textmap, set_global_textmap
 
 from splunk_otel.__about__ import __version__ as version
+from splunk_otel.callgraphs import _TRIGGER_SELECTION, _get_trigger
 from splunk_otel.env import (
     DEFAULTS,
+    PERFORMANCE_PROFILES,
     SPLUNK_ACCESS_TOKEN,
+    SPLUNK_LOGS_ASYNC_HANDLER_ENABLED,
+    SPLUNK_PERFORMANCE_PROFILE,
     SPLUNK_PROFILER_ENABLED,
     SPLUNK_PROFILER_LOGS_ENDPOINT,
     SPLUNK_REALM,
     SPLUNK_SNAPSHOT_PROFILER_ENABLED,
+    SPLUNK_SNAPSHOT_SELECTION_CARRIER,
     SPLUNK_SNAPSHOT_SELECTION_PROBABILITY,
+    SPLUNK_SNAPSHOT_SELECTION_RATE_LIMIT,
     SPLUNK_TRACE_RESPONSE_HEADER_ENABLED,
     Env,
 )
-from splunk_otel.propagator import CallgraphsPropagator, ServerTimingResponsePropagator
+from splunk_otel.log_handler import install_async_logging_handler
+from splunk_otel.propagator import (
+    _CARRIER_BAGGAGE,
+    _CARRIERS,
+    CallgraphsPropagator,
+    ServerTimingResponsePropagator,
+)
 
 _DISTRO_NAME = "splunk-opentelemetry"
 
@@ -80,9 +97,20 @@ class SplunkDistro(BaseDistro):
         self.configure_logging()
 
     def set_env_defaults(self):
+        self.set_performance_profile_defaults()
         for key, value in DEFAULTS.items():
             self.env.setdefault(key, value)
 
+    def set_performance_profile_defaults(self):
+        name = self.env.getval(SPLUNK_PERFORMANCE_PROFILE).strip().lower()
+        if not name:
+            return
+        if name not in PERFORMANCE_PROFILES:
+            _pylogger.warning("Ignoring invalid %s value: %r", SPLUNK_PERFORMANCE_PROFILE, name)
+            return
+        for key, value in PERFORMANCE_PROFILES[name].items():
+            self.env.setdefault(key, value)
+
     def check_service_name(self):
         if not len(self.env.getval(OTEL_SERVICE_NAME)):
             _pylogger.warning(_NO_SERVICE_NAME_WARNING)
@@ -138,11 +166,25 @@ class SplunkDistro(BaseDistro):
         else:
             propagators = [current]
 
-        if self.env.is_true(SPLUNK_SNAPSHOT_PROFILER_ENABLED, "false"):
-            propagators.append(CallgraphsPropagator(self.env.getfloat(SPLUNK_SNAPSHOT_SELECTION_PROBABILITY, 0.01)))
+        # the latency trigger profiles every local root span, so there is no selection decision to propagate
+        if self.env.is_true(SPLUNK_SNAPSHOT_PROFILER_ENABLED, "false") and _get_trigger(self.env) == _TRIGGER_SELECTION:
+            propagators.append(
+                CallgraphsPropagator(
+                    self.env.getfloat(SPLUNK_SNAPSHOT_SELECTION_PROBABILITY, 0.01),
+                    self.env.getfloat(SPLUNK_SNAPSHOT_SELECTION_RATE_LIMIT, 0),
+                    self.get_snapshot_selection_carrier(),
+                )
+            )
 
         set_global_textmap(CompositePropagator(propagators))
 
+    def get_snapshot_selection_carrier(self):
+        carrier = self.env.getval(SPLUNK_SNAPSHOT_SELECTION_CARRIER).strip().lower() or _CARRIER_BAGGAGE
+        if carrier not in _CARRIERS:
+            _pylogger.warning("Ignoring invalid %s value: %r", SPLUNK_SNAPSHOT_SELECTION_CARRIER, carrier)
+            return _CARRIER_BAGGAGE
+        return carrier
+
     def configure_logging(self):
         # Previously, the SDK's LoggingHandler was enabled by setting
         # OTEL_PYTHON_LOGGING_AUTO_INSTRUMENTATION_ENABLED=true (our default). That handler
@@ -154,8 +196,29 @@ class SplunkDistro(BaseDistro):
         if self.is_instrumentation_disabled(_LOGGING_INSTRUMENTATION_NAME):
             return
 
+        if self.env.is_true(SPLUNK_LOGS_ASYNC_HANDLER_ENABLED, "false"):
+            # the instrumentation still sets up log correlation, but the handler is ours
+            LoggingInstrumentor().instrument(enable_log_auto_instrumentation=False)
+            if self.env.is_true(OTEL_PYTHON_LOG_AUTO_INSTRUMENTATION, "true"):
+                install_async_logging_handler(
+                    self.env,
+                    level=self.get_log_handler_level(),
+                    log_code_attributes=self.env.is_true(OTEL_PYTHON_LOG_CODE_ATTRIBUTES, "false"),
+                )
+            return
+
         LoggingInstrumentor().instrument()
 
+    def get_log_handler_level(self):
+        level_name = self.env.getval(OTEL_PYTHON_LOG_HANDLER_LEVEL).strip()
+        if not level_name:
+            return logging.NOTSET
+        level = logging.getLevelName(level_name.upper())
+        if not isinstance(level, int):
+            _pylogger.warning("Ignoring invalid %s value: %r", OTEL_PYTHON_LOG_HANDLER_LEVEL, level_name)
+            return logging.NOTSET
+        return level
+
     def is_instrumentation_disabled(self, instrumentation_name):
         disabled_instrumentations_env = self.env.getval(OTEL_PYTHON_DISABLED_INSTRUMENTATIONS)
         disabled_instrumentations = [name.strip() for name in disabled_instrumentations_env.split(",")]
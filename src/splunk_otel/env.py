@@ -18,8 +18,15 @@ from opentelemetry.environment_variables import OTEL_LOGS_EXPORTER, OTEL_METRICS
 from opentelemetry.sdk.environment_variables import (
     OTEL_ATTRIBUTE_COUNT_LIMIT,
     OTEL_ATTRIBUTE_VALUE_LENGTH_LIMIT,
+    OTEL_BLRP_MAX_EXPORT_BATCH_SIZE,
+    OTEL_BLRP_MAX_QUEUE_SIZE,
+    OTEL_BLRP_SCHEDULE_DELAY,
+    OTEL_BSP_MAX_EXPORT_BATCH_SIZE,
+    OTEL_BSP_MAX_QUEUE_SIZE,
+    OTEL_BSP_SCHEDULE_DELAY,
     OTEL_EVENT_ATTRIBUTE_COUNT_LIMIT,
     OTEL_EXPERIMENTAL_RESOURCE_DETECTORS,
+    OTEL_EXPORTER_OTLP_COMPRESSION,
     OTEL_LINK_ATTRIBUTE_COUNT_LIMIT,
     OTEL_SPAN_ATTRIBUTE_COUNT_LIMIT,
     OTEL_SPAN_EVENT_COUNT_LIMIT,
@@ -45,16 +52,113 @@ DEFAULTS = {
 SPLUNK_OTEL_SYSTEM_METRICS_ENABLED = "SPLUNK_OTEL_SYSTEM_METRICS_ENABLED"
 SPLUNK_ACCESS_TOKEN = "SPLUNK_ACCESS_TOKEN"  # noqa: S105
 SPLUNK_TRACE_RESPONSE_HEADER_ENABLED = "SPLUNK_TRACE_RESPONSE_HEADER_ENABLED"
+SPLUNK_TRACES_SAMPLER_RATE_LIMIT = "SPLUNK_TRACES_SAMPLER_RATE_LIMIT"
+SPLUNK_TRACES_SAMPLER_TARGET_RATE = "SPLUNK_TRACES_SAMPLER_TARGET_RATE"
+SPLUNK_TAIL_RETENTION_ENABLED = "SPLUNK_TAIL_RETENTION_ENABLED"
+SPLUNK_TAIL_RETENTION_LATENCY_THRESHOLD = "SPLUNK_TAIL_RETENTION_LATENCY_THRESHOLD"
+SPLUNK_TAIL_RETENTION_ATTRIBUTES = "SPLUNK_TAIL_RETENTION_ATTRIBUTES"
+SPLUNK_TAIL_RETENTION_KEEP_PROBABILITY = "SPLUNK_TAIL_RETENTION_KEEP_PROBABILITY"
+SPLUNK_TAIL_RETENTION_MAX_SPANS = "SPLUNK_TAIL_RETENTION_MAX_SPANS"
+SPLUNK_SPAN_MAX_BYTES = "SPLUNK_SPAN_MAX_BYTES"
+SPLUNK_SPAN_SIZE_METRICS_ENABLED = "SPLUNK_SPAN_SIZE_METRICS_ENABLED"
+SPLUNK_LOGS_ASYNC_HANDLER_ENABLED = "SPLUNK_LOGS_ASYNC_HANDLER_ENABLED"
+SPLUNK_LOGS_ASYNC_HANDLER_QUEUE_SIZE = "SPLUNK_LOGS_ASYNC_HANDLER_QUEUE_SIZE"
+SPLUNK_LOGS_SAMPLING_ENABLED = "SPLUNK_LOGS_SAMPLING_ENABLED"
+SPLUNK_LOGS_SAMPLING_MIN_SEVERITY = "SPLUNK_LOGS_SAMPLING_MIN_SEVERITY"
+SPLUNK_LOGS_SAMPLING_UNSAMPLED_PROBABILITY = "SPLUNK_LOGS_SAMPLING_UNSAMPLED_PROBABILITY"
+SPLUNK_LOGS_SAMPLING_UNCORRELATED_RATE_LIMIT = "SPLUNK_LOGS_SAMPLING_UNCORRELATED_RATE_LIMIT"
 SPLUNK_OPAMP_ENABLED = "SPLUNK_OPAMP_ENABLED"
 SPLUNK_OPAMP_ENDPOINT = "SPLUNK_OPAMP_ENDPOINT"
 SPLUNK_OPAMP_POLLING_INTERVAL = "SPLUNK_OPAMP_POLLING_INTERVAL"
 SPLUNK_PROFILER_ENABLED = "SPLUNK_PROFILER_ENABLED"
 SPLUNK_PROFILER_CALL_STACK_INTERVAL = "SPLUNK_PROFILER_CALL_STACK_INTERVAL"
 SPLUNK_PROFILER_LOGS_ENDPOINT = "SPLUNK_PROFILER_LOGS_ENDPOINT"
+SPLUNK_PROFILER_EXPORTER = "SPLUNK_PROFILER_EXPORTER"
+SPLUNK_PROFILER_HOT_FUNCTIONS_COUNT = "SPLUNK_PROFILER_HOT_FUNCTIONS_COUNT"
+SPLUNK_PROFILER_HOT_FUNCTIONS_HALF_LIFE = "SPLUNK_PROFILER_HOT_FUNCTIONS_HALF_LIFE"
+SPLUNK_PROFILER_PPROF_FILE_DIRECTORY = "SPLUNK_PROFILER_PPROF_FILE_DIRECTORY"
+SPLUNK_PROFILER_PPROF_FILE_MAX_SIZE = "SPLUNK_PROFILER_PPROF_FILE_MAX_SIZE"
+SPLUNK_PROFILER_PPROF_FILE_MAX_AGE = "SPLUNK_PROFILER_PPROF_FILE_MAX_AGE"
+SPLUNK_PROFILER_FLIGHT_RECORDER_ENABLED = "SPLUNK_PROFILER_FLIGHT_RECORDER_ENABLED"
+SPLUNK_PROFILER_FLIGHT_RECORDER_WINDOW = "SPLUNK_PROFILER_FLIGHT_RECORDER_WINDOW"
+SPLUNK_PROFILER_FLIGHT_RECORDER_INTERVAL = "SPLUNK_PROFILER_FLIGHT_RECORDER_INTERVAL"
+SPLUNK_PROFILER_FLIGHT_RECORDER_SPAN_THRESHOLD = "SPLUNK_PROFILER_FLIGHT_RECORDER_SPAN_THRESHOLD"
+SPLUNK_PROFILER_FLIGHT_RECORDER_SIGNAL = "SPLUNK_PROFILER_FLIGHT_RECORDER_SIGNAL"
+SPLUNK_PROFILER_PERF_MAP_ENABLED = "SPLUNK_PROFILER_PERF_MAP_ENABLED"
+SPLUNK_PROFILER_SHARED_CONTEXT_ENABLED = "SPLUNK_PROFILER_SHARED_CONTEXT_ENABLED"
+SPLUNK_PROFILER_BURST_SIGNAL = "SPLUNK_PROFILER_BURST_SIGNAL"
+SPLUNK_PROFILER_BURST_SOCKET = "SPLUNK_PROFILER_BURST_SOCKET"
+SPLUNK_PROFILER_BURST_DURATION = "SPLUNK_PROFILER_BURST_DURATION"
+SPLUNK_PROFILER_BURST_INTERVAL = "SPLUNK_PROFILER_BURST_INTERVAL"
+SPLUNK_PROFILER_SPAN_ATTRIBUTE_LABELS = "SPLUNK_PROFILER_SPAN_ATTRIBUTE_LABELS"
 SPLUNK_SNAPSHOT_PROFILER_ENABLED = "SPLUNK_SNAPSHOT_PROFILER_ENABLED"
 SPLUNK_SNAPSHOT_SAMPLING_INTERVAL = "SPLUNK_SNAPSHOT_SAMPLING_INTERVAL"
 SPLUNK_SNAPSHOT_SELECTION_PROBABILITY = "SPLUNK_SNAPSHOT_SELECTION_PROBABILITY"
+SPLUNK_SNAPSHOT_SELECTION_RATE_LIMIT = "SPLUNK_SNAPSHOT_SELECTION_RATE_LIMIT"
+SPLUNK_SNAPSHOT_MAX_CONCURRENT_TRACES = "SPLUNK_SNAPSHOT_MAX_CONCURRENT_TRACES"
+SPLUNK_SNAPSHOT_SELECTION_CARRIER = "SPLUNK_SNAPSHOT_SELECTION_CARRIER"
+SPLUNK_SNAPSHOT_PROFILER_TRIGGER = "SPLUNK_SNAPSHOT_PROFILER_TRIGGER"
+SPLUNK_SNAPSHOT_LATENCY_THRESHOLD = "SPLUNK_SNAPSHOT_LATENCY_THRESHOLD"
+SPLUNK_SNAPSHOT_BUNDLE_ENABLED = "SPLUNK_SNAPSHOT_BUNDLE_ENABLED"
+SPLUNK_SNAPSHOT_BUNDLE_TIMEOUT = "SPLUNK_SNAPSHOT_BUNDLE_TIMEOUT"
+SPLUNK_SNAPSHOT_MAX_SAMPLES_PER_TRACE = "SPLUNK_SNAPSHOT_MAX_SAMPLES_PER_TRACE"
+SPLUNK_SNAPSHOT_PROFILER_MODE = "SPLUNK_SNAPSHOT_PROFILER_MODE"
 SPLUNK_REALM = "SPLUNK_REALM"
+SPLUNK_PERFORMANCE_PROFILE = "SPLUNK_PERFORMANCE_PROFILE"
+
+# Defaults applied by SPLUNK_PERFORMANCE_PROFILE before DEFAULTS, so any variable set explicitly still wins
+PERFORMANCE_PROFILES = {
+    "low-overhead": {
+        OTEL_TRACES_SAMPLER: "splunk_throughput",
+        SPLUNK_TRACES_SAMPLER_TARGET_RATE: "10",
+        OTEL_BSP_MAX_QUEUE_SIZE: "1024",
+        OTEL_BSP_MAX_EXPORT_BATCH_SIZE: "512",
+        OTEL_BSP_SCHEDULE_DELAY: "10000",
+        OTEL_BLRP_MAX_QUEUE_SIZE: "1024",
+        OTEL_BLRP_MAX_EXPORT_BATCH_SIZE: "512",
+        OTEL_BLRP_SCHEDULE_DELAY: "10000",
+        OTEL_SPAN_ATTRIBUTE_COUNT_LIMIT: "64",
+        OTEL_SPAN_EVENT_COUNT_LIMIT: "32",
+        OTEL_SPAN_LINK_COUNT_LIMIT: "32",
+        OTEL_ATTRIBUTE_VALUE_LENGTH_LIMIT: "1024",
+        SPLUNK_PROFILER_CALL_STACK_INTERVAL: "5000",
+        SPLUNK_SNAPSHOT_SAMPLING_INTERVAL: "20",
+        OTEL_EXPORTER_OTLP_COMPRESSION: "gzip",
+    },
+    "balanced": {
+        OTEL_TRACES_SAMPLER: "splunk_throughput",
+        SPLUNK_TRACES_SAMPLER_TARGET_RATE: "100",
+        OTEL_BSP_MAX_QUEUE_SIZE: "2048",
+        OTEL_BSP_MAX_EXPORT_BATCH_SIZE: "512",
+        OTEL_BSP_SCHEDULE_DELAY: "5000",
+        OTEL_BLRP_MAX_QUEUE_SIZE: "2048",
+        OTEL_BLRP_MAX_EXPORT_BATCH_SIZE: "512",
+        OTEL_BLRP_SCHEDULE_DELAY: "5000",
+        OTEL_SPAN_ATTRIBUTE_COUNT_LIMIT: "128",
+        OTEL_SPAN_EVENT_COUNT_LIMIT: "128",
+        OTEL_SPAN_LINK_COUNT_LIMIT: "128",
+        OTEL_ATTRIBUTE_VALUE_LENGTH_LIMIT: "4096",
+        SPLUNK_PROFILER_CALL_STACK_INTERVAL: "1000",
+        SPLUNK_SNAPSHOT_SAMPLING_INTERVAL: "10",
+        OTEL_EXPORTER_OTLP_COMPRESSION: "gzip",
+    },
+    "high-fidelity": {
+        OTEL_TRACES_SAMPLER: "always_on",
+        OTEL_BSP_MAX_QUEUE_SIZE: "8192",
+        OTEL_BSP_MAX_EXPORT_BATCH_SIZE: "1024",
+        OTEL_BSP_SCHEDULE_DELAY: "1000",
+        OTEL_BLRP_MAX_QUEUE_SIZE: "8192",
+        OTEL_BLRP_MAX_EXPORT_BATCH_SIZE: "1024",
+        OTEL_BLRP_SCHEDULE_DELAY: "1000",
+        OTEL_SPAN_ATTRIBUTE_COUNT_LIMIT: "256",
+        OTEL_SPAN_EVENT_COUNT_LIMIT: "256",
+        OTEL_SPAN_LINK_COUNT_LIMIT: "1000",
+        OTEL_ATTRIBUTE_VALUE_LENGTH_LIMIT: "12000",
+        SPLUNK_PROFILER_CALL_STACK_INTERVAL: "100",
+        SPLUNK_SNAPSHOT_SAMPLING_INTERVAL: "5",
+        OTEL_EXPORTER_OTLP_COMPRESSION: "gzip",
+    },
+}
 
 _pylogger = logging.getLogger(__name__)
 
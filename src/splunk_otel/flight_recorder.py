@@ -0,0 +1,243 @@
+# Copyright Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import atexit
+import logging
+import math
+import sys
+import threading
+import time
+from collections import deque
+
+from opentelemetry import trace
+from opentelemetry._logs import get_logger
+from opentelemetry.sdk.environment_variables import OTEL_SERVICE_NAME
+from opentelemetry.sdk.trace import ReadableSpan, SpanProcessor
+
+from splunk_otel.env import (
+    SPLUNK_PROFILER_FLIGHT_RECORDER_ENABLED,
+    SPLUNK_PROFILER_FLIGHT_RECORDER_INTERVAL,
+    SPLUNK_PROFILER_FLIGHT_RECORDER_SIGNAL,
+    SPLUNK_PROFILER_FLIGHT_RECORDER_SPAN_THRESHOLD,
+    SPLUNK_PROFILER_FLIGHT_RECORDER_WINDOW,
+    SPLUNK_PROFILER_BURST_SIGNAL,
+    Env,
+)
+from splunk_otel.profile import (
+    _SCOPE_NAME,
+    _SCOPE_VERSION,
+    _collect_stacktraces,
+    _install_signal_handler,
+    _IntervalTimer,
+    _mk_resource,
+    _ProfileScraper,
+    _thread_states,
+    start_thread_context_tracking,
+)
+
+_DEFAULT_WINDOW_SECONDS = 30
+_DEFAULT_INTERVAL_MILLIS = 10
+# SIGUSR1/SIGUSR2 are taken by servers such as gunicorn and uWSGI and commonly used for burst profiling; SIGURG is
+# ignored by default, so sending it to a process without the flight recorder is harmless
+_DEFAULT_SIGNAL = "SIGURG"
+_MAX_INTERNED_STACKS = 10000
+
+_pylogger = logging.getLogger(__name__)
+
+
+class _FlightRecorder:
+    """
+    Samples all threads at a high frequency into a ring buffer covering the last `window_seconds`, without exporting
+    anything until a dump is requested. Each distinct stack is stored once and samples only reference it by id.
+    """
+
+    def __init__(
+        self,
+        scraper: _ProfileScraper,
+        interval_millis: int,
+        window_seconds: float,
+        collect_stacktraces_func=_collect_stacktraces,
+        time_func=time.time,
+    ):
+        self._scraper = scraper
+        self._collect_stacktraces = collect_stacktraces_func
+        self._time = time_func
+        self._samples = deque(maxlen=max(1, math.ceil(window_seconds * 1e3 / interval_millis)))
+        self._stacks: list[tuple] = []
+        self._stack_ids: dict[tuple, int] = {}
+        self._dump_reason = None
+        self._lock = threading.Lock()
+        self._timer = _IntervalTimer(interval_millis, self._tick)
+
+    def start(self):
+        self._timer.start()
+
+    def stop(self):
+        self._timer.stop()
+
+    def request_dump(self, reason: str):
+        # only sets a flag so it is safe to call from signal handlers and request threads; the dump itself happens
+        # on the recorder thread after the next sample
+        self._dump_reason = reason
+
+    def _tick(self):
+        self.record()
+        reason = self._dump_reason
+        if reason is not None:
+            self._dump_reason = None
+            self.dump(reason)
+
+    def record(self):
+        stacktraces = self._collect_stacktraces()
+        time_seconds = self._time()
+        thread_states = self._scraper.thread_states
+        with self._lock:
+            if len(self._stacks) > _MAX_INTERNED_STACKS:
+                self._compact()
+            entries = tuple(
+                (
+                    stacktrace["tid"],
+                    thread_states.get(stacktrace["tid"]),
+                    stacktrace.get("labels"),
+                    self._intern(stacktrace["frames"]),
+                )
+                for stacktrace in stacktraces
+            )
+            self._samples.append((time_seconds, entries))
+
+    def dump(self, reason: str):
+        with self._lock:
+            samples = list(self._samples)
+            self._samples.clear()
+            stacks = self._stacks
+
+        _pylogger.debug("Dumping %d flight recorder samples (%s)", len(samples), reason)
+        stacktraces = [
+            {
+                "tid": thread_id,
+                "frames": list(stacks[stack_id]),
+                "trace_context": trace_context,
+                "labels": labels or {},
+                "time_seconds": time_seconds,
+            }
+            for (time_seconds, entries) in samples
+            for (thread_id, trace_context, labels, stack_id) in entries
+        ]
+        self._scraper.emit(stacktraces)
+
+    def _intern(self, frames) -> int:
+        key = tuple(frames)
+        stack_id = self._stack_ids.get(key)
+        if stack_id is None:
+            stack_id = len(self._stacks)
+            self._stacks.append(key)
+            self._stack_ids[key] = stack_id
+        return stack_id
+
+    def _compact(self):
+        # drop stacks that are no longer referenced by any sample in the window
+        old_stacks = self._stacks
+        self._stacks = []
+        self._stack_ids = {}
+        samples = [
+            (
+                time_seconds,
+                tuple(
+                    (thread_id, trace_context, labels, self._intern(old_stacks[stack_id]))
+                    for (thread_id, trace_context, labels, stack_id) in entries
+                ),
+            )
+            for (time_seconds, entries) in self._samples
+        ]
+        self._samples.clear()
+        self._samples.extend(samples)
+
+
+class _FlightRecorderSpanProcessor(SpanProcessor):
+    def __init__(self, recorder: _FlightRecorder, threshold_millis: int):
+        self._recorder = recorder
+        self._threshold_nanos = threshold_millis * 1_000_000
+
+    def on_end(self, span: ReadableSpan) -> None:
+        if span.parent is not None and not span.parent.is_remote:
+            return
+        if span.start_time is None or span.end_time is None:
+            return
+        if span.end_time - span.start_time >= self._threshold_nanos:
+            self._recorder.request_dump("slow_span")
+
+
+def _start_flight_recorder_if_enabled(env=None):
+    env = env or Env()
+    if env.is_true(SPLUNK_PROFILER_FLIGHT_RECORDER_ENABLED):
+        start_flight_recorder(env)
+
+
+def start_flight_recorder(env=None):
+    env = env or Env()
+    interval_millis = env.getint(SPLUNK_PROFILER_FLIGHT_RECORDER_INTERVAL, _DEFAULT_INTERVAL_MILLIS)
+    window_seconds = env.getfloat(SPLUNK_PROFILER_FLIGHT_RECORDER_WINDOW, _DEFAULT_WINDOW_SECONDS)
+
+    start_thread_context_tracking()
+    scraper = _ProfileScraper(
+        _mk_resource(env.getval(OTEL_SERVICE_NAME)),
+        _thread_states,
+        interval_millis,
+        get_logger(_SCOPE_NAME, _SCOPE_VERSION),
+        instrumentation_source="flight_recorder",
+    )
+    recorder = _FlightRecorder(scraper, interval_millis, window_seconds)
+
+    threshold_millis = env.getint(SPLUNK_PROFILER_FLIGHT_RECORDER_SPAN_THRESHOLD, 0)
+    if threshold_millis > 0:
+        trace.get_tracer_provider().add_span_processor(_FlightRecorderSpanProcessor(recorder, threshold_millis))
+
+    signal_name = env.getval(SPLUNK_PROFILER_FLIGHT_RECORDER_SIGNAL, _DEFAULT_SIGNAL).strip()
+    if signal_name and signal_name == env.getval(SPLUNK_PROFILER_BURST_SIGNAL).strip():
+        _pylogger.warning(
+            "%s and %s are both %s, the signal dumps the flight recorder and starts a burst",
+            SPLUNK_PROFILER_FLIGHT_RECORDER_SIGNAL,
+            SPLUNK_PROFILER_BURST_SIGNAL,
+            signal_name,
+        )
+    if signal_name:
+        _install_signal_handler(signal_name, lambda: recorder.request_dump("signal"))
+
+    _install_exception_hooks(recorder)
+    atexit.register(_dump_on_exit, recorder)
+
+    recorder.start()
+    return recorder
+
+
+def _install_exception_hooks(recorder: _FlightRecorder):
+    previous_excepthook = sys.excepthook
+    previous_threading_excepthook = threading.excepthook
+
+    def excepthook(exc_type, exc_value, exc_traceback):
+        # the interpreter is about to exit, so the atexit hook does the actual dump
+        recorder.request_dump("exception")
+        previous_excepthook(exc_type, exc_value, exc_traceback)
+
+    def threading_excepthook(args):
+        recorder.request_dump("exception")
+        previous_threading_excepthook(args)
+
+    sys.excepthook = excepthook
+    threading.excepthook = threading_excepthook
+
+
+def _dump_on_exit(recorder: _FlightRecorder):
+    recorder.stop()
+    recorder.dump("shutdown")
@@ -0,0 +1,140 @@
+# Copyright Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Hot function metrics.
+
+With `hot_functions` in SPLUNK_PROFILER_EXPORTER, the continuous profiler keeps an exponentially decaying count of
+the samples each function was seen in, on top of the stack (self) and anywhere in the stack (inclusive), and exports
+the top functions as gauges on the regular metric export interval instead of (or as well as) sending every sample
+as pprof.
+"""
+
+import threading
+import time
+from collections.abc import Iterable
+
+from opentelemetry.metrics import CallbackOptions, Observation, get_meter
+
+from splunk_otel.env import SPLUNK_PROFILER_HOT_FUNCTIONS_COUNT, SPLUNK_PROFILER_HOT_FUNCTIONS_HALF_LIFE, Env
+from splunk_otel.profile import _SCOPE_NAME, _SCOPE_VERSION, _function_key
+
+_DEFAULT_COUNT = 20
+_DEFAULT_HALF_LIFE_SECONDS = 60
+# functions tracked per reported one, so a function climbing into the top N already has its history
+_TRACKED_FACTOR = 10
+_MIN_COUNT = 0.01
+
+_FUNCTION_NAME_ATTR = "code.function.name"
+_FILE_PATH_ATTR = "code.file.path"
+
+
+class _FunctionCounts:
+    __slots__ = ("file_name", "function_name", "inclusive", "self")
+
+    def __init__(self, file_name: str, function_name: str):
+        self.file_name = file_name
+        self.function_name = function_name
+        self.self = 0.0
+        self.inclusive = 0.0
+
+
+class _HotFunctions:
+    def __init__(self, count: int, half_life_seconds: float, time_func=time.monotonic):
+        self._count = count
+        self._half_life_seconds = half_life_seconds
+        self._time = time_func
+        self._functions: dict[str, _FunctionCounts] = {}
+        self._last_decay = time_func()
+        self._lock = threading.Lock()
+
+    def record(self, stacktraces: list[dict]):
+        with self._lock:
+            self._decay()
+            for stacktrace in stacktraces:
+                frames = stacktrace["frames"]
+                if not frames:
+                    continue
+                seen = set()
+                for file_name, function_name, _ in frames:
+                    key = _function_key(file_name, function_name)
+                    if key in seen:  # recursion counts once
+                        continue
+                    seen.add(key)
+                    self._get(key, file_name, function_name).inclusive += 1
+                file_name, function_name, _ = frames[-1]
+                self._get(_function_key(file_name, function_name), file_name, function_name).self += 1
+            self._trim()
+
+    def top(self, attr: str) -> list[_FunctionCounts]:
+        with self._lock:
+            self._decay()
+            functions = sorted(self._functions.values(), key=lambda counts: getattr(counts, attr), reverse=True)
+            return [counts for counts in functions[: self._count] if getattr(counts, attr) > 0]
+
+    def observe_self(self, _options: CallbackOptions) -> Iterable[Observation]:
+        return [Observation(counts.self, _attributes(counts)) for counts in self.top("self")]
+
+    def observe_inclusive(self, _options: CallbackOptions) -> Iterable[Observation]:
+        return [Observation(counts.inclusive, _attributes(counts)) for counts in self.top("inclusive")]
+
+    def _get(self, key: str, file_name: str, function_name: str) -> _FunctionCounts:
+        counts = self._functions.get(key)
+        if counts is None:
+            counts = _FunctionCounts(file_name, function_name)
+            self._functions[key] = counts
+        return counts
+
+    def _decay(self):
+        now = self._time()
+        factor = 0.5 ** ((now - self._last_decay) / self._half_life_seconds)
+        self._last_decay = now
+        if factor == 1.0:
+            return
+        for counts in self._functions.values():
+            counts.self *= factor
+            counts.inclusive *= factor
+
+    def _trim(self):
+        limit = self._count * _TRACKED_FACTOR
+        if len(self._functions) <= limit:
+            return
+        ranked = sorted(self._functions.items(), key=lambda item: item[1].inclusive, reverse=True)
+        self._functions = {key: counts for key, counts in ranked[:limit] if counts.inclusive >= _MIN_COUNT}
+
+
+def _attributes(counts: _FunctionCounts) -> dict[str, str]:
+    return {_FUNCTION_NAME_ATTR: counts.function_name, _FILE_PATH_ATTR: counts.file_name}
+
+
+def start_hot_functions(env=None) -> _HotFunctions:
+    env = env or Env()
+    count = env.getint(SPLUNK_PROFILER_HOT_FUNCTIONS_COUNT, _DEFAULT_COUNT)
+    half_life_seconds = env.getfloat(SPLUNK_PROFILER_HOT_FUNCTIONS_HALF_LIFE, _DEFAULT_HALF_LIFE_SECONDS)
+    hot_functions = _HotFunctions(max(1, count), max(1.0, half_life_seconds))
+
+    meter = get_meter(_SCOPE_NAME, _SCOPE_VERSION)
+    meter.create_observable_gauge(
+        "profiling.function.samples.self",
+        callbacks=[hot_functions.observe_self],
+        unit="{sample}",
+        description="Decaying count of profiling samples with the function on top of the stack.",
+    )
+    meter.create_observable_gauge(
+        "profiling.function.samples.inclusive",
+        callbacks=[hot_functions.observe_inclusive],
+        unit="{sample}",
+        description="Decaying count of profiling samples with the function anywhere in the stack.",
+    )
+    return hot_functions
@@ -0,0 +1,210 @@
+# Copyright Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Non-blocking logging handler.
+
+With SPLUNK_LOGS_ASYNC_HANDLER_ENABLED, the logging instrumentation's handler is replaced with one that only queues
+the record and the current context on the logging thread. A worker thread converts queued records to OpenTelemetry log
+records and emits them. When SPLUNK_LOGS_ASYNC_HANDLER_QUEUE_SIZE records are waiting, new records are dropped and
+counted in the `splunk.logs.handler.dropped` metric.
+"""
+
+import atexit
+import collections
+import copy
+import logging
+import threading
+
+from opentelemetry.context import Context, attach, detach, get_current
+from opentelemetry.instrumentation.logging.handler import LoggingHandler, _overwrite_logging_config_fns
+from opentelemetry.metrics import CallbackOptions, Observation, get_meter
+
+from splunk_otel.__about__ import __version__ as version
+from splunk_otel.env import SPLUNK_LOGS_ASYNC_HANDLER_QUEUE_SIZE, Env
+
+_DEFAULT_QUEUE_SIZE = 2048
+_exception_formatter = logging.Formatter()
+_CLOSE_TIMEOUT_SECONDS = 5
+_FLUSH_TIMEOUT_SECONDS = 5
+
+_pylogger = logging.getLogger(__name__)
+
+_handler: "AsyncLoggingHandler | None" = None
+
+
+class AsyncLoggingHandler(LoggingHandler):
+    """
+    A LoggingHandler that converts and emits records on a worker thread. Logging threads append to a bounded deque
+    without taking the handler lock, and only wake the worker if it is waiting for records; records arriving while
+    `max_queue_size` records are waiting are dropped.
+    """
+
+    def __init__(
+        self, level: int = logging.NOTSET, logger_provider=None, max_queue_size: int = _DEFAULT_QUEUE_SIZE, **kwargs
+    ):
+        super().__init__(level=level, logger_provider=logger_provider, **kwargs)
+        self._max_queue_size = max_queue_size
+        # deque.append() and popleft() are atomic, so logging threads and the worker share it without a lock; a None
+        # record marks where a flush() waits, with the event to set instead of a context
+        self._records: collections.deque[tuple[logging.LogRecord | None, Context | threading.Event]] = (
+            collections.deque()
+        )
+        self._dropped = 0
+        self._dropped_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._wakeup = threading.Event()
+        # set by the worker before it waits, so logging threads only pay for waking it when the queue was empty
+        self._idle = False
+        self._worker = threading.Thread(target=self._run, name="splunk-otel-log-handler", daemon=True)
+        self._worker.start()
+
+    def handle(self, record: logging.LogRecord) -> bool:
+        # unlike logging.Handler.handle(), no lock is taken around emit()
+        rv = self.filter(record)
+        if isinstance(rv, logging.LogRecord):
+            record = rv
+        if rv:
+            self.emit(record)
+        return bool(rv)
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if self._is_emitting.get():
+            return  # logged by the worker while emitting a record
+        if len(self._records) >= self._max_queue_size:
+            with self._dropped_lock:
+                self._dropped += 1
+            return
+        # the record is emitted later on the worker, so the trace context is captured now
+        self._records.append((self.prepare(record), get_current()))
+        if self._idle:
+            self._wakeup.set()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        Like QueueHandler.prepare(), returns a copy of `record` with its message merged and its traceback formatted,
+        so the worker doesn't see arguments the application changed after logging. `exc_info` is kept for the
+        exception attributes.
+        """
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info and not record.exc_text:
+            record.exc_text = _exception_formatter.formatException(record.exc_info)
+        return record
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._drain()
+            self._idle = True
+            # checked after announcing idle: a record appended before then is seen here, one after wakes the worker
+            if not self._records and not self._stopping.is_set():
+                self._wakeup.wait()
+            self._idle = False
+            self._wakeup.clear()
+        self._drain()
+
+    def _drain(self):
+        while True:
+            try:
+                record, context = self._records.popleft()
+            except IndexError:
+                return
+            if record is None:
+                context.set()  # a flush() waiting for the records queued before it
+                continue
+            token = attach(context)
+            try:
+                super().emit(record)
+            except Exception:  # noqa: BLE001
+                self.handleError(record)
+            finally:
+                detach(token)
+
+    def flush(self) -> None:
+        """
+        Waits until the worker emitted the records queued so far. Records are only emitted by the worker, unless it
+        has stopped or flush() is called while it emits a record.
+        """
+        if not self._worker.is_alive() or self._worker is threading.current_thread():
+            self._drain()
+        else:
+            flushed = threading.Event()
+            self._records.append((None, flushed))
+            self._wakeup.set()
+            flushed.wait(_FLUSH_TIMEOUT_SECONDS)
+        super().flush()
+
+    def close(self) -> None:
+        self._stopping.set()
+        self._wakeup.set()
+        if self._worker.is_alive() and self._worker is not threading.current_thread():
+            self._worker.join(_CLOSE_TIMEOUT_SECONDS)
+        if not self._worker.is_alive():
+            # emits what the worker left, e.g. when it didn't get to run again before the interpreter exits
+            self._drain()
+        super().close()
+
+    def observe_dropped(self, _options: CallbackOptions):
+        yield Observation(self._dropped)
+
+    def observe_queue_size(self, _options: CallbackOptions):
+        yield Observation(len(self._records))
+
+
+def install_async_logging_handler(
+    env=None, *, level: int = logging.NOTSET, log_code_attributes: bool = False
+) -> AsyncLoggingHandler:
+    """
+    Adds an AsyncLoggingHandler to the root logger, keeping it there when logging is configured again, and reports its
+    queue as metrics.
+    """
+    global _handler  # noqa PLW0603
+    env = env or Env()
+    max_queue_size = env.getint(SPLUNK_LOGS_ASYNC_HANDLER_QUEUE_SIZE, _DEFAULT_QUEUE_SIZE)
+    if max_queue_size <= 0:
+        _pylogger.warning(
+            "Invalid value of '%s' for env var '%s'", max_queue_size, SPLUNK_LOGS_ASYNC_HANDLER_QUEUE_SIZE
+        )
+        max_queue_size = _DEFAULT_QUEUE_SIZE
+
+    handler = AsyncLoggingHandler(level=level, max_queue_size=max_queue_size, log_code_attributes=log_code_attributes)
+    logging.getLogger().addHandler(handler)
+    _overwrite_logging_config_fns(handler)
+    _handler = handler
+
+    meter = get_meter(__name__, version)
+    meter.create_observable_counter(
+        "splunk.logs.handler.dropped",
+        callbacks=[handler.observe_dropped],
+        unit="{record}",
+        description="Log records dropped because the logging handler queue was full.",
+    )
+    meter.create_observable_gauge(
+        "splunk.logs.handler.queue.size",
+        callbacks=[handler.observe_queue_size],
+        unit="{record}",
+        description="Log records waiting to be emitted by the logging handler.",
+    )
+    return handler
+
+
+def _close_async_logging_handler_at_exit():
+    """
+    Closes the installed handler at exit, emitting the records still in its queue. Called once the SDK has configured
+    the LoggerProvider: atexit hooks run in reverse order, so this runs before the provider shuts down, whereas
+    logging's own shutdown hook only runs after it.
+    """
+    if _handler is not None:
+        atexit.register(_handler.close)
@@ -0,0 +1,146 @@
+# Copyright Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Log sampling that follows trace sampling decisions.
+
+With SPLUNK_LOGS_SAMPLING_ENABLED, log records emitted in a trace that was not sampled are dropped, or kept with
+SPLUNK_LOGS_SAMPLING_UNSAMPLED_PROBABILITY, and log records outside of any trace are capped at
+SPLUNK_LOGS_SAMPLING_UNCORRELATED_RATE_LIMIT per second. Records at or above SPLUNK_LOGS_SAMPLING_MIN_SEVERITY, as well
+as profiling and SecureApp records, are always kept.
+"""
+
+import itertools
+import logging
+import time
+
+from opentelemetry._logs import SeverityNumber
+from opentelemetry.sdk._logs import LogRecordProcessor, ReadWriteLogRecord
+from opentelemetry.sdk._logs.export import BatchLogRecordProcessor, LogRecordExporter
+
+from splunk_otel.env import (
+    SPLUNK_LOGS_SAMPLING_ENABLED,
+    SPLUNK_LOGS_SAMPLING_MIN_SEVERITY,
+    SPLUNK_LOGS_SAMPLING_UNCORRELATED_RATE_LIMIT,
+    SPLUNK_LOGS_SAMPLING_UNSAMPLED_PROBABILITY,
+    Env,
+)
+from splunk_otel.profile import _SCOPE_NAME as _PROFILING_SCOPE_NAME
+from splunk_otel.sampling import _RANDOMNESS_MASK, _threshold
+
+# SecureApp reports package dependencies through logs in this scope
+_SECUREAPP_SCOPE_NAME = "secureapp"
+_DEFAULT_MIN_SEVERITY = "WARN"
+_DEFAULT_UNSAMPLED_PROBABILITY = 0.0
+
+_pylogger = logging.getLogger(__name__)
+
+
+class TraceCorrelatedLogRecordProcessor(LogRecordProcessor):
+    """
+    Passes the log records it keeps to `delegate`, usually the BatchLogRecordProcessor of an exporter. Records of
+    sampled traces are always kept; records of unsampled traces are kept with `unsampled_probability` and records
+    without a trace are kept up to `uncorrelated_max_per_second`, 0 meaning no limit.
+    """
+
+    def __init__(
+        self,
+        delegate: LogRecordProcessor,
+        min_severity: SeverityNumber = SeverityNumber.WARN,
+        unsampled_probability: float = _DEFAULT_UNSAMPLED_PROBABILITY,
+        uncorrelated_max_per_second: float = 0,
+        exempt_scopes: tuple[str, ...] = (_PROFILING_SCOPE_NAME, _SECUREAPP_SCOPE_NAME),
+        time_func=time.monotonic,
+    ):
+        self._delegate = delegate
+        self._min_severity = min_severity.value
+        # decided from the trace id like the samplers do, so all the records of a trace are kept or dropped together
+        self._unsampled_threshold = _threshold(unsampled_probability)
+        self._uncorrelated_max_per_second = uncorrelated_max_per_second
+        self._exempt_scopes = frozenset(exempt_scopes)
+        self._time = time_func
+        # (second, count of records in it), replaced rather than reset so logging threads share it without a lock
+        self._window = (int(time_func()), itertools.count())
+
+    def on_emit(self, log_record: ReadWriteLogRecord) -> None:
+        if self._keep(log_record):
+            self._delegate.on_emit(log_record)
+
+    def _keep(self, log_record: ReadWriteLogRecord) -> bool:
+        record = log_record.log_record
+        if record.severity_number is not None and record.severity_number.value >= self._min_severity:
+            return True
+        scope = log_record.instrumentation_scope
+        if scope is not None and scope.name in self._exempt_scopes:
+            return True
+        if record.trace_id:
+            if record.trace_flags is not None and record.trace_flags.sampled:
+                return True
+            return record.trace_id & _RANDOMNESS_MASK >= self._unsampled_threshold
+        return self._within_uncorrelated_rate()
+
+    def _within_uncorrelated_rate(self) -> bool:
+        if self._uncorrelated_max_per_second <= 0:
+            return True
+        second = int(self._time())
+        window_second, count = self._window
+        if window_second != second:
+            count = itertools.count()
+            self._window = (second, count)
+        return next(count) < self._uncorrelated_max_per_second
+
+    def shutdown(self) -> None:
+        self._delegate.shutdown()
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return self._delegate.force_flush(timeout_millis)
+
+
+def _parse_severity(env: Env) -> SeverityNumber:
+    name = env.getval(SPLUNK_LOGS_SAMPLING_MIN_SEVERITY, _DEFAULT_MIN_SEVERITY).strip().upper()
+    if name == "WARNING":
+        name = "WARN"
+    try:
+        return SeverityNumber[name]
+    except KeyError:
+        _pylogger.warning("Invalid value of '%s' for env var '%s'", name, SPLUNK_LOGS_SAMPLING_MIN_SEVERITY)
+        return SeverityNumber[_DEFAULT_MIN_SEVERITY]
+
+
+def _get_export_log_record_processor(env=None):
+    """
+    Returns the factory the SDK configurator uses to wrap each log exporter, or None to keep the SDK default.
+    """
+    env = env or Env()
+    if not env.is_true(SPLUNK_LOGS_SAMPLING_ENABLED):
+        return None
+
+    min_severity = _parse_severity(env)
+    unsampled_probability = env.getfloat(SPLUNK_LOGS_SAMPLING_UNSAMPLED_PROBABILITY, _DEFAULT_UNSAMPLED_PROBABILITY)
+    if not 0 <= unsampled_probability <= 1:
+        _pylogger.warning(
+            "Invalid value of '%s' for env var '%s'", unsampled_probability, SPLUNK_LOGS_SAMPLING_UNSAMPLED_PROBABILITY
+        )
+        unsampled_probability = _DEFAULT_UNSAMPLED_PROBABILITY
+    uncorrelated_max_per_second = env.getfloat(SPLUNK_LOGS_SAMPLING_UNCORRELATED_RATE_LIMIT, 0)
+
+    def export_log_record_processor(exporter: LogRecordExporter) -> TraceCorrelatedLogRecordProcessor:
+        return TraceCorrelatedLogRecordProcessor(
+            BatchLogRecordProcessor(exporter),
+            min_severity=min_severity,
+            unsampled_probability=unsampled_probability,
+            uncorrelated_max_per_second=uncorrelated_max_per_second,
+        )
+
+    return export_log_record_processor
@@ -22,6 +22,7 @@ from typing import TYPE_CHECKING
 from opentelemetry._opamp.agent import OpAMPAgent
 from opentelemetry._opamp.callbacks import MessageData, OpAMPCallbacks
 from opentelemetry._opamp.client import OpAMPClient
+from opentelemetry._opamp.proto import opamp_pb2
 from opentelemetry.environment_variables import (
     OTEL_LOGS_EXPORTER,
     OTEL_METRICS_EXPORTER,
@@ -36,9 +37,12 @@ from opentelemetry.sdk.environment_variables import (
     OTEL_EXPORTER_OTLP_PROTOCOL,
     OTEL_EXPORTER_OTLP_TRACES_ENDPOINT,
     OTEL_EXPORTER_OTLP_TRACES_PROTOCOL,
+    OTEL_TRACES_SAMPLER,
+    OTEL_TRACES_SAMPLER_ARG,
 )
 
 from splunk_otel.env import (
+    DEFAULTS,
     Env,
     SPLUNK_OPAMP_ENABLED,
     SPLUNK_OPAMP_ENDPOINT,
@@ -47,9 +51,14 @@ from splunk_otel.env import (
     SPLUNK_PROFILER_ENABLED,
     SPLUNK_SNAPSHOT_PROFILER_ENABLED,
     SPLUNK_SNAPSHOT_SAMPLING_INTERVAL,
+    SPLUNK_SNAPSHOT_SELECTION_PROBABILITY,
+    SPLUNK_TRACES_SAMPLER_RATE_LIMIT,
+    SPLUNK_TRACES_SAMPLER_TARGET_RATE,
 )
 
 if TYPE_CHECKING:
+    from collections.abc import Callable
+
     from opentelemetry.sdk.resources import Resource
 
 logger = logging.getLogger(__name__)
@@ -60,6 +69,7 @@ _DEFAULT_OPAMP_ENDPOINT = "http://localhost:4320/v1/opamp"
 _DEFAULT_OPAMP_POLLING_INTERVAL_MS = 30000
 _DEFAULT_PROFILER_CALL_STACK_INTERVAL = 1000
 _DEFAULT_SNAPSHOT_SAMPLING_INTERVAL = 10
+_DEFAULT_SNAPSHOT_SELECTION_PROBABILITY = 0.01
 _DEFAULT_GRPC_ENDPOINT = "http://localhost:4317"
 _DEFAULT_HTTP_ENDPOINT = "http://localhost:4318/"
 _OTLP_PROTOCOL_HTTP_PROTOBUF = "http/protobuf"
@@ -72,6 +82,14 @@ _SPLUNK_SNAPSHOT_PROFILER_SAMPLING_INTERVAL = "SPLUNK_SNAPSHOT_PROFILER_SAMPLING
 _OTEL_CONFIG_FILE = "OTEL_CONFIG_FILE"
 _OTEL_EXPERIMENTAL_CONFIG_FILE = "OTEL_EXPERIMENTAL_CONFIG_FILE"
 
+# remote config files in this content type use the same format as the effective config report, anything else must be
+# a JSON object
+_JSON_CONTENT_TYPE = "json"
+_ADJUSTABLE_SAMPLER = "splunk_adjustable"
+_THROUGHPUT_SAMPLER = "splunk_throughput"
+_TRUE = "true"
+_FALSE = "false"
+
 _SIGNAL_ENV_VARS = {
     "traces": {
         "endpoint": OTEL_EXPORTER_OTLP_TRACES_ENDPOINT,
@@ -91,7 +109,63 @@ _SIGNAL_ENV_VARS = {
 }
 
 
+def _parse_bool(value: str) -> str:
+    value = value.strip().lower()
+    if value not in (_TRUE, _FALSE):
+        raise ValueError(value)
+    return value
+
+
+def _parse_positive_int(value: str) -> str:
+    parsed = int(value)
+    if parsed <= 0:
+        raise ValueError(value)
+    return str(parsed)
+
+
+def _parse_probability(value: str) -> str:
+    parsed = float(value)
+    if not 0 <= parsed <= 1:
+        raise ValueError(value)
+    return str(parsed)
+
+
+def _parse_rate(value: str) -> str:
+    parsed = float(value)
+    if not parsed >= 0:  # also rejects nan
+        raise ValueError(value)
+    return str(parsed)
+
+
+# settings that can be changed through remote config, with the parser that validates and normalizes each value; the
+# sampler settings only take effect with the matching splunk_adjustable or splunk_throughput OTEL_TRACES_SAMPLER
+_REMOTE_SETTINGS: dict[str, Callable[[str], str]] = {
+    SPLUNK_PROFILER_ENABLED: _parse_bool,
+    SPLUNK_PROFILER_CALL_STACK_INTERVAL: _parse_positive_int,
+    SPLUNK_SNAPSHOT_PROFILER_ENABLED: _parse_bool,
+    SPLUNK_SNAPSHOT_SAMPLING_INTERVAL: _parse_positive_int,
+    SPLUNK_SNAPSHOT_SELECTION_PROBABILITY: _parse_probability,
+    OTEL_TRACES_SAMPLER_ARG: _parse_probability,
+    SPLUNK_TRACES_SAMPLER_RATE_LIMIT: _parse_rate,
+    SPLUNK_TRACES_SAMPLER_TARGET_RATE: _parse_rate,
+}
+# names used in the effective config report that differ from the env var names
+_REMOTE_SETTING_ALIASES = {
+    _SPLUNK_SNAPSHOT_PROFILER_SAMPLING_INTERVAL: SPLUNK_SNAPSHOT_SAMPLING_INTERVAL,
+}
+
+
 class _SplunkCallbacks(OpAMPCallbacks):
+    """
+    Applies the profiler and sampler settings in remote config messages to the running process and reports back the
+    resulting effective config and whether the remote config was applied.
+    """
+
+    def __init__(self, env: Env | None = None, apply_settings: Callable[[Env], None] | None = None):
+        self._env = env or Env()
+        self._apply_settings = apply_settings or _apply_remote_settings
+        self._last_remote_config_hash: bytes | None = None
+
     def on_connect_failed(
         self,
         _agent: OpAMPAgent,
@@ -110,14 +184,105 @@ class _SplunkCallbacks(OpAMPCallbacks):
 
     def on_message(
         self,
-        _agent: OpAMPAgent,
-        _client: OpAMPClient,
+        agent: OpAMPAgent,
+        client: OpAMPClient,
         message: MessageData,
     ) -> None:
         logger.debug(
             "ServerToAgent message received: remote_config=%s",
             message.remote_config is not None,
         )
+        if message.remote_config is not None:
+            self._on_remote_config(agent, client, message.remote_config)
+
+    def _on_remote_config(
+        self,
+        agent: OpAMPAgent,
+        client: OpAMPClient,
+        remote_config: opamp_pb2.AgentRemoteConfig,
+    ) -> None:
+        # the server may send the same remote config again, e.g. in response to a full state report
+        if remote_config.config_hash == self._last_remote_config_hash:
+            return
+        self._last_remote_config_hash = remote_config.config_hash
+
+        try:
+            settings = _parse_remote_config(remote_config)
+        except ValueError as e:
+            logger.warning("Ignoring invalid OpAMP remote config: %s", e)
+            status = opamp_pb2.RemoteConfigStatuses_FAILED
+            error_message = f"invalid remote config: {e}"
+        else:
+            for key, value in settings.items():
+                self._env.setval(key, value)
+            self._apply_settings(self._env)
+            logger.info("Applied OpAMP remote config: %s", settings)
+            status = opamp_pb2.RemoteConfigStatuses_APPLIED
+            error_message = ""
+
+        client.update_effective_config(
+            {_CONFIG_FILENAME: build_effective_config_report(self._env)},
+            content_type=_CONFIG_CONTENT_TYPE,
+        )
+        client.update_remote_config_status(remote_config.config_hash, status, error_message)
+        agent.send(client.build_full_state_message())
+
+
+def _parse_remote_config(remote_config: opamp_pb2.AgentRemoteConfig) -> dict[str, str]:
+    """
+    Returns the supported settings found in the files of a remote config, raising ValueError if any file or supported
+    value is malformed. Unsupported settings are ignored.
+    """
+    settings = {}
+    for filename, config_file in remote_config.config.config_map.items():
+        body = config_file.body.decode()
+        if _JSON_CONTENT_TYPE in config_file.content_type:
+            values = json.loads(body)
+            if not isinstance(values, dict):
+                raise ValueError(filename)
+        else:
+            values = _parse_properties(body)
+
+        for key, value in values.items():
+            name = _REMOTE_SETTING_ALIASES.get(key, key)
+            parse = _REMOTE_SETTINGS.get(name)
+            if parse is None:
+                logger.debug("Ignoring unsupported OpAMP remote config setting %s", key)
+                continue
+            try:
+                settings[name] = parse(str(value))
+            except ValueError:
+                setting = f"{key}={value}"
+                raise ValueError(setting) from None
+    return settings
+
+
+def _parse_properties(content: str) -> dict[str, str]:
+    values = {}
+    for line in content.splitlines():
+        stripped = line.strip()
+        if not stripped or stripped.startswith("#"):
+            continue
+        key, separator, value = stripped.partition("=")
+        if not separator:
+            raise ValueError(line)
+        values[key.strip()] = value.strip()
+    return values
+
+
+def _apply_remote_settings(env: Env) -> None:
+    from splunk_otel.callgraphs import _reconfigure_callgraphs
+    from splunk_otel.distro import SplunkDistro
+    from splunk_otel.profile import _reconfigure_profiling
+    from splunk_otel.sampling import _reconfigure_sampler
+
+    _reconfigure_sampler(env)
+    _reconfigure_profiling(env)
+    _reconfigure_callgraphs(env)
+    # rebuilds the propagator that makes the snapshot selection decision, with the new probability
+    distro = SplunkDistro()
+    distro.env = env
+    distro.set_callgraphs_propagator()
 
 
 def start_opamp(resource: Resource) -> None:
@@ -192,9 +357,23 @@ def build_effective_config_report(env: Env) -> str:
                 )
             ),
         ),
+        (
+            SPLUNK_SNAPSHOT_SELECTION_PROBABILITY,
+            str(env.getfloat(SPLUNK_SNAPSHOT_SELECTION_PROBABILITY, _DEFAULT_SNAPSHOT_SELECTION_PROBABILITY)),
+        ),
         (_OTEL_CONFIG_FILE, "null"),
         (_OTEL_EXPERIMENTAL_CONFIG_FILE, "null"),
     )
+    sampler = env.getval(OTEL_TRACES_SAMPLER, DEFAULTS[OTEL_TRACES_SAMPLER]).strip().lower()
+    if sampler in {_ADJUSTABLE_SAMPLER, _THROUGHPUT_SAMPLER}:
+        values += ((OTEL_TRACES_SAMPLER, sampler),)
+    # every setting that can be changed remotely is reported, even if the configured sampler doesn't use it, so a
+    # remote change always shows up in the report
+    values += (
+        (OTEL_TRACES_SAMPLER_ARG, env.getval(OTEL_TRACES_SAMPLER_ARG, "1.0")),
+        (SPLUNK_TRACES_SAMPLER_RATE_LIMIT, env.getval(SPLUNK_TRACES_SAMPLER_RATE_LIMIT, "0")),
+        (SPLUNK_TRACES_SAMPLER_TARGET_RATE, env.getval(SPLUNK_TRACES_SAMPLER_TARGET_RATE, "10")),
+    )
     return "\n".join(f"{key}={value}" for key, value in values)
 
 
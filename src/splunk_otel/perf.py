@@ -0,0 +1,186 @@
+# Copyright Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Linux `perf` integration.
+
+With SPLUNK_PROFILER_PERF_MAP_ENABLED, the distro activates CPython's perf trampoline at startup (Python 3.12+) so
+`perf record -g` can attribute samples to Python functions through /tmp/perf-<pid>.map. Profiles captured that way
+can then be sent to Splunk with the same pprof log records the in-process profiler emits:
+
+    perf record -F 99 -g -p <pid> -- sleep 30
+    perf script | splunk-otel-perf-ingest --service-name my-service
+"""
+
+import argparse
+import logging
+import re
+import sys
+import time
+from collections.abc import Iterable, Iterator
+
+from opentelemetry.sdk.environment_variables import OTEL_SERVICE_NAME
+
+from splunk_otel.env import SPLUNK_PROFILER_PERF_MAP_ENABLED, Env
+from splunk_otel.profile import (
+    _SCOPE_NAME,
+    _SCOPE_VERSION,
+    _mk_exporting_logger_provider,
+    _mk_resource,
+    _ProfileScraper,
+)
+
+_DEFAULT_INTERVAL_MILLIS = 10
+_DEFAULT_BATCH_SECONDS = 10.0
+
+# "python3 12345/12346 [003] 1234.567890: 10101010 cpu-clock:" with the pid and cpu fields being optional
+_HEADER_RE = re.compile(r"^(?P<comm>\S.*?)\s+(?:(?P<pid>\d+)/)?(?P<tid>\d+)\s+(?:\[\d+\]\s+)?(?P<time>\d+\.\d+):")
+# "7f3a2b1c py::handler:/app/views.py+0x5 (/tmp/perf-12345.map)"
+_FRAME_RE = re.compile(r"^\s+(?P<ip>[0-9a-fA-F]+)\s+(?P<sym>.*?)\s+\((?P<dso>[^)]*)\)\s*$")
+_SYMBOL_OFFSET_RE = re.compile(r"\+0x[0-9a-fA-F]+$")
+_PYTHON_SYMBOL_PREFIX = "py::"
+
+_pylogger = logging.getLogger(__name__)
+
+
+def _start_perf_map_if_enabled(env=None):
+    env = env or Env()
+    if env.is_true(SPLUNK_PROFILER_PERF_MAP_ENABLED):
+        activate_perf_map()
+
+
+def activate_perf_map() -> bool:
+    if not sys.platform.startswith("linux") or not hasattr(sys, "activate_stack_trampoline"):
+        _pylogger.warning("perf maps require Python 3.12 or newer on Linux")
+        return False
+    try:
+        sys.activate_stack_trampoline("perf")
+    except ValueError:
+        _pylogger.warning("This Python build does not support the perf trampoline")
+        return False
+    return True
+
+
+def _parse_frame(symbol: str, dso: str):
+    symbol = _SYMBOL_OFFSET_RE.sub("", symbol)
+    if symbol.startswith(_PYTHON_SYMBOL_PREFIX):
+        function_name, _, file_name = symbol[len(_PYTHON_SYMBOL_PREFIX) :].partition(":")
+        return (file_name, function_name, 0)
+    return (dso, symbol, 0)
+
+
+def parse_perf_script(lines: Iterable[str], pid: int | None = None) -> Iterator[dict]:
+    """
+    Parses `perf script` output into stacktraces in the format used by the profiler, with "frames" ordered from
+    the outermost call, plus "perf_time_seconds" holding the perf timestamp of the sample.
+    """
+    stacktrace = None
+    for line in lines:
+        if not line.strip():
+            if stacktrace is not None and stacktrace["frames"]:
+                stacktrace["frames"].reverse()
+                yield stacktrace
+            stacktrace = None
+            continue
+
+        if stacktrace is None:
+            header = _HEADER_RE.match(line)
+            if header is None:
+                continue
+            if pid is not None and header["pid"] is not None and int(header["pid"]) != pid:
+                stacktrace = {"frames": []}  # skip the stack lines of this sample
+                continue
+            stacktrace = {"tid": int(header["tid"]), "perf_time_seconds": float(header["time"]), "frames": []}
+            continue
+
+        frame = _FRAME_RE.match(line)
+        if frame is not None and "tid" in stacktrace:
+            stacktrace["frames"].append(_parse_frame(frame["sym"], frame["dso"]))
+
+    if stacktrace is not None and stacktrace["frames"]:
+        stacktrace["frames"].reverse()
+        yield stacktrace
+
+
+def ingest_perf_script(
+    lines: Iterable[str],
+    scraper: _ProfileScraper,
+    pid: int | None = None,
+    batch_seconds: float = _DEFAULT_BATCH_SECONDS,
+    end_time_seconds: float | None = None,
+) -> int:
+    """
+    Emits parsed perf samples as profile log records, one per `batch_seconds` of capture. perf timestamps are not
+    wall clock times, so samples are placed relative to `end_time_seconds`, the time the capture ended (now by
+    default). Returns the number of samples emitted.
+    """
+    stacktraces = list(parse_perf_script(lines, pid))
+    if not stacktraces:
+        return 0
+
+    end_time_seconds = time.time() if end_time_seconds is None else end_time_seconds
+    last_perf_time = max(stacktrace["perf_time_seconds"] for stacktrace in stacktraces)
+    batch = []
+    batch_start = None
+    for stacktrace in sorted(stacktraces, key=lambda stacktrace: stacktrace["perf_time_seconds"]):
+        perf_time = stacktrace.pop("perf_time_seconds")
+        stacktrace["time_seconds"] = end_time_seconds - (last_perf_time - perf_time)
+        if batch_start is None:
+            batch_start = perf_time
+        elif perf_time - batch_start >= batch_seconds:
+            scraper.emit(batch)
+            batch = []
+            batch_start = perf_time
+        batch.append(stacktrace)
+    scraper.emit(batch)
+    return len(stacktraces)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", nargs="?", default="-", help="perf script output file, or '-' for stdin.")
+    parser.add_argument("--service-name", default=None, help="Service name, defaults to OTEL_SERVICE_NAME.")
+    parser.add_argument("--pid", type=int, default=None, help="Only ingest samples of this process.")
+    parser.add_argument(
+        "--interval", type=int, default=_DEFAULT_INTERVAL_MILLIS, help="Sampling interval of the capture in ms."
+    )
+    parser.add_argument(
+        "--batch-seconds", type=float, default=_DEFAULT_BATCH_SECONDS, help="Capture seconds per log record."
+    )
+    parser.add_argument(
+        "--end-time", type=float, default=None, help="Unix time the capture ended, defaults to the current time."
+    )
+    args = parser.parse_args(argv)
+
+    from splunk_otel.distro import SplunkDistro
+
+    env = Env()
+    if args.service_name:
+        env.setval(OTEL_SERVICE_NAME, args.service_name)
+    # applies the same realm, token and endpoint settings an instrumented process would use
+    SplunkDistro().configure()
+    logger_provider = _mk_exporting_logger_provider(env)
+    scraper = _ProfileScraper(
+        _mk_resource(env.getval(OTEL_SERVICE_NAME)),
+        {},
+        args.interval,
+        logger_provider.get_logger(_SCOPE_NAME, _SCOPE_VERSION),
+    )
+
+    with sys.stdin if args.input == "-" else open(args.input) as lines:
+        count = ingest_perf_script(lines, scraper, args.pid, args.batch_seconds, args.end_time)
+    logger_provider.shutdown()
+
+    _pylogger.info("Ingested %d perf samples", count)
+    return 0
@@ -0,0 +1,185 @@
+# Copyright Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Local pprof file exporter.
+
+With `pprof_file` in SPLUNK_PROFILER_EXPORTER, the continuous profiler writes its samples as gzipped pprof files
+(`profile-<unix millis>-<pid>-<sequence>.pb.gz`) that `go tool pprof` opens directly, for hosts without a collector.
+Samples are batched into one file per flush interval and written, fsync'd and rotated on a background thread.
+"""
+
+import atexit
+import gzip
+import logging
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from splunk_otel.env import (
+    SPLUNK_PROFILER_PPROF_FILE_DIRECTORY,
+    SPLUNK_PROFILER_PPROF_FILE_MAX_AGE,
+    SPLUNK_PROFILER_PPROF_FILE_MAX_SIZE,
+    Env,
+)
+from splunk_otel.profile import _IntervalTimer, _stacktraces_to_cpu_profile, _thread_states
+
+_DEFAULT_DIRECTORY = os.path.join(tempfile.gettempdir(), "splunk-otel-profiles")
+_DEFAULT_MAX_SIZE_MEGABYTES = 100
+_DEFAULT_MAX_AGE_SECONDS = 86400
+_FLUSH_INTERVAL_MILLIS = 10000
+_MAX_PENDING_STACKTRACES = 100000
+_FILE_PREFIX = "profile-"
+_FILE_SUFFIX = ".pb.gz"
+
+_pylogger = logging.getLogger(__name__)
+
+
+class _PprofFileWriter:
+    def __init__(
+        self,
+        directory: str,
+        interval_millis: int,
+        max_bytes: int,
+        max_age_seconds: float,
+        thread_states=_thread_states,
+        time_func=time.time,
+    ):
+        self._directory = Path(directory)
+        self._interval_millis = interval_millis
+        self._max_bytes = max_bytes
+        self._max_age_seconds = max_age_seconds
+        self._thread_states = thread_states
+        self._time = time_func
+        self._pending: list[dict] = []
+        self._dropped = 0
+        self._sequence = 0
+        self._lock = threading.Lock()
+        # serializes flushes from the writer thread and from shutdown
+        self._write_lock = threading.Lock()
+        self._timer = _IntervalTimer(_FLUSH_INTERVAL_MILLIS, self.flush)
+        self._directory.mkdir(parents=True, exist_ok=True)
+
+    def start(self):
+        self._timer.start()
+
+    def shutdown(self):
+        self._timer.stop()
+        self.flush()
+
+    def record(self, stacktraces: list[dict]):
+        """
+        Called on the sampling thread, only captures the trace context of each stack so the sample can be written
+        later.
+        """
+        if not stacktraces:
+            return
+        time_seconds = self._time()
+        captured = [
+            {
+                **stacktrace,
+                "trace_context": stacktrace.get("trace_context", self._thread_states.get(stacktrace["tid"])),
+                "time_seconds": stacktrace.get("time_seconds", time_seconds),
+            }
+            for stacktrace in stacktraces
+        ]
+        with self._lock:
+            room = _MAX_PENDING_STACKTRACES - len(self._pending)
+            if room < len(captured):
+                self._dropped += len(captured) - max(0, room)
+                captured = captured[: max(0, room)]
+            self._pending.extend(captured)
+
+    def flush(self):
+        with self._write_lock:
+            with self._lock:
+                stacktraces = self._pending
+                self._pending = []
+                dropped = self._dropped
+                self._dropped = 0
+            if dropped:
+                _pylogger.warning("Dropped %d profiling samples that could not be written in time", dropped)
+            if stacktraces:
+                try:
+                    self._write(stacktraces)
+                except OSError:
+                    _pylogger.warning("Failed to write profile to %s", self._directory, exc_info=True)
+            self._rotate()
+
+    def _write(self, stacktraces: list[dict]):
+        time_seconds = self._time()
+        pb_profile = _stacktraces_to_cpu_profile(
+            stacktraces, {}, self._interval_millis, stacktraces[0]["time_seconds"], standard=True
+        )
+        pb_profile.duration_nanos = max(0, int((time_seconds - stacktraces[0]["time_seconds"]) * 1e9))
+        data = gzip.compress(pb_profile.SerializeToString())
+
+        self._sequence += 1
+        name = f"{_FILE_PREFIX}{int(time_seconds * 1e3):013d}-{os.getpid()}-{self._sequence}{_FILE_SUFFIX}"
+        path = self._directory / name
+        # written under a temporary name and renamed once on disk, so readers never see a partial file
+        tmp_path = self._directory / f".{name}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        _fsync_directory(self._directory)
+
+    def _rotate(self):
+        files = []
+        for path in self._directory.glob(f"{_FILE_PREFIX}*{_FILE_SUFFIX}"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue  # removed by another process sharing the directory
+            files.append((stat.st_mtime, stat.st_size, path))
+        files.sort()
+
+        now = self._time()
+        total_bytes = sum(size for (_, size, _) in files)
+        for mtime, size, path in files:
+            if now - mtime <= self._max_age_seconds and total_bytes <= self._max_bytes:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total_bytes -= size
+
+
+def _fsync_directory(directory: Path):
+    if not hasattr(os, "O_DIRECTORY"):
+        return  # Windows
+    fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def start_pprof_file_writer(env=None, interval_millis: int = 1000) -> _PprofFileWriter:
+    env = env or Env()
+    writer = _PprofFileWriter(
+        env.getval(SPLUNK_PROFILER_PPROF_FILE_DIRECTORY).strip() or _DEFAULT_DIRECTORY,
+        interval_millis,
+        env.getint(SPLUNK_PROFILER_PPROF_FILE_MAX_SIZE, _DEFAULT_MAX_SIZE_MEGABYTES) * 1024 * 1024,
+        env.getint(SPLUNK_PROFILER_PPROF_FILE_MAX_AGE, _DEFAULT_MAX_AGE_SECONDS),
+    )
+    writer.start()
+    # registered before the profiler's own exit hook, so it runs after the profiler took its final sample
+    atexit.register(writer.shutdown)
+    return writer
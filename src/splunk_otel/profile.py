@@ -1,22 +1,34 @@
+import atexit
 import base64
 import gzip
+import logging
+import signal
 import sys
 import threading
 import time
 import traceback
+import weakref
 from collections import OrderedDict
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
 from traceback import StackSummary
 from typing import Literal
 from collections.abc import Callable
 
 import opentelemetry.context
 import wrapt
-from opentelemetry._logs import Logger, LogRecord, SeverityNumber, get_logger
+from opentelemetry._logs import Logger, LogRecord, SeverityNumber, get_logger, get_logger_provider
 from opentelemetry.context import Context
 from opentelemetry.instrumentation.version import __version__ as version
 from opentelemetry.sdk._logs import ReadWriteLogRecord
-from opentelemetry.sdk.environment_variables import OTEL_SERVICE_NAME
+from opentelemetry.sdk.environment_variables import (
+    OTEL_EXPORTER_OTLP_LOGS_PROTOCOL,
+    OTEL_EXPORTER_OTLP_PROTOCOL,
+    OTEL_SERVICE_NAME,
+)
 from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import ReadableSpan
 from opentelemetry.trace import (
     NonRecordingSpan,
     SpanContext,
@@ -29,6 +41,9 @@ from splunk_otel import profile_pb2
 from splunk_otel.env import (
     SPLUNK_PROFILER_CALL_STACK_INTERVAL,
     SPLUNK_PROFILER_ENABLED,
+    SPLUNK_PROFILER_EXPORTER,
+    SPLUNK_PROFILER_LOGS_ENDPOINT,
+    SPLUNK_PROFILER_SPAN_ATTRIBUTE_LABELS,
     Env,
 )
 
@@ -37,9 +52,38 @@ _SERVICE_NAME_ATTR = "service.name"
 _SPLUNK_DISTRO_VERSION_ATTR = "splunk.distro.version"
 _SCOPE_VERSION = "0.2.0"
 _SCOPE_NAME = "otel.profiling"
-
+_EXPORTER_OTLP = "otlp"
+_EXPORTER_HOT_FUNCTIONS = "hot_functions"
+_EXPORTER_PPROF_FILE = "pprof_file"
+_EXPORTERS = (_EXPORTER_OTLP, _EXPORTER_HOT_FUNCTIONS, _EXPORTER_PPROF_FILE)
+# OTLP receivers commonly reject requests over 4 MiB (the gRPC default), leave room for the resource and attributes
+_MAX_RECORD_BYTES = 3 * 1024 * 1024
+
+# thread id -> (trace id, span id) of the span the thread is executing; threads without a span have no entry
 _thread_states = {}
 _context_tracking_started = False
+_context_tracking_lock = threading.Lock()
+
+# labels set with profile_labels() in the current context, and the same labels published per thread for the sampler,
+# which can't read the context variables of other threads
+_profile_labels: ContextVar[dict[str, str] | None] = ContextVar("splunk_otel_profile_labels", default=None)
+_thread_labels: dict[int, dict[str, str]] = {}
+_RESERVED_LABEL_KEYS = frozenset(("source.event.time", "source.event.period", "thread.id", "trace_id", "span_id"))
+
+# attributes of the local root span copied onto the samples of the threads working on its trace, so profiles can be
+# broken down by route; read at sample time since instrumentations often set e.g. http.route after the span starts
+_DEFAULT_SPAN_ATTRIBUTE_LABELS = "http.route,messaging.destination.name"
+_span_attribute_label_keys: tuple[str, ...] = ()
+_local_root_spans: "weakref.WeakValueDictionary[int, ReadableSpan]" = weakref.WeakValueDictionary()
+_thread_root_spans: dict[int, ReadableSpan] = {}
+
+# ids of the threads running an _IntervalTimer, which are part of the profiler rather than the application
+_timer_thread_ids: set[int] = set()
+
+# the continuous profiler started by start_profiling(), kept so it can be reconfigured at runtime
+_continuous_profiling_context: "ProfilingContext | None" = None
+
+_pylogger = logging.getLogger(__name__)
 
 
 class ProfilingContext:
@@ -50,7 +94,10 @@ class ProfilingContext:
         service_name: str,
         interval_millis: int,
         stacktrace_filter: Callable[[list[dict], dict], list[dict]] | None = None,
-        instrumentation_source: Literal["continuous", "snapshot"] | None = "continuous",
+        instrumentation_source: Literal["continuous", "snapshot", "flight_recorder"] | None = "continuous",
+        on_flush: Callable[[], None] | None = None,
+        export_otlp: bool = True,  # noqa FBT001 FBT002
+        consumers: list[Callable[[list[dict]], None]] | None = None,
     ):
         start_thread_context_tracking()
         resource = _mk_resource(service_name)
@@ -62,8 +109,15 @@ class ProfilingContext:
             logger,
             stacktrace_filter=stacktrace_filter,
             instrumentation_source=instrumentation_source,
+            export_otlp=export_otlp,
+            consumers=consumers,
         )
-        self._timer = _IntervalTimer(interval_millis, scraper.tick)
+        self._scraper = scraper
+        # force_flush() ticks on the caller's thread, possibly while the timer thread is ticking
+        self._tick_lock = threading.Lock()
+        self._timer = _IntervalTimer(interval_millis, self._tick)
+        self._on_flush = on_flush
+        self._shutdown = False
 
     def start(self):
         self._timer.start()
@@ -71,9 +125,85 @@ class ProfilingContext:
     def stop(self):
         self._timer.stop()
 
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        """
+        Takes a final sample if the profiler is running, calls `on_flush` so callers can emit anything they buffered
+        and flushes the logger provider so the profile is exported before returning.
+        """
+        deadline = time.monotonic() + timeout_millis / 1e3
+        if self._timer.running and not self._timer.paused():
+            self._tick()
+        if self._on_flush is not None:
+            self._on_flush()
+        return _force_flush_logs(max(0, int((deadline - time.monotonic()) * 1e3)))
+
+    def shutdown(self, timeout_millis: int = 30000) -> bool:
+        if self._shutdown:
+            return True
+        self._shutdown = True
+        was_running = self._timer.running and not self._timer.paused()
+        self._timer.stop()
+        if was_running:
+            self._tick()
+        if self._on_flush is not None:
+            self._on_flush()
+        return _force_flush_logs(timeout_millis)
+
     def pause_after(self, seconds: float):
         self._timer.pause_after(seconds)
 
+    def _tick(self):
+        with self._tick_lock:
+            self._scraper.tick()
+
+    def set_interval(self, interval_millis: int):
+        self._timer.interval_seconds = interval_millis / 1e3
+        self._scraper.interval_millis = interval_millis
+
+    def emit_profile(self, pb_profile, total_frame_count: int):
+        self._scraper.emit_profile(pb_profile, total_frame_count)
+
+    def emit(self, stacktraces):
+        # stacktraces buffered by a stacktrace_filter carry the "trace_context" and "time_seconds" they were
+        # collected with, since the thread may have moved on to another trace by the time they are emitted
+        self._scraper.emit(stacktraces)
+
+
+@contextmanager
+def profile_labels(**labels) -> Iterator[None]:
+    """
+    Adds `labels` to the profiling samples taken while the block runs, e.g.
+
+        with profile_labels(tenant=tenant_id, job="export"):
+            ...
+
+    Labels nest, inner blocks add to or override the labels of outer ones. Values are converted to strings and keys
+    the profiler sets itself (e.g. trace_id) are ignored.
+    """
+    reserved = _RESERVED_LABEL_KEYS.intersection(labels)
+    if reserved:
+        _pylogger.warning("Ignoring reserved profile label keys: %s", ", ".join(sorted(reserved)))
+
+    merged = {
+        **(_profile_labels.get() or {}),
+        **{key: str(value) for key, value in labels.items() if key not in _RESERVED_LABEL_KEYS},
+    }
+    token = _profile_labels.set(merged)
+    _publish_thread_labels()
+    try:
+        yield
+    finally:
+        _profile_labels.reset(token)
+        _publish_thread_labels()
+
+
+def _publish_thread_labels():
+    labels = _profile_labels.get()
+    if labels:
+        _thread_labels[threading.get_ident()] = labels
+    else:
+        _thread_labels.pop(threading.get_ident(), None)
+
 
 def _start_profiling_if_enabled(env=None):
     env = env or Env()
@@ -82,15 +212,88 @@ def _start_profiling_if_enabled(env=None):
 
 
 def start_profiling(env=None):
+    global _continuous_profiling_context  # noqa PLW0603
     env = env or Env()
     interval_millis = env.getint(SPLUNK_PROFILER_CALL_STACK_INTERVAL, _DEFAULT_PROF_CALL_STACK_INTERVAL_MILLIS)
     svcname = env.getval(OTEL_SERVICE_NAME)
 
-    ctx = ProfilingContext(svcname, interval_millis)
+    exporters = _get_exporters(env)
+    consumers = []
+    if _EXPORTER_HOT_FUNCTIONS in exporters:
+        from splunk_otel.hot_functions import start_hot_functions
+
+        consumers.append(start_hot_functions(env).record)
+    if _EXPORTER_PPROF_FILE in exporters:
+        from splunk_otel.pprof_file import start_pprof_file_writer
+
+        consumers.append(start_pprof_file_writer(env, interval_millis).record)
+
+    ctx = ProfilingContext(svcname, interval_millis, export_otlp=_EXPORTER_OTLP in exporters, consumers=consumers)
     ctx.start()
+    # registered after the SDK providers, so it runs before they shut down at exit
+    atexit.register(ctx.shutdown)
+    _continuous_profiling_context = ctx
     return ctx
 
 
+def _reconfigure_profiling(env=None):
+    """
+    Applies the current SPLUNK_PROFILER_ENABLED and SPLUNK_PROFILER_CALL_STACK_INTERVAL values to the continuous
+    profiler, starting it if it was never started.
+    """
+    env = env or Env()
+    ctx = _continuous_profiling_context
+    if ctx is None:
+        _start_profiling_if_enabled(env)
+    elif env.is_true(SPLUNK_PROFILER_ENABLED):
+        ctx.set_interval(env.getint(SPLUNK_PROFILER_CALL_STACK_INTERVAL, _DEFAULT_PROF_CALL_STACK_INTERVAL_MILLIS))
+        ctx.start()
+    else:
+        ctx.pause_after(0)
+
+
+def _get_exporters(env) -> set[str]:
+    exporters = set()
+    for value in env.getval(SPLUNK_PROFILER_EXPORTER, _EXPORTER_OTLP).split(","):
+        exporter = value.strip().lower()
+        if exporter in _EXPORTERS:
+            exporters.add(exporter)
+        elif exporter:
+            _pylogger.warning("Unknown profiler exporter '%s' in %s", exporter, SPLUNK_PROFILER_EXPORTER)
+    if not exporters:
+        _pylogger.warning("No valid profiler exporter configured, using '%s'", _EXPORTER_OTLP)
+        exporters.add(_EXPORTER_OTLP)
+    return exporters
+
+
+def _force_flush_logs(timeout_millis: int) -> bool:
+    # the API's default logger provider has no force_flush
+    force_flush = getattr(get_logger_provider(), "force_flush", None)
+    if force_flush is None:
+        return True
+    return force_flush(timeout_millis) is not False
+
+
+def _mk_exporting_logger_provider(env):
+    """
+    Returns a logger provider exporting profiles over OTLP, for tools that send profiles from outside of an
+    instrumented process. Expects the distro to have configured the OTLP environment variables.
+    """
+    from opentelemetry.sdk._logs import LoggerProvider
+    from opentelemetry.sdk._logs.export import BatchLogRecordProcessor
+
+    protocol = (env.getval(OTEL_EXPORTER_OTLP_LOGS_PROTOCOL) or env.getval(OTEL_EXPORTER_OTLP_PROTOCOL)).strip()
+    if protocol in {"", "grpc"}:
+        from opentelemetry.exporter.otlp.proto.grpc._log_exporter import OTLPLogExporter
+    else:
+        from opentelemetry.exporter.otlp.proto.http._log_exporter import OTLPLogExporter
+
+    logger_provider = LoggerProvider(shutdown_on_exit=False)
+    exporter = OTLPLogExporter(endpoint=env.getval(SPLUNK_PROFILER_LOGS_ENDPOINT).strip() or None)
+    logger_provider.add_log_record_processor(BatchLogRecordProcessor(exporter))
+    return logger_provider
+
+
 def _mk_resource(service_name) -> Resource:
     return Resource.create(
         {
@@ -100,14 +303,22 @@ def _mk_resource(service_name) -> Resource:
     )
 
 
-def start_thread_context_tracking():
-    global _context_tracking_started  # noqa PLW0603
-    if _context_tracking_started:
-        return
-    _context_tracking_started = True
+def start_thread_context_tracking(env=None):
+    global _context_tracking_started, _span_attribute_label_keys  # noqa PLW0603
+    with _context_tracking_lock:
+        if _context_tracking_started:
+            return
+        _context_tracking_started = True
+
+        env = env or Env()
+        _span_attribute_label_keys = tuple(
+            key.strip()
+            for key in env.getval(SPLUNK_PROFILER_SPAN_ATTRIBUTE_LABELS, _DEFAULT_SPAN_ATTRIBUTE_LABELS).split(",")
+            if key.strip()
+        )
 
-    wrapt.wrap_function_wrapper(opentelemetry.context, "attach", _wrap_context_attach)
-    wrapt.wrap_function_wrapper(opentelemetry.context, "detach", _wrap_context_detach)
+        wrapt.wrap_function_wrapper(opentelemetry.context, "attach", _wrap_context_attach)
+        wrapt.wrap_function_wrapper(opentelemetry.context, "detach", _wrap_context_detach)
 
 
 def _wrap_context_attach(wrapped, _instance, args, kwargs):
@@ -125,7 +336,11 @@ def _wrap_context_attach(wrapped, _instance, args, kwargs):
                 context.trace_id,
                 context.span_id,
             )
+            if _span_attribute_label_keys:
+                _track_local_root_span(thread_id, span, context.trace_id)
 
+    if _thread_labels or _profile_labels.get() is not None:
+        _publish_thread_labels()
     return token
 
 
@@ -144,28 +359,95 @@ def _wrap_context_detach(wrapped, _instance, args, kwargs):
                     context.trace_id,
                     context.span_id,
                 )
+                if _span_attribute_label_keys:
+                    _track_local_root_span(thread_id, span, context.trace_id)
             else:
-                _thread_states[thread_id] = None
+                _thread_states.pop(thread_id, None)
+                _thread_root_spans.pop(thread_id, None)
         else:
-            _thread_states[thread_id] = None
-    return wrapped(*args, **kwargs)
+            _thread_states.pop(thread_id, None)
+            _thread_root_spans.pop(thread_id, None)
+    out = wrapped(*args, **kwargs)
+    if _thread_labels or _profile_labels.get() is not None:
+        _publish_thread_labels()
+    return out
+
+
+def _track_local_root_span(thread_id, span, trace_id):
+    if isinstance(span, ReadableSpan) and (span.parent is None or span.parent.is_remote):
+        _local_root_spans[trace_id] = span
+        root_span = span
+    else:
+        root_span = _local_root_spans.get(trace_id)
+
+    if root_span is None:
+        _thread_root_spans.pop(thread_id, None)
+    else:
+        _thread_root_spans[thread_id] = root_span
+
+
+def _span_attribute_labels(span) -> dict[str, str]:
+    attributes = span.attributes or {}
+    out = {}
+    for key in _span_attribute_label_keys:
+        value = attributes.get(key)
+        if value is not None:
+            out[key] = str(value)
+    return out
 
 
-def _collect_stacktraces():
+def _install_signal_handler(signal_name: str, callback: Callable[[], None]) -> bool:
+    """
+    Calls `callback` when the named signal (e.g. "SIGUSR2") is received, then chains to any previously installed
+    Python-level handler. Returns False if the signal can't be handled here.
+    """
+    signum = getattr(signal, signal_name, None)
+    if not isinstance(signum, signal.Signals):
+        _pylogger.warning("Signal %s is not available on this platform", signal_name)
+        return False
+    if threading.current_thread() is not threading.main_thread():
+        _pylogger.warning("Signal handler for %s can only be installed from the main thread", signal_name)
+        return False
+
+    previous = signal.getsignal(signum)
+
+    def handler(received_signum, frame):
+        callback()
+        if callable(previous):
+            previous(received_signum, frame)
+
+    signal.signal(signum, handler)
+    return True
+
+
+def _collect_stacktraces(current_frames=None):
     out = []
-    frames = sys._current_frames()  # noqa SLF001
+    if current_frames is None:
+        current_frames = sys._current_frames()  # noqa SLF001
+    # the sampling thread is the timer thread, or an application thread calling force_flush()
     profile_scraper_thread_id = threading.get_ident()
-    for thread_id, frame in frames.items():
-        if thread_id == profile_scraper_thread_id:
+    for thread_id, frame in current_frames.items():
+        if thread_id == profile_scraper_thread_id or thread_id in _timer_thread_ids:
+            continue
+        try:
+            stack_summary = _extract_stack_summary(frame)
+        except Exception:  # noqa: BLE001
+            # without a GIL the thread keeps running while its frames are walked; skip it for this sample
+            _pylogger.debug("Failed to walk the stack of thread %d", thread_id, exc_info=True)
             continue
-        stack_summary = _extract_stack_summary(frame)
         frames = [(sf.filename, sf.name, sf.lineno) for sf in stack_summary]
-        out.append(
-            {
-                "frames": frames,
-                "tid": thread_id,
-            }
-        )
+        stacktrace = {
+            "frames": frames,
+            "tid": thread_id,
+        }
+        labels = _thread_labels.get(thread_id)
+        root_span = _thread_root_spans.get(thread_id)
+        if root_span is not None:
+            # labels set with profile_labels() take precedence
+            labels = {**_span_attribute_labels(root_span), **(labels or {})}
+        if labels:
+            stacktrace["labels"] = labels
+        out.append(stacktrace)
     return out
 
 
@@ -179,7 +461,9 @@ class _ProfileScraper:
         collect_stacktraces_func=_collect_stacktraces,
         time_func=time.time,
         stacktrace_filter: Callable[[list[dict], dict], list[dict]] | None = None,
-        instrumentation_source: Literal["continuous", "snapshot"] | None = "continuous",
+        instrumentation_source: Literal["continuous", "snapshot", "flight_recorder"] | None = "continuous",
+        export_otlp: bool = True,  # noqa FBT001 FBT002
+        consumers: list[Callable[[list[dict]], None]] | None = None,
     ):
         self.resource = resource
         self.thread_states = thread_states
@@ -189,18 +473,45 @@ class _ProfileScraper:
         self.logger = logger
         self.stacktrace_filter = stacktrace_filter
         self.instrumentation_source = instrumentation_source
+        # export_otlp emits each sample as a pprof log record, consumers receive the sampled stacktraces as well
+        self.export_otlp = export_otlp
+        self.consumers = consumers or []
 
     def tick(self):
-        stacktraces = self.collect_stacktraces()
+        if self.collect_stacktraces is _collect_stacktraces:
+            # one snapshot of the running threads per tick, both to sample them and to prune the states of the others
+            current_frames = sys._current_frames()  # noqa SLF001
+            for states in (self.thread_states, _thread_labels, _thread_root_spans):
+                _prune_thread_states(states, current_frames.keys())
+            stacktraces = _collect_stacktraces(current_frames)
+        else:
+            stacktraces = self.collect_stacktraces()
 
         if self.stacktrace_filter is not None:
             stacktraces = self.stacktrace_filter(stacktraces, self.thread_states)
 
-        if len(stacktraces) == 0:
-            return
+        if self.export_otlp:
+            self.emit(stacktraces)
+        for consumer in self.consumers:
+            consumer(stacktraces)
+
+    def emit(self, stacktraces):
+        pending = [stacktraces]
+        while pending:
+            stacktraces = pending.pop()
+            if len(stacktraces) == 0:
+                continue
 
-        log_record = self.mk_log_record(stacktraces)
-        self.logger.emit(log_record)
+            log_record = self.mk_log_record(stacktraces)
+            if len(stacktraces) > 1 and len(log_record.log_record.body) > _MAX_RECORD_BYTES:
+                # halve until each part fits; stacktraces are in sample order, so each part covers a shorter window
+                middle = len(stacktraces) // 2
+                pending.extend((stacktraces[middle:], stacktraces[:middle]))
+                continue
+            self.logger.emit(log_record)
+
+    def emit_profile(self, pb_profile, total_frame_count: int):
+        self.logger.emit(self.mk_profile_log_record(pb_profile, total_frame_count, self.time()))
 
     def mk_log_record(self, stacktraces):
         lengths = (len(trace["frames"]) for trace in stacktraces)
@@ -209,6 +520,9 @@ class _ProfileScraper:
         time_seconds = self.time()
 
         pb_profile = _stacktraces_to_cpu_profile(stacktraces, self.thread_states, self.interval_millis, time_seconds)
+        return self.mk_profile_log_record(pb_profile, total_frame_count, time_seconds)
+
+    def mk_profile_log_record(self, pb_profile, total_frame_count: int, time_seconds: float):
         pb_profile_str = _pb_profile_to_str(pb_profile)
 
         span_context = SpanContext(
@@ -248,6 +562,17 @@ class _ProfileScraper:
         )
 
 
+def _prune_thread_states(thread_states, live_thread_ids):
+    """
+    Drops entries of threads that exited while executing a span or labelled block, so they don't accumulate and a
+    new thread that reuses the id doesn't inherit them. `live_thread_ids` must be taken before calling this.
+    """
+    for thread_id, state in list(thread_states.items()):
+        # a thread that just started with a reused id may have attached a span since the snapshot, keep its entry
+        if thread_id not in live_thread_ids and thread_states.get(thread_id) is state:
+            thread_states.pop(thread_id, None)
+
+
 def _pb_profile_to_str(pb_profile) -> str:
     serialized = pb_profile.SerializeToString()
     compressed = gzip.compress(serialized)
@@ -261,35 +586,52 @@ class _IntervalTimer:
         self.target = target
         self.thread = threading.Thread(target=self._loop, daemon=True)
         self.running = False
+        # a thread can only be started once, so start() does nothing once the timer has been stopped
+        self.stopped = False
         self.pause_at = None
         self.wakeup_event = threading.Event()
+        # start() is called from request threads, only one of them may start the thread
+        self.lock = threading.Lock()
 
     def start(self):
+        if self.stopped:
+            return
+
         self.pause_at = None
         self.wakeup_event.set()
 
         if self.running:
             return
 
-        self.running = True
-        self.thread.start()
+        with self.lock:
+            if self.running or self.stopped:
+                return
+            self.running = True
+            self.thread.start()
 
     def _loop(self):
-        while self.running:
-            start_time_seconds = time.monotonic()
-
-            if self.pause_at is not None and start_time_seconds >= self.pause_at:
-                self.wakeup_event.clear()  # clear event so next line will block
-                self.wakeup_event.wait()  # wait for event.set() (either via start() or stop())
-                continue
-
-            self.target()
-            elapsed_seconds = time.monotonic() - start_time_seconds
-            sleep_seconds = max(0, self.interval_seconds - elapsed_seconds)
-            time.sleep(sleep_seconds)
+        thread_id = threading.get_ident()
+        _timer_thread_ids.add(thread_id)
+        try:
+            while self.running:
+                start_time_seconds = time.monotonic()
+
+                if self.pause_at is not None and start_time_seconds >= self.pause_at:
+                    self.wakeup_event.clear()  # clear event so next line will block
+                    self.wakeup_event.wait()  # wait for event.set() (either via start() or stop())
+                    continue
+
+                self.target()
+                elapsed_seconds = time.monotonic() - start_time_seconds
+                sleep_seconds = max(0, self.interval_seconds - elapsed_seconds)
+                time.sleep(sleep_seconds)
+        finally:
+            _timer_thread_ids.discard(thread_id)
 
     def stop(self):
-        self.running = False
+        with self.lock:
+            self.stopped = True
+            self.running = False
         self.pause_at = None
         self.wakeup_event.set()  # unblock _loop() if waiting, so it can return and thread can exit
         if self.thread.is_alive():
@@ -298,6 +640,10 @@ class _IntervalTimer:
     def pause_after(self, seconds: float):
         self.pause_at = time.monotonic() + seconds
 
+    def paused(self) -> bool:
+        pause_at = self.pause_at
+        return pause_at is not None and time.monotonic() >= pause_at
+
 
 class _StringTable:
     def __init__(self):
@@ -306,7 +652,7 @@ class _StringTable:
     def index(self, token):
         idx = self.strings.get(token)
 
-        if idx:
+        if idx is not None:
             return idx
 
         idx = len(self.strings)
@@ -342,8 +688,12 @@ def _get_line(functions_table, str_table, file_name, function_name, line_no):
     return line
 
 
+def _function_key(file_name, function_name) -> str:
+    return f"{file_name}:{function_name}"
+
+
 def _get_function(functions_table, str_table, file_name, function_name):
-    key = f"{file_name}:{function_name}"
+    key = _function_key(file_name, function_name)
     func = functions_table.get(key)
 
     if func is None:
@@ -365,11 +715,18 @@ def _extract_stack_summary(frame):
     return out
 
 
-def _stacktraces_to_cpu_profile(stacktraces, thread_states, interval_millis, time_seconds):
+def _stacktraces_to_cpu_profile(stacktraces, thread_states, interval_millis, time_seconds, *, standard=False):
+    """
+    With `standard`, the profile also follows the parts of the pprof format the ingest doesn't need: an empty first
+    string, sample types, periods and a value per sample, so tools like `go tool pprof` can read it.
+    """
     str_table = _StringTable()
     locations_table = OrderedDict()
     functions_table = OrderedDict()
 
+    if standard:
+        str_table.index("")
+
     timestamp_unix_millis = int(time_seconds * 1e3)
 
     timestamp_key = str_table.index("source.event.time")
@@ -384,13 +741,29 @@ def _stacktraces_to_cpu_profile(stacktraces, thread_states, interval_millis, tim
     event_period_label.key = event_period_key
     event_period_label.num = interval_millis
 
+    interval_nanos = interval_millis * 1_000_000
+    if standard:
+        for value_type, unit in (("samples", "count"), ("wall", "nanoseconds")):
+            sample_type = profile_pb2.ValueType()
+            sample_type.type = str_table.index(value_type)
+            sample_type.unit = str_table.index(unit)
+            pb_profile.sample_type.append(sample_type)
+        pb_profile.period_type.type = str_table.index("wall")
+        pb_profile.period_type.unit = str_table.index("nanoseconds")
+        pb_profile.period = interval_nanos
+        pb_profile.default_sample_type = str_table.index("wall")
+        pb_profile.time_nanos = int(time_seconds * 1e9)
+
     samples = []
     for stacktrace in stacktraces:
         thread_id = stacktrace["tid"]
 
         timestamp_label = profile_pb2.Label()
         timestamp_label.key = timestamp_key
-        timestamp_label.num = timestamp_unix_millis
+        if "time_seconds" in stacktrace:
+            timestamp_label.num = int(stacktrace["time_seconds"] * 1e3)
+        else:
+            timestamp_label.num = timestamp_unix_millis
 
         thread_id_label = profile_pb2.Label()
         thread_id_label.key = thread_id_key
@@ -398,7 +771,7 @@ def _stacktraces_to_cpu_profile(stacktraces, thread_states, interval_millis, tim
 
         labels = [timestamp_label, event_period_label, thread_id_label]
 
-        trace_context = thread_states.get(thread_id)
+        trace_context = stacktrace.get("trace_context", thread_states.get(thread_id))
         if trace_context:
             (trace_id, span_id) = trace_context
 
@@ -412,6 +785,12 @@ def _stacktraces_to_cpu_profile(stacktraces, thread_states, interval_millis, tim
             span_id_label.str = str_table.index(f"{span_id:08x}")
             labels.append(span_id_label)
 
+        for key, value in stacktrace.get("labels", {}).items():
+            user_label = profile_pb2.Label()
+            user_label.key = str_table.index(key)
+            user_label.str = str_table.index(value)
+            labels.append(user_label)
+
         sample = profile_pb2.Sample()
 
         location_ids = []
@@ -422,6 +801,8 @@ def _stacktraces_to_cpu_profile(stacktraces, thread_states, interval_millis, tim
 
         sample.location_id.extend(location_ids)
         sample.label.extend(labels)
+        if standard:
+            sample.value.extend([1, interval_nanos])
 
         samples.append(sample)
 
@@ -12,10 +12,13 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import threading
+import time
 import typing
 import random
 
 from opentelemetry import baggage, trace
+from opentelemetry.context import create_key, get_value, set_value
 from opentelemetry.context.context import Context
 from opentelemetry.instrumentation.propagators import (
     _HTTP_HEADER_ACCESS_CONTROL_EXPOSE_HEADERS,
@@ -27,6 +30,16 @@ from opentelemetry.sdk.trace.sampling import TraceIdRatioBased, Decision
 from opentelemetry.trace import format_span_id, format_trace_id
 
 _SPLUNK_TRACE_SNAPSHOT_VOLUME = "splunk.trace.snapshot.volume"
+_SPLUNK_SNAPSHOT_HEADER = "splunk-snapshot"
+_SNAPSHOT_VOLUME_KEY = create_key("splunk-snapshot-volume")
+# set when the trace was explicitly not selected, i.e. turned off by the rate limit here or upstream, so that
+# downstream services don't select it on their own
+_SNAPSHOT_FORCED_OFF_KEY = create_key("splunk-snapshot-forced-off")
+
+_CARRIER_BAGGAGE = "baggage"
+_CARRIER_HEADER = "header"
+_CARRIER_BOTH = "both"
+_CARRIERS = frozenset((_CARRIER_BAGGAGE, _CARRIER_HEADER, _CARRIER_BOTH))
 
 
 class ServerTimingResponsePropagator(ResponsePropagator):
@@ -69,40 +82,126 @@ def _with_volume_baggage(is_selected: bool, context: typing.Optional[Context]) -
     return baggage.set_baggage(_SPLUNK_TRACE_SNAPSHOT_VOLUME, baggage_value, context)
 
 
+def _get_snapshot_volume(context: Context | None) -> str | None:
+    """
+    Returns the snapshot selection decision ("highest" or "off") for the context, whichever carrier it arrived in.
+    """
+    volume = get_value(_SNAPSHOT_VOLUME_KEY, context)
+    if volume is not None:
+        return volume
+    return baggage.get_baggage(_SPLUNK_TRACE_SNAPSHOT_VOLUME, context)
+
+
+class _TokenBucket:
+    def __init__(self, rate_per_second: float, capacity: float | None = None, time_func=time.monotonic):
+        self.rate_per_second = rate_per_second
+        self.capacity = max(1.0, rate_per_second) if capacity is None else capacity
+        self._time = time_func
+        self._tokens = self.capacity
+        self._last_refill = time_func()
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            now = self._time()
+            self._tokens = min(self.capacity, self._tokens + (now - self._last_refill) * self.rate_per_second)
+            self._last_refill = now
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
 class CallgraphsPropagator(textmap.TextMapPropagator):
+    """
+    Decides whether a trace is selected for snapshot profiling and propagates the decision so that downstream
+    services honor it. Only decisions made here are subject to `max_selections_per_second`; decisions received from
+    upstream services are kept as-is so the whole trace is profiled consistently.
+
+    The `carrier` controls how the decision is propagated:
+    - "baggage": `splunk.trace.snapshot.volume=highest|off` baggage on every request
+    - "header": a `splunk-snapshot: 1` header on selected requests only, and `splunk-snapshot: 0` on requests of
+      traces turned off by the rate limit; nothing otherwise
+    - "both": the header plus `highest` or `off` baggage on the same requests, for services that only read baggage
+
+    Incoming decisions are accepted from either carrier regardless of this setting.
+    """
+
     selection_probability: float
 
-    def __init__(self, selection_probability: float = 0.01):
+    def __init__(
+        self,
+        selection_probability: float = 0.01,
+        max_selections_per_second: float = 0,
+        carrier: typing.Literal["baggage", "header", "both"] = _CARRIER_BAGGAGE,
+    ):
+        self.carrier = carrier
         self.selection_probability = selection_probability
         self.sampler = TraceIdRatioBased(selection_probability)
+        self.max_selections_per_second = max_selections_per_second
+        self._rate_limiter = _TokenBucket(max_selections_per_second) if max_selections_per_second > 0 else None
 
-    def extract(self, carrier, context, getter):
-        volume_baggage = baggage.get_baggage(_SPLUNK_TRACE_SNAPSHOT_VOLUME, context)
+    def extract(self, carrier, context=None, getter=textmap.default_getter):
+        if self.carrier != _CARRIER_BAGGAGE and getter is not None:
+            header = getter.get(carrier, _SPLUNK_SNAPSHOT_HEADER)
+            if header and header[0].strip() == "1":
+                return self._with_volume(True, context)
+            if header and header[0].strip() == "0":
+                return self._with_volume(False, context, forced=True)
 
-        if volume_baggage is None:
-            return self._attach_volume_baggage(context)
+        volume = _get_snapshot_volume(context)
 
-        if volume_baggage in {"highest", "off"}:
+        if volume is None:
+            return self._attach_volume(context)
+
+        if volume in {"highest", "off"}:
             return context
 
-        return self._attach_volume_baggage(context)
+        return self._attach_volume(context)
 
-    def inject(self, carrier, context, setter):
-        pass
+    def inject(self, carrier, context=None, setter=textmap.default_setter):
+        if self.carrier == _CARRIER_BAGGAGE:
+            return
+        if _get_snapshot_volume(context) == "highest":
+            setter.set(carrier, _SPLUNK_SNAPSHOT_HEADER, "1")
+        elif get_value(_SNAPSHOT_FORCED_OFF_KEY, context):
+            setter.set(carrier, _SPLUNK_SNAPSHOT_HEADER, "0")
 
     def fields(self) -> set[str]:
-        return set()
+        if self.carrier == _CARRIER_BAGGAGE:
+            return set()
+        return {_SPLUNK_SNAPSHOT_HEADER}
 
-    def _attach_volume_baggage(self, context: Context | None) -> Context:
+    def _with_volume(self, is_selected: bool, context: Context | None, *, forced: bool = False) -> Context:  # noqa FBT001
+        """
+        Records the decision in the context. `forced` marks a trace that is not selected even though downstream
+        services could select it on their own, so the header carriers propagate the "off" decision too.
+        """
+        if self.carrier == _CARRIER_BAGGAGE:
+            return _with_volume_baggage(is_selected, context)
+
+        context = set_value(_SNAPSHOT_VOLUME_KEY, "highest" if is_selected else "off", context)
+        if forced:
+            context = set_value(_SNAPSHOT_FORCED_OFF_KEY, True, context)
+        if self.carrier == _CARRIER_BOTH and (is_selected or forced):
+            context = _with_volume_baggage(is_selected, context)
+        return context
+
+    def _attach_volume(self, context: Context | None) -> Context:
         span = trace.get_current_span(context)
 
         if not span.get_span_context().is_valid:
             is_selected = random.random() < self.selection_probability  # noqa S311
-            return _with_volume_baggage(is_selected, context)
-
-        is_selected = (
-            self.sampler.should_sample(context, span.get_span_context().trace_id, "splunk.snapshot.profiling").decision
-            == Decision.RECORD_AND_SAMPLE
-        )
-
-        return _with_volume_baggage(is_selected, context)
+        else:
+            is_selected = (
+                self.sampler.should_sample(
+                    context, span.get_span_context().trace_id, "splunk.snapshot.profiling"
+                ).decision
+                == Decision.RECORD_AND_SAMPLE
+            )
+
+        # only spend a token on traces the probability already selected, so the cap doesn't skew the ratio
+        if is_selected and self._rate_limiter is not None and not self._rate_limiter.try_acquire():
+            return self._with_volume(False, context, forced=True)
+
+        return self._with_volume(is_selected, context)
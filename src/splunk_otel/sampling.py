@@ -0,0 +1,322 @@
+# Copyright Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Trace samplers provided by the distro, selected by name with OTEL_TRACES_SAMPLER.
+
+`splunk_adjustable` samples new traces with the ratio in OTEL_TRACES_SAMPLER_ARG, capped at
+SPLUNK_TRACES_SAMPLER_RATE_LIMIT new traces per second, and follows the parent's decision otherwise.
+
+`splunk_throughput` samples about SPLUNK_TRACES_SAMPLER_TARGET_RATE new traces per second, whatever the traffic, by
+adjusting its ratio to the rate of new traces seen over the last seconds. The ratio is recorded in the OpenTelemetry
+tracestate (`ot=th:...`) of sampled traces so downstream services and backends can tell how many traces each one
+stands for.
+
+The settings of both can be changed while the application runs, e.g. through OpAMP remote config.
+"""
+
+import collections
+import itertools
+import logging
+import threading
+import time
+from typing import NamedTuple
+
+from opentelemetry.sdk.environment_variables import OTEL_TRACES_SAMPLER_ARG
+from opentelemetry.sdk.trace.sampling import (
+    Decision,
+    ParentBased,
+    Sampler,
+    SamplingResult,
+    TraceIdRatioBased,
+)
+from opentelemetry.trace import TraceState
+
+from splunk_otel.env import SPLUNK_TRACES_SAMPLER_RATE_LIMIT, SPLUNK_TRACES_SAMPLER_TARGET_RATE, Env
+
+_DEFAULT_RATIO = 1.0
+_DEFAULT_TARGET_RATE = 10.0
+_WINDOW_SECONDS = 10
+# consistent probability sampling: a trace is sampled if the 56 lowest bits of its id are at least the threshold
+_RANDOMNESS_BITS = 56
+_RANDOMNESS_MASK = (1 << _RANDOMNESS_BITS) - 1
+_MAX_THRESHOLD = 1 << _RANDOMNESS_BITS
+# thresholds are rounded to 4 hex digits to keep the tracestate short
+_THRESHOLD_PRECISION_BITS = _RANDOMNESS_BITS - 16
+_OT_TRACESTATE_KEY = "ot"
+_THRESHOLD_PREFIX = "th:"
+
+_pylogger = logging.getLogger(__name__)
+
+# the sampler created by an OTEL_TRACES_SAMPLER entry point, kept so it can be reconfigured at runtime
+_sampler: "AdjustableSampler | ThroughputSampler | None" = None
+
+
+class _RateWindow:
+    """
+    Counts the traces sampled during one second. A window is never reset, a new one replaces it, so threads can share
+    it without a lock: next() on itertools.count is atomic.
+    """
+
+    def __init__(self, second: int):
+        self.second = second
+        self.count = itertools.count()
+
+
+class _RateLimitedRatioSampler(Sampler):
+    """
+    Samples traces by trace id ratio, then drops those over `max_per_second`. Threads racing to replace the window at
+    the start of a second may each sample a few more traces than the limit.
+    """
+
+    def __init__(self, ratio: float, max_per_second: float, time_func=time.monotonic):
+        self._ratio_sampler = TraceIdRatioBased(ratio)
+        self._max_per_second = max_per_second
+        self._time = time_func
+        self._window = _RateWindow(int(time_func()))
+
+    def should_sample(
+        self, parent_context, trace_id, name, kind=None, attributes=None, links=None, trace_state=None
+    ) -> SamplingResult:
+        result = self._ratio_sampler.should_sample(parent_context, trace_id, name, kind, attributes, links, trace_state)
+        if result.decision is Decision.DROP or self._max_per_second <= 0:
+            return result
+
+        second = int(self._time())
+        window = self._window
+        if window.second != second:
+            window = _RateWindow(second)
+            self._window = window
+        if next(window.count) < self._max_per_second:
+            return result
+        return SamplingResult(Decision.DROP, None, result.trace_state)
+
+    def get_description(self) -> str:
+        return f"RateLimited{{{self._ratio_sampler.get_description()},{self._max_per_second:g}/s}}"
+
+
+class _AdjustableSamplerState(NamedTuple):
+    sampler: Sampler
+    ratio: float
+    max_per_second: float
+
+
+class AdjustableSampler(Sampler):
+    """
+    A parent based sampler whose ratio and rate limit for new traces can be changed at any time. `update()` builds a
+    new delegate and swaps it in with a single assignment, so sampling decisions never take a lock.
+    """
+
+    def __init__(self, ratio: float = _DEFAULT_RATIO, max_per_second: float = 0):
+        self._state = self._mk_state(ratio, max_per_second)
+
+    @staticmethod
+    def _mk_state(ratio: float, max_per_second: float) -> _AdjustableSamplerState:
+        return _AdjustableSamplerState(
+            ParentBased(_RateLimitedRatioSampler(ratio, max_per_second)), ratio, max_per_second
+        )
+
+    @property
+    def ratio(self) -> float:
+        return self._state.ratio
+
+    @property
+    def max_per_second(self) -> float:
+        return self._state.max_per_second
+
+    def update(self, ratio: float | None = None, max_per_second: float | None = None):
+        state = self._state
+        self._state = self._mk_state(
+            state.ratio if ratio is None else ratio,
+            state.max_per_second if max_per_second is None else max_per_second,
+        )
+
+    def should_sample(
+        self, parent_context, trace_id, name, kind=None, attributes=None, links=None, trace_state=None
+    ) -> SamplingResult:
+        return self._state.sampler.should_sample(parent_context, trace_id, name, kind, attributes, links, trace_state)
+
+    def get_description(self) -> str:
+        return f"AdjustableSampler{{{self._state.sampler.get_description()}}}"
+
+
+def _threshold(ratio: float) -> int:
+    threshold = _MAX_THRESHOLD - round(ratio * _MAX_THRESHOLD)
+    half = 1 << (_THRESHOLD_PRECISION_BITS - 1)
+    return min(_MAX_THRESHOLD, (threshold + half) >> _THRESHOLD_PRECISION_BITS << _THRESHOLD_PRECISION_BITS)
+
+
+def _encode_threshold(threshold: int) -> str:
+    return f"{threshold:014x}".rstrip("0") or "0"
+
+
+def _with_threshold(trace_state: TraceState | None, threshold: int) -> TraceState:
+    """
+    Sets the `th` sub-key of the `ot` tracestate entry, keeping its other sub-keys.
+    """
+    trace_state = trace_state or TraceState()
+    fields = [
+        field
+        for field in trace_state.get(_OT_TRACESTATE_KEY, "").split(";")
+        if field and not field.startswith(_THRESHOLD_PREFIX)
+    ]
+    value = ";".join([_THRESHOLD_PREFIX + _encode_threshold(threshold), *fields])
+    if _OT_TRACESTATE_KEY in trace_state:
+        return trace_state.update(_OT_TRACESTATE_KEY, value)
+    return trace_state.add(_OT_TRACESTATE_KEY, value)
+
+
+class _ThroughputRootSampler(Sampler):
+    """
+    Counts new traces in one second windows. When a second ends, the thread that notices updates the threshold from
+    the arrival rate over the last `_WINDOW_SECONDS`; every other decision only reads it, without a lock.
+    """
+
+    def __init__(self, target_per_second: float, time_func=time.monotonic):
+        self.target_per_second = target_per_second
+        self._time = time_func
+        self._started_at = int(time_func())
+        self._window = _RateWindow(self._started_at)
+        self._arrivals: collections.deque[tuple[int, int]] = collections.deque()
+        self._lock = threading.Lock()
+        self.ratio = 1.0
+        # the threshold and the tracestate of sampled new traces, which usually have no tracestate yet, replaced
+        # together since building a TraceState is much slower than the decision itself
+        self._decision = (0, _with_threshold(None, 0))
+
+    def should_sample(
+        self, parent_context, trace_id, name, kind=None, attributes=None, links=None, trace_state=None
+    ) -> SamplingResult:
+        second = int(self._time())
+        window = self._window
+        if window.second != second:
+            window = self._next_window(second)
+        next(window.count)
+
+        threshold, sampled_trace_state = self._decision
+        if trace_id & _RANDOMNESS_MASK < threshold:
+            return SamplingResult(Decision.DROP, None, trace_state)
+        if trace_state:
+            sampled_trace_state = _with_threshold(trace_state, threshold)
+        return SamplingResult(Decision.RECORD_AND_SAMPLE, attributes, sampled_trace_state)
+
+    def _next_window(self, second: int) -> _RateWindow:
+        with self._lock:
+            window = self._window
+            if window.second == second:
+                return window  # another thread got here first
+            self._arrivals.append((window.second, next(window.count)))
+            self._window = _RateWindow(second)
+            self._update_ratio(second)
+            return self._window
+
+    def set_target(self, target_per_second: float):
+        with self._lock:
+            self.target_per_second = target_per_second
+            self._update_ratio(int(self._time()))
+
+    def _update_ratio(self, second: int):
+        # the rate is averaged over the complete seconds [oldest, second), and only their counts are kept
+        oldest = max(second - _WINDOW_SECONDS, self._started_at)
+        while self._arrivals and self._arrivals[0][0] < oldest:
+            self._arrivals.popleft()
+        arrivals_per_second = sum(count for (_, count) in self._arrivals) / max(1, second - oldest)
+        ratio = 1.0 if arrivals_per_second <= self.target_per_second else self.target_per_second / arrivals_per_second
+        self.ratio = ratio
+        threshold = _threshold(ratio)
+        # a ratio of 0 has no threshold encoding, but then nothing is sampled either
+        self._decision = (threshold, _with_threshold(None, threshold) if threshold < _MAX_THRESHOLD else None)
+
+    def get_description(self) -> str:
+        return f"ThroughputRootSampler{{{self.target_per_second:g}/s}}"
+
+
+class ThroughputSampler(Sampler):
+    """
+    A parent based sampler that samples about `target_per_second` new traces per second. Its ratio follows the rate
+    of new traces, so bursts above the target are sampled at the ratio of the last seconds until it catches up.
+    """
+
+    def __init__(self, target_per_second: float = _DEFAULT_TARGET_RATE, time_func=time.monotonic):
+        self._root = _ThroughputRootSampler(target_per_second, time_func)
+        self._delegate = ParentBased(self._root)
+
+    @property
+    def target_per_second(self) -> float:
+        return self._root.target_per_second
+
+    @property
+    def ratio(self) -> float:
+        return self._root.ratio
+
+    def update(self, target_per_second: float):
+        self._root.set_target(target_per_second)
+
+    def should_sample(
+        self, parent_context, trace_id, name, kind=None, attributes=None, links=None, trace_state=None
+    ) -> SamplingResult:
+        return self._delegate.should_sample(parent_context, trace_id, name, kind, attributes, links, trace_state)
+
+    def get_description(self) -> str:
+        return f"ThroughputSampler{{{self._delegate.get_description()}}}"
+
+
+def _get_ratio(env) -> float:
+    ratio = env.getfloat(OTEL_TRACES_SAMPLER_ARG, _DEFAULT_RATIO)
+    if not 0 <= ratio <= 1:
+        _pylogger.warning("Invalid value of '%s' for env var '%s'", ratio, OTEL_TRACES_SAMPLER_ARG)
+        return _DEFAULT_RATIO
+    return ratio
+
+
+def _get_target_rate(env) -> float:
+    target_rate = env.getfloat(SPLUNK_TRACES_SAMPLER_TARGET_RATE, _DEFAULT_TARGET_RATE)
+    if not target_rate >= 0:
+        _pylogger.warning("Invalid value of '%s' for env var '%s'", target_rate, SPLUNK_TRACES_SAMPLER_TARGET_RATE)
+        return _DEFAULT_TARGET_RATE
+    return target_rate
+
+
+def _adjustable_sampler_factory(_arg: str | None) -> AdjustableSampler:
+    """
+    Entry point for OTEL_TRACES_SAMPLER=splunk_adjustable. Reads OTEL_TRACES_SAMPLER_ARG from the env rather than
+    `_arg` so that both settings are parsed the same way here and in _reconfigure_sampler.
+    """
+    global _sampler  # noqa PLW0603
+    env = Env()
+    _sampler = AdjustableSampler(_get_ratio(env), env.getfloat(SPLUNK_TRACES_SAMPLER_RATE_LIMIT, 0))
+    return _sampler
+
+
+def _throughput_sampler_factory(_arg: str | None) -> ThroughputSampler:
+    """
+    Entry point for OTEL_TRACES_SAMPLER=splunk_throughput.
+    """
+    global _sampler  # noqa PLW0603
+    _sampler = ThroughputSampler(_get_target_rate(Env()))
+    return _sampler
+
+
+def _reconfigure_sampler(env=None):
+    """
+    Applies the current sampler settings to the distro sampler, if one is in use.
+    """
+    env = env or Env()
+    sampler = _sampler
+    if isinstance(sampler, AdjustableSampler):
+        sampler.update(_get_ratio(env), env.getfloat(SPLUNK_TRACES_SAMPLER_RATE_LIMIT, 0))
+    elif isinstance(sampler, ThroughputSampler):
+        sampler.update(_get_target_rate(env))
+    else:
+        _pylogger.debug("Not updating the trace sampler, no distro sampler is in use")
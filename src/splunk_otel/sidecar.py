@@ -0,0 +1,316 @@
+# Copyright Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Out-of-process profiling.
+
+With SPLUNK_PROFILER_SHARED_CONTEXT_ENABLED, the instrumented process only publishes which trace and span each thread
+is executing into a small shared memory region. A sidecar started with
+
+    splunk-otel-sidecar-profiler --pid <pid>
+
+reads the thread stacks of that process with py-spy (https://github.com/benfred/py-spy), labels them with the
+published trace context and emits the same profile log records as the in-process profiler.
+"""
+
+import argparse
+import atexit
+import json
+import logging
+import os
+import struct
+import subprocess
+import sys
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+from opentelemetry.sdk.environment_variables import OTEL_SERVICE_NAME
+
+from splunk_otel.env import SPLUNK_PROFILER_CALL_STACK_INTERVAL, SPLUNK_PROFILER_SHARED_CONTEXT_ENABLED, Env
+from splunk_otel.profile import (
+    _DEFAULT_PROF_CALL_STACK_INTERVAL_MILLIS,
+    _SCOPE_NAME,
+    _SCOPE_VERSION,
+    _IntervalTimer,
+    _mk_exporting_logger_provider,
+    _mk_resource,
+    _ProfileScraper,
+    _thread_states,
+    start_thread_context_tracking,
+)
+
+_MAGIC = 0x53504C4B  # "SPLK"
+_VERSION = 2
+# magic, version, sequence, thread count, owner pid, owner start time
+_HEADER = struct.Struct("<IIQIIQ")
+# thread id, trace id high and low 64 bits, span id
+_SLOT = struct.Struct("<QQQQ")
+_MAX_THREADS = 1024
+_SIZE = _HEADER.size + _SLOT.size * _MAX_THREADS
+_READ_ATTEMPTS = 10
+# independent of the sampling interval: the sidecar samples on its own schedule, and a stale mapping labels its
+# stacks with spans that already ended
+_PUBLISH_INTERVAL_MILLIS = 10
+_UINT64_MASK = (1 << 64) - 1
+
+_pylogger = logging.getLogger(__name__)
+
+
+def _shared_memory_name(pid: int) -> str:
+    return f"splunk_otel_{pid}"
+
+
+def _process_start_time(pid: int) -> int:
+    """
+    Returns the start time of `pid` in clock ticks since boot, or 0 if it can't be read. Together with the pid it
+    identifies a process even when the pid is reused.
+    """
+    try:
+        with open(f"/proc/{pid}/stat") as stat_file:
+            stat = stat_file.read()
+    except OSError:
+        return 0
+    # the command name in parentheses may contain spaces, the start time is the 20th field after it
+    return int(stat[stat.rfind(")") + 2 :].split()[19])
+
+
+def _owner_is_alive(pid: int, start_time: int) -> bool:
+    if start_time == 0 or not os.path.exists("/proc/self/stat"):
+        # without a recorded start time the owner can't be told apart from a process reusing its pid
+        return True
+    return _process_start_time(pid) == start_time
+
+
+class _ThreadStatePublisher:
+    """
+    Copies the thread id -> (trace id, span id) mapping into shared memory whenever it changed since the last
+    publish. Writes are wrapped in a sequence lock (the sequence is odd while a write is in progress) so the reader
+    never sees a torn update.
+    """
+
+    def __init__(self, thread_states, name: str):
+        self._thread_states = thread_states
+        pid = os.getpid()
+        self._owner = (pid, _process_start_time(pid))
+        try:
+            self._shm = shared_memory.SharedMemory(name=name, create=True, size=_SIZE)
+        except FileExistsError:
+            self._unlink_stale(name)
+            self._shm = shared_memory.SharedMemory(name=name, create=True, size=_SIZE)
+        self._sequence = 0
+        self._published = {}
+        self._write(self._published)
+
+    def publish(self):
+        thread_states = dict(self._thread_states)
+        if thread_states != self._published:
+            self._write(thread_states)
+            self._published = thread_states
+
+    def close(self):
+        self._shm.close()
+        self._shm.unlink()
+
+    @staticmethod
+    def _unlink_stale(name: str):
+        """
+        Unlinks a segment left behind by an earlier process with the same pid that didn't exit cleanly. Raises
+        FileExistsError if the segment may still be in use.
+        """
+        stale = shared_memory.SharedMemory(name=name)
+        try:
+            magic, version, _, _, owner_pid, owner_start_time = _HEADER.unpack_from(stale.buf, 0)
+        except struct.error:
+            magic = version = None
+        if magic != _MAGIC or version != _VERSION or _owner_is_alive(owner_pid, owner_start_time):
+            stale.close()
+            raise FileExistsError(name)
+        _pylogger.warning("Replacing stale shared memory segment %s", name)
+        stale.close()
+        stale.unlink()
+
+    def _write(self, thread_states: dict):
+        buf = self._shm.buf
+        items = [item for item in thread_states.items() if item[1] is not None][:_MAX_THREADS]
+
+        self._sequence += 1
+        _HEADER.pack_into(buf, 0, _MAGIC, _VERSION, self._sequence, 0, *self._owner)
+        for index, (thread_id, (trace_id, span_id)) in enumerate(items):
+            _SLOT.pack_into(
+                buf,
+                _HEADER.size + index * _SLOT.size,
+                thread_id & _UINT64_MASK,
+                trace_id >> 64,
+                trace_id & _UINT64_MASK,
+                span_id,
+            )
+        self._sequence += 1
+        _HEADER.pack_into(buf, 0, _MAGIC, _VERSION, self._sequence, len(items), *self._owner)
+
+
+class _ThreadStateReader:
+    def __init__(self, name: str):
+        self._shm = shared_memory.SharedMemory(name=name)
+        if sys.version_info < (3, 13):
+            # attaching registers the segment with this process' resource tracker, which would unlink it at exit
+            resource_tracker.unregister(self._shm._name, "shared_memory")  # noqa: SLF001
+
+    def read(self) -> dict | None:
+        buf = self._shm.buf
+        for _ in range(_READ_ATTEMPTS):
+            magic, version, sequence, count, _, _ = _HEADER.unpack_from(buf, 0)
+            if magic != _MAGIC or version != _VERSION:
+                return None
+            if sequence % 2:
+                continue
+            thread_states = {}
+            for index in range(count):
+                thread_id, trace_id_high, trace_id_low, span_id = _SLOT.unpack_from(
+                    buf, _HEADER.size + index * _SLOT.size
+                )
+                thread_states[thread_id] = ((trace_id_high << 64) | trace_id_low, span_id)
+            if _HEADER.unpack_from(buf, 0)[2] == sequence:
+                return thread_states
+        return None
+
+    def close(self):
+        self._shm.close()
+
+
+def _start_shared_context_if_enabled(env=None):
+    env = env or Env()
+    if env.is_true(SPLUNK_PROFILER_SHARED_CONTEXT_ENABLED):
+        start_shared_context()
+
+
+def start_shared_context():
+    start_thread_context_tracking()
+    name = _shared_memory_name(os.getpid())
+    try:
+        publisher = _ThreadStatePublisher(_thread_states, name)
+    except FileExistsError:
+        _pylogger.warning("Shared memory segment %s may still be in use, the sidecar profiler is disabled", name)
+        return None
+    except Exception:
+        # only the sidecar loses trace context, the rest of the SDK keeps working
+        _pylogger.exception("Failed to publish trace context to shared memory, the sidecar profiler is disabled")
+        return None
+    timer = _IntervalTimer(_PUBLISH_INTERVAL_MILLIS, publisher.publish)
+    timer.start()
+
+    def stop():
+        timer.stop()
+        publisher.close()
+
+    atexit.register(stop)
+    return publisher
+
+
+def _py_spy_stacktraces(pid: int, py_spy: str = "py-spy") -> list[dict] | None:
+    """
+    Returns the Python stacks of all threads of `pid` read by `py-spy dump`, or None if the process is gone.
+    """
+    completed = subprocess.run(
+        [py_spy, "dump", "--pid", str(pid), "--json", "--nonblocking"],
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    if completed.returncode != 0:
+        _pylogger.debug("py-spy dump failed: %s", completed.stderr.strip())
+        return None
+
+    out = []
+    for thread in json.loads(completed.stdout):
+        frames = [(frame["filename"], frame["name"], frame.get("line", 0)) for frame in reversed(thread["frames"])]
+        out.append({"tid": thread["thread_id"], "frames": frames})
+    return out
+
+
+class _SidecarProfiler:
+    def __init__(self, pid: int, scraper: _ProfileScraper, reader: _ThreadStateReader | None, stacktraces_func):
+        self._pid = pid
+        self._scraper = scraper
+        self._reader = reader
+        self._stacktraces = stacktraces_func
+
+    def tick(self) -> bool:
+        stacktraces = self._stacktraces(self._pid)
+        if stacktraces is None:
+            return False
+
+        thread_states = (self._reader.read() if self._reader is not None else None) or {}
+        time_seconds = time.time()
+        for stacktrace in stacktraces:
+            stacktrace["time_seconds"] = time_seconds
+            trace_context = thread_states.get(stacktrace["tid"] & _UINT64_MASK)
+            if trace_context is not None:
+                stacktrace["trace_context"] = trace_context
+
+        self._scraper.emit(stacktraces)
+        return True
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pid", type=int, required=True, help="Process to profile.")
+    parser.add_argument("--service-name", default=None, help="Service name, defaults to OTEL_SERVICE_NAME.")
+    parser.add_argument(
+        "--interval",
+        type=int,
+        default=None,
+        help="Sampling interval in ms, defaults to SPLUNK_PROFILER_CALL_STACK_INTERVAL.",
+    )
+    parser.add_argument("--py-spy", default="py-spy", help="Path to the py-spy executable.")
+    args = parser.parse_args(argv)
+
+    from splunk_otel.distro import SplunkDistro
+
+    env = Env()
+    if args.service_name:
+        env.setval(OTEL_SERVICE_NAME, args.service_name)
+    SplunkDistro().configure()
+    interval_millis = args.interval or env.getint(
+        SPLUNK_PROFILER_CALL_STACK_INTERVAL, _DEFAULT_PROF_CALL_STACK_INTERVAL_MILLIS
+    )
+
+    try:
+        reader = _ThreadStateReader(_shared_memory_name(args.pid))
+    except FileNotFoundError:
+        _pylogger.warning("Process %d does not publish trace context, profiles won't be linked to traces", args.pid)
+        reader = None
+
+    logger_provider = _mk_exporting_logger_provider(env)
+    scraper = _ProfileScraper(
+        _mk_resource(env.getval(OTEL_SERVICE_NAME)),
+        {},
+        interval_millis,
+        logger_provider.get_logger(_SCOPE_NAME, _SCOPE_VERSION),
+    )
+    profiler = _SidecarProfiler(args.pid, scraper, reader, lambda pid: _py_spy_stacktraces(pid, args.py_spy))
+
+    try:
+        while True:
+            start_seconds = time.monotonic()
+            if not profiler.tick():
+                _pylogger.info("Process %d is gone, stopping", args.pid)
+                break
+            time.sleep(max(0.0, interval_millis / 1e3 - (time.monotonic() - start_seconds)))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if reader is not None:
+            reader.close()
+        logger_provider.shutdown()
+    return 0
@@ -0,0 +1,195 @@
+# Copyright Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Span size accounting and byte budget.
+
+Estimates the encoded size of each ended span and, with SPLUNK_SPAN_SIZE_METRICS_ENABLED, reports it per
+instrumentation scope in the `splunk.span.size` histogram. With SPLUNK_SPAN_MAX_BYTES, spans estimated above that size
+lose their largest events, then their largest attributes, until they fit.
+"""
+
+import logging
+
+from opentelemetry.attributes import BoundedAttributes
+from opentelemetry.context import Context
+from opentelemetry.metrics import get_meter
+from opentelemetry.sdk.trace import Event, ReadableSpan, Span, SpanProcessor
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, SpanExporter
+from opentelemetry.sdk.util import BoundedList
+
+from splunk_otel.__about__ import __version__ as version
+from splunk_otel.env import SPLUNK_SPAN_MAX_BYTES, SPLUNK_SPAN_SIZE_METRICS_ENABLED, Env
+
+# rough OTLP protobuf overhead of a span without its name and collections: ids, timestamps, kind, status and tags
+_SPAN_OVERHEAD_BYTES = 64
+_EVENT_OVERHEAD_BYTES = 16
+_LINK_OVERHEAD_BYTES = 32
+_ATTRIBUTE_OVERHEAD_BYTES = 4
+_SCALAR_BYTES = 9
+_SCOPE_NAME_ATTR = "otel.scope.name"
+_SIZE_BUCKETS = (256, 512, 1024, 2048, 4096, 8192, 16384, 32768, 65536, 131072, 262144, 524288, 1048576)
+
+_pylogger = logging.getLogger(__name__)
+
+
+def _value_size(value) -> int:
+    if isinstance(value, str | bytes):
+        # characters rather than UTF-8 bytes, which is exact for ASCII and avoids encoding every value
+        return len(value) + 2
+    if isinstance(value, list | tuple):
+        return sum(_value_size(item) for item in value) + 2
+    return _SCALAR_BYTES
+
+
+def _attributes_size(attributes) -> int:
+    if not attributes:
+        return 0
+    return sum(_ATTRIBUTE_OVERHEAD_BYTES + len(key) + _value_size(value) for key, value in attributes.items())
+
+
+def _event_size(event: Event) -> int:
+    return _EVENT_OVERHEAD_BYTES + len(event.name) + _attributes_size(event.attributes)
+
+
+def _estimate_size(span: ReadableSpan) -> int:
+    """
+    Estimates the size of the span in an OTLP export request, not counting its resource and scope, which are shared by
+    the spans of a batch.
+    """
+    return (
+        _SPAN_OVERHEAD_BYTES
+        + len(span.name)
+        + len(span.status.description or "")
+        + _attributes_size(span.attributes)
+        + sum(_event_size(event) for event in span.events)
+        + sum(_LINK_OVERHEAD_BYTES + _attributes_size(link.attributes) for link in span.links)
+    )
+
+
+def _trim(span: ReadableSpan, size: int, max_bytes: int) -> ReadableSpan:
+    """
+    Returns a copy of `span` without its largest events, then its largest attributes, until its estimated size is at
+    most `max_bytes`. Dropped events and attributes are added to the span's dropped counts.
+    """
+    events = list(span.events)
+    for event in sorted(events, key=_event_size, reverse=True):
+        if size <= max_bytes:
+            break
+        size -= _event_size(event)
+        events.remove(event)
+
+    attributes = dict(span.attributes or {})
+    for key, value in sorted(attributes.items(), key=lambda item: len(item[0]) + _value_size(item[1]), reverse=True):
+        if size <= max_bytes:
+            break
+        size -= _ATTRIBUTE_OVERHEAD_BYTES + len(key) + _value_size(value)
+        del attributes[key]
+
+    bounded_attributes = BoundedAttributes(attributes=attributes, immutable=True)
+    bounded_attributes.dropped = span.dropped_attributes + len(span.attributes or {}) - len(attributes)
+    bounded_events = BoundedList.from_seq(None, events)
+    bounded_events.dropped = span.dropped_events + len(span.events) - len(events)
+    bounded_links = BoundedList.from_seq(None, span.links)
+    bounded_links.dropped = span.dropped_links
+
+    return ReadableSpan(
+        name=span.name,
+        context=span.context,
+        parent=span.parent,
+        resource=span.resource,
+        attributes=bounded_attributes,
+        events=bounded_events,
+        links=bounded_links,
+        kind=span.kind,
+        status=span.status,
+        start_time=span.start_time,
+        end_time=span.end_time,
+        instrumentation_scope=span.instrumentation_scope,
+    )
+
+
+class SpanSizeSpanProcessor(SpanProcessor):
+    """
+    Passes ended spans to `delegate`, usually the BatchSpanProcessor of an exporter, trimmed to `max_bytes` if that is
+    above 0. With `report_sizes`, the estimated size of each span before trimming is recorded per instrumentation
+    scope.
+    """
+
+    def __init__(self, delegate: SpanProcessor, max_bytes: int = 0, report_sizes: bool = False):  # noqa FBT001
+        self._delegate = delegate
+        self._max_bytes = max_bytes
+        self._size_histogram = None
+        self._trimmed_counter = None
+        # attributes per scope name, so recording does not build a dict per span
+        self._scope_attributes: dict[str, dict[str, str]] = {}
+
+        meter = get_meter(__name__, version)
+        if report_sizes:
+            self._size_histogram = meter.create_histogram(
+                "splunk.span.size",
+                unit="By",
+                description="Estimated encoded size of ended spans, before trimming.",
+                explicit_bucket_boundaries_advisory=_SIZE_BUCKETS,
+            )
+        if max_bytes > 0:
+            self._trimmed_counter = meter.create_counter(
+                "splunk.span.trimmed",
+                unit="{span}",
+                description="Spans whose events or attributes were dropped to fit SPLUNK_SPAN_MAX_BYTES.",
+            )
+
+    def on_start(self, span: Span, parent_context: Context | None = None) -> None:
+        self._delegate.on_start(span, parent_context)
+
+    def on_end(self, span: ReadableSpan) -> None:
+        size = _estimate_size(span)
+        if self._size_histogram is not None:
+            self._size_histogram.record(size, self._attributes(span))
+        if 0 < self._max_bytes < size:
+            span = _trim(span, size, self._max_bytes)
+            self._trimmed_counter.add(1, self._attributes(span))
+        self._delegate.on_end(span)
+
+    def _attributes(self, span: ReadableSpan) -> dict[str, str]:
+        scope_name = span.instrumentation_scope.name if span.instrumentation_scope else ""
+        attributes = self._scope_attributes.get(scope_name)
+        if attributes is None:
+            attributes = self._scope_attributes[scope_name] = {_SCOPE_NAME_ATTR: scope_name}
+        return attributes
+
+    def shutdown(self) -> None:
+        self._delegate.shutdown()
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return self._delegate.force_flush(timeout_millis)
+
+
+def _get_export_span_processor(env=None, mk_delegate=BatchSpanProcessor):
+    """
+    Returns the factory the SDK configurator uses to wrap each span exporter, or None to keep `mk_delegate`.
+    """
+    env = env or Env()
+    max_bytes = env.getint(SPLUNK_SPAN_MAX_BYTES, 0)
+    if max_bytes < 0:
+        _pylogger.warning("Invalid value of '%s' for env var '%s'", max_bytes, SPLUNK_SPAN_MAX_BYTES)
+        max_bytes = 0
+    report_sizes = env.is_true(SPLUNK_SPAN_SIZE_METRICS_ENABLED)
+    if not max_bytes and not report_sizes:
+        return None
+
+    def export_span_processor(exporter: SpanExporter) -> SpanSizeSpanProcessor:
+        return SpanSizeSpanProcessor(mk_delegate(exporter), max_bytes, report_sizes)
+
+    return export_span_processor
@@ -0,0 +1,198 @@
+# Copyright Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+In-process tail-based trace retention.
+
+With SPLUNK_TAIL_RETENTION_ENABLED, ended spans are held per trace instead of being exported right away. When the local
+root span of a trace ends, the trace is exported if any of its spans failed, if the local root took at least
+SPLUNK_TAIL_RETENTION_LATENCY_THRESHOLD or if a span has one of the SPLUNK_TAIL_RETENTION_ATTRIBUTES. Other traces are
+kept with SPLUNK_TAIL_RETENTION_KEEP_PROBABILITY and dropped otherwise.
+"""
+
+import collections
+import logging
+import threading
+
+from opentelemetry.context import Context
+from opentelemetry.sdk.trace import ReadableSpan, Span, SpanProcessor
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, SpanExporter
+from opentelemetry.trace import StatusCode
+
+from splunk_otel.env import (
+    SPLUNK_TAIL_RETENTION_ATTRIBUTES,
+    SPLUNK_TAIL_RETENTION_ENABLED,
+    SPLUNK_TAIL_RETENTION_KEEP_PROBABILITY,
+    SPLUNK_TAIL_RETENTION_LATENCY_THRESHOLD,
+    SPLUNK_TAIL_RETENTION_MAX_SPANS,
+    Env,
+)
+from splunk_otel.sampling import _RANDOMNESS_MASK, _threshold
+
+_DEFAULT_LATENCY_THRESHOLD_MILLIS = 1000
+_DEFAULT_KEEP_PROBABILITY = 0.1
+_DEFAULT_MAX_SPANS = 10000
+# decisions are remembered for this many traces so spans ending after their local root follow the decision
+_MAX_DECIDED_TRACES = 10000
+
+_pylogger = logging.getLogger(__name__)
+
+
+def _is_local_root(span: ReadableSpan) -> bool:
+    return span.parent is None or span.parent.is_remote
+
+
+class _BufferedTrace:
+    def __init__(self):
+        self.spans: list[ReadableSpan] = []
+        self.matched = False
+
+
+class TailRetentionSpanProcessor(SpanProcessor):
+    """
+    Holds ended spans per trace and passes the spans of the traces it keeps to `delegate`, usually the
+    BatchSpanProcessor of an exporter. At most `max_spans` spans are held; beyond that the trace that started buffering
+    first is decided early with the spans it has, and its remaining spans follow that decision.
+    """
+
+    def __init__(
+        self,
+        delegate: SpanProcessor,
+        latency_threshold_millis: int = _DEFAULT_LATENCY_THRESHOLD_MILLIS,
+        attributes: dict[str, str | None] | None = None,
+        keep_probability: float = _DEFAULT_KEEP_PROBABILITY,
+        max_spans: int = _DEFAULT_MAX_SPANS,
+    ):
+        self._delegate = delegate
+        self._latency_threshold_nanos = latency_threshold_millis * 1_000_000
+        # attribute name -> required value, or None if any value matches
+        self._attributes = attributes or {}
+        # kept like a sampler with that ratio would sample: traces kept here are among those the head sampler kept
+        self._keep_threshold = _threshold(keep_probability)
+        self._max_spans = max_spans
+        self._traces: collections.OrderedDict[int, _BufferedTrace] = collections.OrderedDict()
+        self._span_count = 0
+        self._decisions: collections.OrderedDict[int, bool] = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def on_start(self, span: Span, parent_context: Context | None = None) -> None:
+        self._delegate.on_start(span, parent_context)
+
+    def on_end(self, span: ReadableSpan) -> None:
+        trace_id = span.context.trace_id
+        with self._lock:
+            decision = self._decisions.get(trace_id)
+            if decision is None:
+                export = self._buffer(trace_id, span)
+            elif decision:
+                export = [span]
+            else:
+                export = []
+        for ended in export:
+            self._delegate.on_end(ended)
+
+    def _buffer(self, trace_id: int, span: ReadableSpan) -> list[ReadableSpan]:
+        trace = self._traces.get(trace_id)
+        if trace is None:
+            trace = self._traces[trace_id] = _BufferedTrace()
+        trace.spans.append(span)
+        trace.matched = trace.matched or self._matches(span)
+        self._span_count += 1
+
+        export = []
+        if _is_local_root(span):
+            export.extend(self._decide(trace_id))
+        while self._span_count > self._max_spans and self._traces:
+            export.extend(self._decide(next(iter(self._traces))))
+        return export
+
+    def _matches(self, span: ReadableSpan) -> bool:
+        if span.status.status_code is StatusCode.ERROR:
+            return True
+        if (
+            _is_local_root(span)
+            and span.start_time is not None
+            and span.end_time is not None
+            and span.end_time - span.start_time >= self._latency_threshold_nanos
+        ):
+            return True
+        span_attributes = span.attributes or {}
+        for key, value in self._attributes.items():
+            if key in span_attributes and (value is None or str(span_attributes[key]) == value):
+                return True
+        return False
+
+    def _decide(self, trace_id: int) -> list[ReadableSpan]:
+        trace = self._traces.pop(trace_id)
+        self._span_count -= len(trace.spans)
+        keep = trace.matched or trace_id & _RANDOMNESS_MASK >= self._keep_threshold
+        self._decisions[trace_id] = keep
+        if len(self._decisions) > _MAX_DECIDED_TRACES:
+            self._decisions.popitem(last=False)
+        return trace.spans if keep else []
+
+    def _decide_all(self) -> list[ReadableSpan]:
+        with self._lock:
+            export = []
+            while self._traces:
+                export.extend(self._decide(next(iter(self._traces))))
+            return export
+
+    def shutdown(self) -> None:
+        for span in self._decide_all():
+            self._delegate.on_end(span)
+        self._delegate.shutdown()
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        # traces still in progress stay buffered until their local root ends
+        return self._delegate.force_flush(timeout_millis)
+
+
+def _parse_attributes(value: str) -> dict[str, str | None]:
+    attributes = {}
+    for item in value.split(","):
+        key, separator, required = item.partition("=")
+        if key.strip():
+            attributes[key.strip()] = required.strip() if separator else None
+    return attributes
+
+
+def _get_export_span_processor(env=None, mk_delegate=BatchSpanProcessor):
+    """
+    Returns the factory the SDK configurator uses to wrap each span exporter, or None to keep `mk_delegate`.
+    """
+    env = env or Env()
+    if not env.is_true(SPLUNK_TAIL_RETENTION_ENABLED):
+        return None
+
+    latency_threshold_millis = env.getint(SPLUNK_TAIL_RETENTION_LATENCY_THRESHOLD, _DEFAULT_LATENCY_THRESHOLD_MILLIS)
+    attributes = _parse_attributes(env.getval(SPLUNK_TAIL_RETENTION_ATTRIBUTES))
+    keep_probability = env.getfloat(SPLUNK_TAIL_RETENTION_KEEP_PROBABILITY, _DEFAULT_KEEP_PROBABILITY)
+    if not 0 <= keep_probability <= 1:
+        _pylogger.warning(
+            "Invalid value of '%s' for env var '%s'", keep_probability, SPLUNK_TAIL_RETENTION_KEEP_PROBABILITY
+        )
+        keep_probability = _DEFAULT_KEEP_PROBABILITY
+    max_spans = env.getint(SPLUNK_TAIL_RETENTION_MAX_SPANS, _DEFAULT_MAX_SPANS)
+
+    def export_span_processor(exporter: SpanExporter) -> TailRetentionSpanProcessor:
+        return TailRetentionSpanProcessor(
+            mk_delegate(exporter),
+            latency_threshold_millis=latency_threshold_millis,
+            attributes=attributes,
+            keep_probability=keep_probability,
+            max_spans=max_spans,
+        )
+
+    return export_span_processor
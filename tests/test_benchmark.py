@@ -0,0 +1,120 @@
+import json
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from tools.benchmark import ParkedThreads, compare, main, measure, parse_args, run_profiler_suite
+
+
+def test_measure_reports_per_call_stats():
+    calls = []
+    stats = measure(lambda: calls.append(1), iterations=10, repeat=3)
+
+    assert len(calls) == 30
+    assert stats["iterations"] == 10
+    assert stats["repeat"] == 3
+    assert stats["min_us"] <= stats["median_us"]
+
+
+def test_parked_threads_reach_requested_depth():
+    import sys
+
+    with ParkedThreads(2, 25) as parked:
+        frames = sys._current_frames()  # noqa: SLF001
+        depths = []
+        for thread in parked.threads:
+            frame = frames[thread.ident]
+            depth = 0
+            while frame is not None:
+                depth += 1
+                frame = frame.f_back
+            depths.append(depth)
+
+    assert all(depth > 25 for depth in depths)
+
+
+def test_compare_flags_regressions_over_threshold():
+    baseline = [
+        {"benchmark": "a", "params": {"threads": 1}, "median_us": 10.0},
+        {"benchmark": "b", "params": {"threads": 1}, "median_us": 10.0},
+    ]
+    current = [
+        {"benchmark": "a", "params": {"threads": 1}, "median_us": 11.0},
+        {"benchmark": "b", "params": {"threads": 1}, "median_us": 20.0},
+        {"benchmark": "c", "params": {"threads": 1}, "median_us": 20.0},
+    ]
+
+    regressions = compare(current, baseline, 1.25)
+
+    assert [regression["benchmark"] for regression in regressions] == ["b"]
+    assert regressions[0]["ratio"] == 2.0
+
+
+def test_parse_args_rejects_unknown_profiling_mode(capsys):
+    with pytest.raises(SystemExit):
+        parse_args(["--profiling-modes", "off,bogus"])
+    assert "bogus" in capsys.readouterr().err
+
+
+@patch("tools.benchmark.bench_profiler", lambda *_: [])
+@patch("tools.benchmark.bench_wsgi")
+def test_profiler_suite_runs_off_mode_first(mock_bench_wsgi):
+    run_profiler_suite(parse_args(["--profiling-modes", "snapshot,off,continuous,off"]))
+
+    assert [call.args[0] for call in mock_bench_wsgi.call_args_list] == ["off", "continuous", "snapshot"]
+
+
+def test_profiler_suite_writes_machine_readable_results(tmp_path: Path):
+    output = tmp_path / "results.json"
+
+    exit_code = main(
+        [
+            "--suite",
+            "profiler",
+            "--threads",
+            "2",
+            "--depths",
+            "10",
+            "--profiling-modes",
+            "off,snapshot",
+            "--requests",
+            "5",
+            "--repeat",
+            "2",
+            "--output",
+            str(output),
+        ]
+    )
+
+    assert exit_code == 0
+    data = json.loads(output.read_text())
+    assert data["metadata"]["python_version"]
+    benchmarks = {(item["benchmark"], json.dumps(item["params"], sort_keys=True)) for item in data["results"]}
+    assert ("collect_stacktraces", '{"depth": 10, "threads": 2}') in benchmarks
+    assert ("stacktraces_to_cpu_profile", '{"depth": 10, "threads": 2}') in benchmarks
+    assert ("pb_profile_to_str", '{"depth": 10, "threads": 2}') in benchmarks
+    assert ("context_attach_detach", '{"wrapped": true}') in benchmarks
+    assert ("wsgi_request", '{"interval_millis": 10, "profiling": "snapshot"}') in benchmarks
+
+
+def test_sampler_suite_measures_each_sampler(tmp_path: Path):
+    output = tmp_path / "results.json"
+
+    exit_code = main(["--suite", "sampler", "--repeat", "1", "--output", str(output)])
+
+    assert exit_code == 0
+    data = json.loads(output.read_text())
+    samplers = {item["params"]["sampler"] for item in data["results"] if item["benchmark"] == "sampler_should_sample"}
+    assert {"always_on", "splunk_adjustable", "splunk_throughput"} <= samplers
+
+
+def test_logging_suite_measures_each_handler(tmp_path: Path):
+    output = tmp_path / "results.json"
+
+    exit_code = main(["--suite", "logging", "--repeat", "1", "--output", str(output)])
+
+    assert exit_code == 0
+    data = json.loads(output.read_text())
+    handlers = {item["params"]["handler"] for item in data["results"] if item["benchmark"] == "logging_handler_emit"}
+    assert handlers == {"stock", "async"}
@@ -0,0 +1,152 @@
+# Copyright Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import socket
+import sys
+import tempfile
+from unittest.mock import MagicMock, call, patch
+
+import pytest
+
+from splunk_otel.burst import (
+    _BurstProfiler,
+    _ControlSocket,
+    _parse_command,
+    _start_burst_profiling_if_enabled,
+    start_burst_profiling,
+)
+from splunk_otel.env import Env
+
+
+def _burst_profiler():
+    mk_profiling_context = MagicMock()
+    return _BurstProfiler("svc", 30, 5, mk_profiling_context), mk_profiling_context
+
+
+def test_burst_starts_profiler_and_pauses_after_duration():
+    burst_profiler, mk_profiling_context = _burst_profiler()
+    burst_profiler.start()
+
+    burst_profiler.request()
+    burst_profiler.request(10, 2)
+    burst_profiler.stop()
+
+    mk_profiling_context.assert_called_once_with("svc", 5)
+    ctx = mk_profiling_context.return_value
+    ctx.set_interval.assert_called_once_with(2)
+    assert ctx.pause_after.call_args_list == [call(30), call(10)]
+    assert ctx.start.call_count == 2
+    ctx.shutdown.assert_called_once()
+    ctx.stop.assert_not_called()
+
+
+def test_request_limits_duration_and_interval():
+    burst_profiler, _ = _burst_profiler()
+
+    assert burst_profiler.request(100000, 0) == (600, 1)
+
+
+@pytest.mark.parametrize(
+    ("command", "expected"),
+    [
+        ("profile\n", (None, None)),
+        ("profile 30", (30.0, None)),
+        ("profile 2.5 5\n", (2.5, 5)),
+    ],
+)
+def test_parse_command(command, expected):
+    assert _parse_command(command) == expected
+
+
+@pytest.mark.parametrize("command", ["", "stop", "profile x", "profile 0", "profile 1 -5", "profile 1 2 3"])
+def test_parse_command_rejects_malformed(command):
+    with pytest.raises(ValueError):  # noqa PT011
+        _parse_command(command)
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="Unix domain sockets")
+def test_control_socket():
+    burst_profiler = MagicMock()
+    burst_profiler.request.return_value = (30.0, 5)
+    with tempfile.TemporaryDirectory() as directory:
+        path = f"{directory}/burst.sock"
+        control_socket = _ControlSocket(path, burst_profiler)
+        control_socket.start()
+        try:
+            replies = [_send(path, b"profile 30 5\n"), _send(path, b"bogus\n")]
+        finally:
+            control_socket.close()
+
+    burst_profiler.request.assert_called_once_with(30.0, 5)
+    assert replies[0] == "ok: profiling every 5 ms for 30 seconds\n"
+    assert replies[1].startswith("error:")
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="Unix domain sockets")
+def test_control_socket_replaces_only_stale_sockets():
+    with tempfile.TemporaryDirectory() as directory:
+        path = f"{directory}/burst.sock"
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as stale:
+            stale.bind(path)
+        _ControlSocket(path, MagicMock()).close()
+
+        with open(path, "w") as f:
+            f.write("data")
+        with pytest.raises(FileExistsError):
+            _ControlSocket(path, MagicMock())
+        with open(path) as f:
+            assert f.read() == "data"
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="Unix domain sockets")
+@patch("splunk_otel.burst.atexit", MagicMock())
+def test_start_burst_profiling_skips_control_socket_over_other_files(caplog):
+    with tempfile.TemporaryDirectory() as directory:
+        path = f"{directory}/important.txt"
+        with open(path, "w") as f:
+            f.write("data")
+        burst_profiler = start_burst_profiling(Env({"SPLUNK_PROFILER_BURST_SOCKET": path}))
+        try:
+            assert f"Could not listen on {path}" in caplog.text
+            with open(path) as f:
+                assert f.read() == "data"
+        finally:
+            burst_profiler.stop()
+
+
+def _send(path, command: bytes) -> str:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.connect(path)
+        client.sendall(command)
+        return client.recv(1024).decode()
+
+
+@patch("splunk_otel.burst.start_burst_profiling")
+def test_start_burst_profiling_if_enabled(mock_start):
+    _start_burst_profiling_if_enabled(Env({}))
+    mock_start.assert_not_called()
+
+    env = Env({"SPLUNK_PROFILER_BURST_SIGNAL": "SIGUSR1"})
+    _start_burst_profiling_if_enabled(env)
+    mock_start.assert_called_once_with(env)
+
+
+@patch("splunk_otel.burst.atexit", MagicMock())
+@patch("splunk_otel.burst._install_signal_handler")
+def test_start_burst_profiling_installs_signal_handler(mock_install_signal_handler):
+    burst_profiler = start_burst_profiling(Env({"SPLUNK_PROFILER_BURST_SIGNAL": "SIGUSR1"}))
+    try:
+        mock_install_signal_handler.assert_called_once_with("SIGUSR1", burst_profiler.request)
+    finally:
+        burst_profiler.stop()
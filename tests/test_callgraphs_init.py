@@ -12,9 +12,9 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
 
-from splunk_otel.callgraphs import _configure_callgraphs_if_enabled
+from splunk_otel.callgraphs import _configure_callgraphs_if_enabled, _reconfigure_callgraphs
 from splunk_otel.env import Env
 
 
@@ -40,7 +40,17 @@ class TestStartCallgraphsIfEnabled:
         _configure_callgraphs_if_enabled(env)
 
         mock_trace.get_tracer_provider.return_value.add_span_processor.assert_called_once()
-        mock_processor.assert_called_once_with("test-service", 10)
+        mock_processor.assert_called_once_with(
+            "test-service",
+            10,
+            trigger="selection",
+            latency_threshold_millis=1000,
+            max_buffered_samples=1000,
+            max_concurrent_traces=0,
+            bundle_traces=False,
+            bundle_timeout_millis=30000,
+            mode="sampling",
+        )
 
     @patch("splunk_otel.callgraphs.trace")
     @patch("splunk_otel.callgraphs.CallgraphsSpanProcessor")
@@ -54,4 +64,146 @@ class TestStartCallgraphsIfEnabled:
 
         _configure_callgraphs_if_enabled(env)
 
-        mock_processor.assert_called_once_with("test-service", 50)
+        mock_processor.assert_called_once_with(
+            "test-service",
+            50,
+            trigger="selection",
+            latency_threshold_millis=1000,
+            max_buffered_samples=1000,
+            max_concurrent_traces=0,
+            bundle_traces=False,
+            bundle_timeout_millis=30000,
+            mode="sampling",
+        )
+
+    @patch("splunk_otel.callgraphs.trace")
+    @patch("splunk_otel.callgraphs.CallgraphsSpanProcessor")
+    def test_uses_latency_trigger(self, mock_processor, mock_trace):
+        env_store = {
+            "SPLUNK_SNAPSHOT_PROFILER_ENABLED": "true",
+            "OTEL_SERVICE_NAME": "test-service",
+            "SPLUNK_SNAPSHOT_PROFILER_TRIGGER": "latency",
+            "SPLUNK_SNAPSHOT_LATENCY_THRESHOLD": "250",
+        }
+        env = Env(env_store)
+
+        _configure_callgraphs_if_enabled(env)
+
+        mock_processor.assert_called_once_with(
+            "test-service",
+            10,
+            trigger="latency",
+            latency_threshold_millis=250,
+            max_buffered_samples=1000,
+            max_concurrent_traces=0,
+            bundle_traces=False,
+            bundle_timeout_millis=30000,
+            mode="sampling",
+        )
+
+    @patch("splunk_otel.callgraphs.trace")
+    @patch("splunk_otel.callgraphs.CallgraphsSpanProcessor")
+    def test_uses_max_concurrent_traces(self, mock_processor, mock_trace):
+        env_store = {
+            "SPLUNK_SNAPSHOT_PROFILER_ENABLED": "true",
+            "OTEL_SERVICE_NAME": "test-service",
+            "SPLUNK_SNAPSHOT_MAX_CONCURRENT_TRACES": "4",
+        }
+        env = Env(env_store)
+
+        _configure_callgraphs_if_enabled(env)
+
+        assert mock_processor.call_args.kwargs["max_concurrent_traces"] == 4
+
+    @patch("splunk_otel.callgraphs.trace")
+    @patch("splunk_otel.callgraphs.CallgraphsSpanProcessor")
+    def test_uses_bundle_settings(self, mock_processor, mock_trace):
+        env_store = {
+            "SPLUNK_SNAPSHOT_PROFILER_ENABLED": "true",
+            "OTEL_SERVICE_NAME": "test-service",
+            "SPLUNK_SNAPSHOT_BUNDLE_ENABLED": "true",
+            "SPLUNK_SNAPSHOT_BUNDLE_TIMEOUT": "5000",
+            "SPLUNK_SNAPSHOT_MAX_SAMPLES_PER_TRACE": "200",
+        }
+        env = Env(env_store)
+
+        _configure_callgraphs_if_enabled(env)
+
+        kwargs = mock_processor.call_args.kwargs
+        assert kwargs["bundle_traces"] is True
+        assert kwargs["bundle_timeout_millis"] == 5000
+        assert kwargs["max_buffered_samples"] == 200
+
+    @patch("splunk_otel.callgraphs.trace")
+    @patch("splunk_otel.callgraphs.CallgraphsSpanProcessor")
+    def test_uses_tracing_mode(self, mock_processor, mock_trace):
+        env = Env({"SPLUNK_SNAPSHOT_PROFILER_ENABLED": "true", "SPLUNK_SNAPSHOT_PROFILER_MODE": "Tracing"})
+
+        _configure_callgraphs_if_enabled(env)
+
+        assert mock_processor.call_args.kwargs["mode"] == "tracing"
+
+    @patch("splunk_otel.callgraphs.trace")
+    @patch("splunk_otel.callgraphs.CallgraphsSpanProcessor")
+    def test_invalid_mode_falls_back_to_sampling(self, mock_processor, mock_trace):
+        env = Env({"SPLUNK_SNAPSHOT_PROFILER_ENABLED": "true", "SPLUNK_SNAPSHOT_PROFILER_MODE": "bogus"})
+
+        _configure_callgraphs_if_enabled(env)
+
+        assert mock_processor.call_args.kwargs["mode"] == "sampling"
+
+    @patch("splunk_otel.callgraphs.atexit")
+    @patch("splunk_otel.callgraphs.trace")
+    @patch("splunk_otel.callgraphs.CallgraphsSpanProcessor")
+    def test_shuts_down_processor_at_exit(self, mock_processor, mock_trace, mock_atexit):
+        env = Env({"SPLUNK_SNAPSHOT_PROFILER_ENABLED": "true"})
+
+        _configure_callgraphs_if_enabled(env)
+
+        mock_atexit.register.assert_called_once_with(mock_processor.return_value.shutdown)
+
+    @patch("splunk_otel.callgraphs.trace")
+    @patch("splunk_otel.callgraphs.CallgraphsSpanProcessor")
+    def test_invalid_trigger_falls_back_to_selection(self, mock_processor, mock_trace):
+        env_store = {
+            "SPLUNK_SNAPSHOT_PROFILER_ENABLED": "true",
+            "OTEL_SERVICE_NAME": "test-service",
+            "SPLUNK_SNAPSHOT_PROFILER_TRIGGER": "bogus",
+        }
+        env = Env(env_store)
+
+        _configure_callgraphs_if_enabled(env)
+
+        mock_processor.assert_called_once_with(
+            "test-service",
+            10,
+            trigger="selection",
+            latency_threshold_millis=1000,
+            max_buffered_samples=1000,
+            max_concurrent_traces=0,
+            bundle_traces=False,
+            bundle_timeout_millis=30000,
+            mode="sampling",
+        )
+
+
+class TestReconfigureCallgraphs:
+    @patch("splunk_otel.callgraphs._processor", None)
+    @patch("splunk_otel.callgraphs.trace")
+    @patch("splunk_otel.callgraphs.CallgraphsSpanProcessor")
+    def test_adds_processor_when_enabled_later(self, mock_processor, mock_trace):
+        _reconfigure_callgraphs(Env({"SPLUNK_SNAPSHOT_PROFILER_ENABLED": "true", "OTEL_SERVICE_NAME": "svc"}))
+
+        mock_trace.get_tracer_provider.return_value.add_span_processor.assert_called_once_with(
+            mock_processor.return_value
+        )
+
+    def test_updates_existing_processor(self):
+        processor = MagicMock()
+        with patch("splunk_otel.callgraphs._processor", processor):
+            _reconfigure_callgraphs(
+                Env({"SPLUNK_SNAPSHOT_PROFILER_ENABLED": "false", "SPLUNK_SNAPSHOT_SAMPLING_INTERVAL": "5"})
+            )
+
+        processor.set_enabled.assert_called_once_with(False)
+        processor.set_sampling_interval.assert_called_once_with(5)
@@ -0,0 +1,212 @@
+# Copyright Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+from unittest.mock import MagicMock, patch
+
+import pytest
+from opentelemetry import baggage
+from opentelemetry.context import Context
+from opentelemetry.sdk.trace import Span
+from opentelemetry.trace import SpanContext
+
+from splunk_otel.callgraphs.monitoring import _call_tree_to_profile, _CallNode, _CallTreeRecorder, _is_supported
+from splunk_otel.callgraphs.span_processor import CallgraphsSpanProcessor
+
+
+def outer():
+    pass
+
+
+def inner():
+    pass
+
+
+def _recorder(trace_id=123):
+    now = [0]
+    thread_states = {threading.get_ident(): (trace_id, 1)}
+    recorder = _CallTreeRecorder(thread_states, time_func=lambda: now[0])
+    recorder.set_active_traces(frozenset({trace_id}))
+    return recorder, now, thread_states
+
+
+class TestCallTreeRecorder:
+    def test_records_counts_and_times(self):
+        recorder, now, _ = _recorder()
+
+        recorder.on_call(outer.__code__, 0)
+        for _ in range(2):
+            now[0] += 10
+            recorder.on_call(inner.__code__, 0)
+            now[0] += 5
+            recorder.on_return(inner.__code__, 0, None)
+        now[0] += 20
+        recorder.on_return(outer.__code__, 0, None)
+
+        root = recorder.pop_tree(123)
+        outer_node = root.children[outer.__code__]
+        inner_node = outer_node.children[inner.__code__]
+        assert (outer_node.calls, outer_node.self_nanos) == (1, 40)
+        assert (inner_node.calls, inner_node.self_nanos) == (2, 10)
+        assert recorder.pop_tree(123) is None
+
+    def test_ignores_threads_not_serving_selected_trace(self):
+        recorder, _, thread_states = _recorder()
+        thread_states[threading.get_ident()] = (999, 1)
+
+        recorder.on_call(outer.__code__, 0)
+        recorder.on_return(outer.__code__, 0, None)
+
+        assert recorder.pop_tree(999) is None
+        assert recorder.pop_tree(123) is None
+
+    def test_ignores_returns_from_frames_entered_before_trace(self):
+        recorder, _, _ = _recorder()
+
+        recorder.on_return(outer.__code__, 0, None)
+        recorder.on_call(inner.__code__, 0)
+        recorder.on_return(outer.__code__, 0, None)  # not the innermost frame
+        recorder.on_return(inner.__code__, 0, None)
+
+        root = recorder.pop_tree(123)
+        assert list(root.children) == [inner.__code__]
+        assert root.children[inner.__code__].calls == 1
+
+    def test_counts_generator_resumes_as_one_call(self):
+        recorder, now, _ = _recorder()
+
+        recorder.on_call(outer.__code__, 0)
+        now[0] += 10
+        recorder.on_yield(outer.__code__, 0, None)
+        now[0] += 100  # suspended
+        recorder.on_call(outer.__code__, 0)
+        now[0] += 5
+        recorder.on_return(outer.__code__, 0, None)
+
+        outer_node = recorder.pop_tree(123).children[outer.__code__]
+        assert (outer_node.calls, outer_node.self_nanos) == (1, 15)
+
+    def test_drops_open_frames_when_thread_stops_serving_trace(self):
+        recorder, _, thread_states = _recorder()
+
+        recorder.on_call(outer.__code__, 0)
+        del thread_states[threading.get_ident()]
+        recorder.on_call(inner.__code__, 0)
+        recorder.on_return(inner.__code__, 0, None)
+        thread_states[threading.get_ident()] = (123, 2)
+        recorder.on_call(inner.__code__, 0)
+        recorder.on_return(inner.__code__, 0, None)
+        recorder.on_return(outer.__code__, 0, None)
+
+        root = recorder.pop_tree(123)
+        assert root.children[outer.__code__].calls == 0
+        assert not root.children[outer.__code__].children
+        assert root.children[inner.__code__].calls == 1
+
+    def test_drops_open_frames_when_trace_ends(self):
+        recorder, _, _ = _recorder()
+
+        recorder.on_call(outer.__code__, 0)
+        recorder.set_active_traces(frozenset())
+        recorder.on_return(outer.__code__, 0, None)
+
+        assert recorder._local.state is None  # noqa SLF001
+        assert recorder.pop_tree(123).children[outer.__code__].calls == 0
+
+    def test_merges_trees_from_several_threads(self):
+        recorder, _, thread_states = _recorder()
+
+        def work():
+            thread_states[threading.get_ident()] = (123, 2)
+            recorder.on_call(outer.__code__, 0)
+            recorder.on_return(outer.__code__, 0, None)
+
+        worker = threading.Thread(target=work)
+        worker.start()
+        worker.join()
+        work()
+
+        assert recorder.pop_tree(123).children[outer.__code__].calls == 2
+
+
+def test_call_tree_to_profile():
+    root = _CallNode()
+    outer_node = root.child(outer.__code__)
+    outer_node.calls, outer_node.self_nanos = 1, 40
+    inner_node = outer_node.child(inner.__code__)
+    inner_node.calls, inner_node.self_nanos = 2, 10
+
+    pb_profile, total_frame_count = _call_tree_to_profile(root, 0x0AF7651916CD43DD8448EB211C80319C, 1.5)
+
+    strings = pb_profile.string_table
+    assert strings[0] == ""
+    assert [(strings[t.type], strings[t.unit]) for t in pb_profile.sample_type] == [
+        ("calls", "count"),
+        ("wall", "nanoseconds"),
+    ]
+    assert strings[pb_profile.default_sample_type] == "wall"
+    assert total_frame_count == 3
+
+    functions = {function.id: strings[function.name] for function in pb_profile.function}
+    locations = {location.id: functions[location.line[0].function_id] for location in pb_profile.location}
+    samples = {
+        tuple(locations[location_id] for location_id in sample.location_id): list(sample.value)
+        for sample in pb_profile.sample
+    }
+    assert samples == {("outer",): [1, 40], ("inner", "outer"): [2, 10]}
+    [sample] = [sample for sample in pb_profile.sample if len(sample.location_id) == 1]
+    labels = {strings[label.key]: strings[label.str] or label.num for label in sample.label}
+    assert labels["trace_id"] == f"{0x0AF7651916CD43DD8448EB211C80319C:016x}"  # same format as sampled profiles
+
+
+@pytest.mark.skipif(_is_supported(), reason="fallback only applies before Python 3.12")
+@patch("splunk_otel.callgraphs.span_processor.ProfilingContext", MagicMock())
+def test_tracing_mode_falls_back_to_sampling_without_sys_monitoring():
+    processor = CallgraphsSpanProcessor("test-service", mode="tracing")
+
+    assert processor._call_tree is None  # noqa SLF001
+
+
+@patch("splunk_otel.callgraphs.span_processor.ProfilingContext", MagicMock())
+def test_tracing_mode_requires_selection_trigger():
+    processor = CallgraphsSpanProcessor("test-service", trigger="latency", mode="tracing")
+
+    assert processor._call_tree is None  # noqa SLF001
+
+
+@pytest.mark.skipif(not _is_supported(), reason="sys.monitoring requires Python 3.12+")
+@patch("splunk_otel.callgraphs.span_processor._CallTreeRecorder")
+@patch("splunk_otel.callgraphs.span_processor.ProfilingContext")
+def test_tracing_mode_emits_call_tree_when_trace_ends(mock_profiling_context, mock_recorder):
+    thread_states = {}
+    mock_recorder.side_effect = lambda: _CallTreeRecorder(thread_states)
+    processor = CallgraphsSpanProcessor("test-service", mode="tracing")
+    span = MagicMock(spec=Span)
+    span.get_span_context.return_value = SpanContext(trace_id=123, span_id=456, is_remote=False)
+
+    try:
+        processor.on_start(span, baggage.set_baggage("splunk.trace.snapshot.volume", "highest", Context()))
+        thread_states[threading.get_ident()] = (123, 456)
+        outer()
+        del thread_states[threading.get_ident()]
+        processor.on_end(span)
+    finally:
+        processor.shutdown()
+
+    mock_profiling_context.return_value.start.assert_not_called()
+    emit_profile_call = mock_profiling_context.return_value.emit_profile.call_args
+    pb_profile, total_frame_count = emit_profile_call.args
+    function_names = {pb_profile.string_table[function.name] for function in pb_profile.function}
+    assert "outer" in function_names
+    assert total_frame_count > 0
@@ -12,14 +12,17 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import threading
+from collections import deque
 from unittest.mock import MagicMock, patch
 
 from opentelemetry import baggage, trace
 from opentelemetry.context import Context
-from opentelemetry.sdk.trace import Span
-from opentelemetry.trace import SpanContext
+from opentelemetry.sdk.trace import ReadableSpan, Span, TracerProvider
+from opentelemetry.trace import SpanContext, Status, StatusCode
 
 from splunk_otel.callgraphs.span_processor import CallgraphsSpanProcessor, _should_process_context
+from splunk_otel.propagator import CallgraphsPropagator
 
 
 class TestShouldProcessContext:
@@ -49,6 +52,16 @@ class TestShouldProcessContext:
         assert _should_process_context(ctx) is False
 
 
+def _selected_root_span(trace_id, span_id):
+    span = MagicMock(spec=Span)
+    span.get_span_context.return_value = SpanContext(trace_id=trace_id, span_id=span_id, is_remote=False)
+    return span
+
+
+def _selected_context():
+    return baggage.set_baggage("splunk.trace.snapshot.volume", "highest", Context())
+
+
 class TestCallgraphsSpanProcessor:
     @patch("splunk_otel.callgraphs.span_processor.ProfilingContext")
     def test_on_start_does_nothing_when_baggage_is_none(self, mock_profiling_context):
@@ -104,10 +117,68 @@ class TestCallgraphsSpanProcessor:
         assert 456 in processor._span_id_to_trace_id  # noqa SLF001
         assert processor._span_id_to_trace_id[456] == 123  # noqa SLF001
 
+    @patch("splunk_otel.callgraphs.span_processor.ProfilingContext")
+    def test_on_start_does_nothing_when_disabled(self, mock_profiling_context):
+        processor = CallgraphsSpanProcessor("test-service")
+        processor.set_enabled(False)
+
+        span = MagicMock(spec=Span)
+        span.get_span_context.return_value = SpanContext(trace_id=123, span_id=456, is_remote=False)
+
+        processor.on_start(span, baggage.set_baggage("splunk.trace.snapshot.volume", "highest", Context()))
+
+        span.set_attribute.assert_not_called()
+        mock_profiling_context.return_value.start.assert_not_called()
+
+        processor.set_enabled(True)
+        processor.on_start(span, baggage.set_baggage("splunk.trace.snapshot.volume", "highest", Context()))
+
+        mock_profiling_context.return_value.start.assert_called_once()
+
+    @patch("splunk_otel.callgraphs.span_processor.ProfilingContext")
+    def test_set_sampling_interval_updates_profiler(self, mock_profiling_context):
+        processor = CallgraphsSpanProcessor("test-service")
+
+        processor.set_sampling_interval(5)
+
+        mock_profiling_context.return_value.set_interval.assert_called_once_with(5)
+
+    @patch("splunk_otel.callgraphs.span_processor.ProfilingContext")
+    def test_on_start_activates_profiling_when_selected_by_header_carrier(self, mock_profiling_context):
+        processor = CallgraphsSpanProcessor("test-service")
+
+        span = MagicMock(spec=Span)
+        span.get_span_context.return_value = SpanContext(trace_id=123, span_id=456, is_remote=False)
+
+        ctx = CallgraphsPropagator(carrier="header").extract({"splunk-snapshot": "1"}, Context())
+
+        processor.on_start(span, ctx)
+
+        span.set_attribute.assert_called_once_with("splunk.snapshot.profiling", True)
+        assert processor._span_id_to_trace_id == {456: 123}  # noqa SLF001
+
+    @patch("splunk_otel.callgraphs.span_processor.ProfilingContext")
+    def test_on_start_skips_new_traces_over_concurrency_cap(self, mock_profiling_context):
+        processor = CallgraphsSpanProcessor("test-service", max_concurrent_traces=1)
+        processor.on_start(_selected_root_span(100, 1), _selected_context())
+        ctx = baggage.set_baggage("splunk.trace.snapshot.volume", "highest", Context())
+
+        new_trace_span = MagicMock(spec=Span)
+        new_trace_span.get_span_context.return_value = SpanContext(trace_id=200, span_id=2, is_remote=False)
+        processor.on_start(new_trace_span, ctx)
+
+        same_trace_span = MagicMock(spec=Span)
+        same_trace_span.get_span_context.return_value = SpanContext(trace_id=100, span_id=3, is_remote=False)
+        processor.on_start(same_trace_span, ctx)
+
+        new_trace_span.set_attribute.assert_not_called()
+        same_trace_span.set_attribute.assert_called_once_with("splunk.snapshot.profiling", True)
+        assert processor._span_id_to_trace_id == {1: 100, 3: 100}  # noqa SLF001
+
     @patch("splunk_otel.callgraphs.span_processor.ProfilingContext")
     def test_on_end_removes_span_from_tracking(self, mock_profiling_context):
         processor = CallgraphsSpanProcessor("test-service")
-        processor._span_id_to_trace_id[456] = 123  # noqa SLF001
+        processor.on_start(_selected_root_span(123, 456), _selected_context())
 
         span = MagicMock(spec=Span)
         span_ctx = SpanContext(trace_id=123, span_id=456, is_remote=False)
@@ -120,7 +191,7 @@ class TestCallgraphsSpanProcessor:
     @patch("splunk_otel.callgraphs.span_processor.ProfilingContext")
     def test_on_end_pauses_profiler_when_no_active_spans(self, mock_profiling_context):
         processor = CallgraphsSpanProcessor("test-service")
-        processor._span_id_to_trace_id[456] = 123  # noqa SLF001
+        processor.on_start(_selected_root_span(123, 456), _selected_context())
 
         span = MagicMock(spec=Span)
         span_ctx = SpanContext(trace_id=123, span_id=456, is_remote=False)
@@ -133,8 +204,8 @@ class TestCallgraphsSpanProcessor:
     @patch("splunk_otel.callgraphs.span_processor.ProfilingContext")
     def test_on_end_does_not_pause_profiler_when_other_spans_active(self, mock_profiling_context):
         processor = CallgraphsSpanProcessor("test-service")
-        processor._span_id_to_trace_id[456] = 123  # noqa SLF001
-        processor._span_id_to_trace_id[789] = 123  # noqa SLF001
+        processor.on_start(_selected_root_span(123, 456), _selected_context())
+        processor.on_start(_selected_root_span(123, 789), _selected_context())
 
         span = MagicMock(spec=Span)
         span_ctx = SpanContext(trace_id=123, span_id=456, is_remote=False)
@@ -159,7 +230,7 @@ class TestCallgraphsSpanProcessor:
     @patch("splunk_otel.callgraphs.span_processor.ProfilingContext")
     def test_filter_stacktraces_keeps_active_traces(self, mock_profiling_context):
         processor = CallgraphsSpanProcessor("test-service")
-        processor._span_id_to_trace_id[456] = 123  # noqa SLF001
+        processor.on_start(_selected_root_span(123, 456), _selected_context())
 
         stacktraces = [
             {"tid": 1, "frames": []},
@@ -192,3 +263,290 @@ class TestCallgraphsSpanProcessor:
         result = processor._filter_stacktraces(stacktraces, active_trace_contexts)  # noqa SLF001
 
         assert len(result) == 0
+
+
+def _ended_span(trace_id, span_id, duration_millis, status_code=StatusCode.UNSET):
+    span = MagicMock(spec=ReadableSpan)
+    span.get_span_context.return_value = SpanContext(trace_id=trace_id, span_id=span_id, is_remote=False)
+    span.start_time = 1_000_000_000
+    span.end_time = span.start_time + duration_millis * 1_000_000
+    span.status = Status(status_code)
+    return span
+
+
+class TestCallgraphsSpanProcessorLatencyTrigger:
+    @patch("splunk_otel.callgraphs.span_processor.ProfilingContext")
+    def test_on_start_tracks_root_span_without_baggage(self, mock_profiling_context):
+        processor = CallgraphsSpanProcessor("test-service", trigger="latency")
+        span = MagicMock(spec=Span)
+        span.get_span_context.return_value = SpanContext(trace_id=123, span_id=456, is_remote=False)
+
+        processor.on_start(span, Context())
+
+        span.set_attribute.assert_not_called()
+        mock_profiling_context.return_value.start.assert_called_once()
+        assert processor._span_id_to_trace_id == {456: 123}  # noqa SLF001
+
+    @patch("splunk_otel.callgraphs.span_processor.ProfilingContext")
+    def test_filter_buffers_instead_of_emitting(self, mock_profiling_context):
+        processor = CallgraphsSpanProcessor("test-service", trigger="latency")
+        span = MagicMock(spec=Span)
+        span.get_span_context.return_value = SpanContext(trace_id=123, span_id=456, is_remote=False)
+        processor.on_start(span, Context())
+
+        result = processor._filter_stacktraces(  # noqa SLF001
+            [{"tid": 1, "frames": []}, {"tid": 2, "frames": []}],
+            {1: (123, 789), 2: (999, 888)},
+        )
+
+        assert result == []
+        [buffered] = processor._trace_id_to_samples[123].samples  # noqa SLF001
+        assert buffered["tid"] == 1
+        assert buffered["trace_context"] == (123, 789)
+
+    @patch("splunk_otel.callgraphs.span_processor.ProfilingContext")
+    def test_rolling_buffer_keeps_most_recent_samples(self, mock_profiling_context):
+        processor = CallgraphsSpanProcessor("test-service", trigger="latency", max_buffered_samples=2)
+        span = MagicMock(spec=Span)
+        span.get_span_context.return_value = SpanContext(trace_id=123, span_id=456, is_remote=False)
+        processor.on_start(span, Context())
+
+        for frame in ("a", "b", "c"):
+            processor._filter_stacktraces([{"tid": 1, "frames": [frame]}], {1: (123, 456)})  # noqa SLF001
+
+        samples = processor._trace_id_to_samples[123].samples  # noqa SLF001
+        assert [s["frames"] for s in samples] == [["b"], ["c"]]
+
+    @patch("splunk_otel.callgraphs.span_processor.ProfilingContext")
+    def test_emits_buffer_for_slow_span(self, mock_profiling_context):
+        processor = CallgraphsSpanProcessor("test-service", trigger="latency", latency_threshold_millis=100)
+        span = MagicMock(spec=Span)
+        span.get_span_context.return_value = SpanContext(trace_id=123, span_id=456, is_remote=False)
+        processor.on_start(span, Context())
+        processor._filter_stacktraces([{"tid": 1, "frames": []}], {1: (123, 456)})  # noqa SLF001
+
+        processor.on_end(_ended_span(123, 456, duration_millis=150))
+
+        [emitted] = mock_profiling_context.return_value.emit.call_args.args
+        assert len(emitted) == 1
+        assert 123 not in processor._trace_id_to_samples  # noqa SLF001
+
+    @patch("splunk_otel.callgraphs.span_processor.ProfilingContext")
+    def test_emits_buffer_for_failed_span(self, mock_profiling_context):
+        processor = CallgraphsSpanProcessor("test-service", trigger="latency", latency_threshold_millis=100)
+        span = MagicMock(spec=Span)
+        span.get_span_context.return_value = SpanContext(trace_id=123, span_id=456, is_remote=False)
+        processor.on_start(span, Context())
+        processor._filter_stacktraces([{"tid": 1, "frames": []}], {1: (123, 456)})  # noqa SLF001
+
+        processor.on_end(_ended_span(123, 456, duration_millis=1, status_code=StatusCode.ERROR))
+
+        mock_profiling_context.return_value.emit.assert_called_once()
+
+    @patch("splunk_otel.callgraphs.span_processor.ProfilingContext")
+    def test_keeps_buffer_while_other_root_spans_of_trace_are_in_flight(self, mock_profiling_context):
+        processor = CallgraphsSpanProcessor("test-service", trigger="latency", latency_threshold_millis=100)
+        for span_id in (1, 2):
+            span = MagicMock(spec=Span)
+            span.get_span_context.return_value = SpanContext(trace_id=123, span_id=span_id, is_remote=False)
+            processor.on_start(span, Context())
+        processor._filter_stacktraces([{"tid": 1, "frames": ["a"]}], {1: (123, 1)})  # noqa SLF001
+
+        processor.on_end(_ended_span(123, 1, duration_millis=150))
+        processor._filter_stacktraces([{"tid": 2, "frames": ["b"]}], {2: (123, 2)})  # noqa SLF001
+        processor.on_end(_ended_span(123, 2, duration_millis=150))
+
+        emitted = [call.args[0] for call in mock_profiling_context.return_value.emit.call_args_list]
+        assert [[s["frames"] for s in samples] for samples in emitted] == [[["a"]], [["b"]]]
+        assert 123 not in processor._trace_id_to_samples  # noqa SLF001
+
+    @patch("splunk_otel.callgraphs.span_processor.ProfilingContext")
+    def test_discards_buffer_for_fast_span(self, mock_profiling_context):
+        processor = CallgraphsSpanProcessor("test-service", trigger="latency", latency_threshold_millis=100)
+        span = MagicMock(spec=Span)
+        span.get_span_context.return_value = SpanContext(trace_id=123, span_id=456, is_remote=False)
+        processor.on_start(span, Context())
+        processor._filter_stacktraces([{"tid": 1, "frames": []}], {1: (123, 456)})  # noqa SLF001
+
+        processor.on_end(_ended_span(123, 456, duration_millis=50))
+
+        mock_profiling_context.return_value.emit.assert_not_called()
+        assert 123 not in processor._trace_id_to_samples  # noqa SLF001
+        mock_profiling_context.return_value.pause_after.assert_called_once_with(60.0)
+
+
+class TestCallgraphsSpanProcessorBundling:
+    @patch("splunk_otel.callgraphs.span_processor.ProfilingContext")
+    def test_emits_one_bundle_per_trace_when_root_span_ends(self, mock_profiling_context):
+        processor = CallgraphsSpanProcessor("test-service", bundle_traces=True)
+        processor.on_start(_selected_root_span(123, 456), _selected_context())
+        processor.on_start(_selected_root_span(321, 654), _selected_context())
+
+        for _ in range(3):
+            result = processor._filter_stacktraces(  # noqa SLF001
+                [{"tid": 1, "frames": []}, {"tid": 2, "frames": []}],
+                {1: (123, 456), 2: (321, 654)},
+            )
+            assert result == []
+        mock_profiling_context.return_value.emit.assert_not_called()
+
+        processor.on_end(_ended_span(123, 456, duration_millis=10))
+
+        [emitted] = mock_profiling_context.return_value.emit.call_args.args
+        assert len(emitted) == 3
+        assert all(sample["trace_context"] == (123, 456) for sample in emitted)
+        assert 123 not in processor._trace_id_to_samples  # noqa SLF001
+        assert 321 in processor._trace_id_to_samples  # noqa SLF001
+
+    @patch("splunk_otel.callgraphs.span_processor.ProfilingContext")
+    def test_waits_for_last_local_root_of_trace(self, mock_profiling_context):
+        processor = CallgraphsSpanProcessor("test-service", bundle_traces=True)
+        processor.on_start(_selected_root_span(123, 1), _selected_context())
+        processor.on_start(_selected_root_span(123, 2), _selected_context())
+        processor._filter_stacktraces([{"tid": 1, "frames": []}], {1: (123, 1)})  # noqa SLF001
+
+        processor.on_end(_ended_span(123, 1, duration_millis=10))
+        mock_profiling_context.return_value.emit.assert_not_called()
+
+        processor.on_end(_ended_span(123, 2, duration_millis=10))
+        mock_profiling_context.return_value.emit.assert_called_once()
+
+    @patch("splunk_otel.callgraphs.span_processor.ProfilingContext")
+    def test_flushes_bundle_early_when_full(self, mock_profiling_context):
+        processor = CallgraphsSpanProcessor("test-service", bundle_traces=True, max_buffered_samples=2)
+        processor.on_start(_selected_root_span(123, 456), _selected_context())
+
+        for frame in ("a", "b", "c"):
+            processor._filter_stacktraces([{"tid": 1, "frames": [frame]}], {1: (123, 456)})  # noqa SLF001
+
+        [emitted] = mock_profiling_context.return_value.emit.call_args.args
+        assert [s["frames"] for s in emitted] == [["a"], ["b"]]
+
+        processor.on_end(_ended_span(123, 456, duration_millis=10))
+        [emitted] = mock_profiling_context.return_value.emit.call_args.args
+        assert [s["frames"] for s in emitted] == [["c"]]
+
+    @patch("splunk_otel.callgraphs.span_processor.time")
+    @patch("splunk_otel.callgraphs.span_processor.ProfilingContext")
+    def test_flushes_bundle_after_timeout(self, mock_profiling_context, mock_time):
+        mock_time.monotonic.return_value = 0.0
+        mock_time.time.return_value = 0.0
+        processor = CallgraphsSpanProcessor("test-service", bundle_traces=True, bundle_timeout_millis=1000)
+        processor.on_start(_selected_root_span(123, 456), _selected_context())
+
+        processor._filter_stacktraces([{"tid": 1, "frames": []}], {1: (123, 456)})  # noqa SLF001
+        mock_profiling_context.return_value.emit.assert_not_called()
+
+        mock_time.monotonic.return_value = 1.5
+        processor._filter_stacktraces([{"tid": 1, "frames": []}], {1: (123, 456)})  # noqa SLF001
+
+        [emitted] = mock_profiling_context.return_value.emit.call_args.args
+        assert len(emitted) == 2
+        assert processor._trace_id_to_samples[123].samples == deque()  # noqa SLF001
+
+    @patch("splunk_otel.callgraphs.span_processor.ProfilingContext")
+    def test_flush_emits_pending_bundles(self, mock_profiling_context):
+        processor = CallgraphsSpanProcessor("test-service", bundle_traces=True)
+        processor.on_start(_selected_root_span(123, 456), _selected_context())
+        processor._filter_stacktraces([{"tid": 1, "frames": []}], {1: (123, 456)})  # noqa SLF001
+        on_flush = mock_profiling_context.call_args.kwargs["on_flush"]
+
+        on_flush()
+
+        [emitted] = mock_profiling_context.return_value.emit.call_args.args
+        assert len(emitted) == 1
+        assert processor._trace_id_to_samples[123].samples == deque()  # noqa SLF001
+
+    @patch("splunk_otel.callgraphs.span_processor.ProfilingContext")
+    def test_force_flush_and_shutdown_delegate_to_profiler(self, mock_profiling_context):
+        processor = CallgraphsSpanProcessor("test-service")
+        mock_profiling_context.return_value.force_flush.return_value = True
+
+        assert processor.force_flush(1000)
+        processor.shutdown()
+
+        mock_profiling_context.return_value.force_flush.assert_called_once_with(1000)
+        mock_profiling_context.return_value.shutdown.assert_called_once()
+
+    def test_spans_started_after_shutdown_are_ignored(self):
+        processor = CallgraphsSpanProcessor("test-service")
+        provider = TracerProvider()
+        provider.add_span_processor(processor)
+        processor.shutdown()
+
+        # the profiler's timer thread was never started, and must not be started once shut down
+        with provider.get_tracer("test").start_as_current_span("late", context=_selected_context()) as span:
+            pass
+
+        assert "splunk.snapshot.profiling" not in span.attributes
+        assert not processor._trace_refcounts  # noqa SLF001
+        assert not processor._profiler._timer.thread.is_alive()  # noqa SLF001
+
+
+class _FakeSpan:
+    def __init__(self, trace_id, span_id):
+        self._span_context = SpanContext(trace_id=trace_id, span_id=span_id, is_remote=False)
+
+    def get_span_context(self):
+        return self._span_context
+
+    def set_attribute(self, key, value):
+        pass
+
+
+class TestCallgraphsSpanProcessorConcurrency:
+    @patch("splunk_otel.callgraphs.span_processor.ProfilingContext")
+    def test_active_trace_ids_are_reference_counted(self, mock_profiling_context):
+        processor = CallgraphsSpanProcessor("test-service")
+        processor.on_start(_selected_root_span(123, 1), _selected_context())
+        processor.on_start(_selected_root_span(123, 2), _selected_context())
+        processor.on_start(_selected_root_span(321, 3), _selected_context())
+        assert processor._trace_refcounts == {123: 2, 321: 1}  # noqa SLF001
+
+        processor.on_end(_ended_span(123, 1, duration_millis=10))
+        assert processor._trace_refcounts == {123: 1, 321: 1}  # noqa SLF001
+
+        processor.on_end(_ended_span(123, 2, duration_millis=10))
+        processor.on_end(_ended_span(123, 2, duration_millis=10))  # ending twice must not underflow
+        assert processor._trace_refcounts == {321: 1}  # noqa SLF001
+
+    @patch("splunk_otel.callgraphs.span_processor.ProfilingContext")
+    def test_filter_stacktraces_does_not_take_lock(self, mock_profiling_context):
+        processor = CallgraphsSpanProcessor("test-service")
+        processor.on_start(_selected_root_span(123, 456), _selected_context())
+
+        with processor._lock:  # noqa SLF001
+            result = processor._filter_stacktraces([{"tid": 1, "frames": []}], {1: (123, 456)})  # noqa SLF001
+
+        assert len(result) == 1
+
+    @patch("splunk_otel.callgraphs.span_processor.ProfilingContext")
+    def test_concurrent_start_and_end_leave_no_active_traces(self, mock_profiling_context):
+        processor = CallgraphsSpanProcessor("test-service")
+        ctx = _selected_context()
+        stop = threading.Event()
+
+        def requests(worker):
+            for i in range(500):
+                trace_id = worker * 1000 + i % 7 + 1
+                span_id = worker * 1000 + i + 1
+                span = _FakeSpan(trace_id, span_id)
+                processor.on_start(span, ctx)
+                processor.on_end(span)
+
+        def sampler():
+            while not stop.is_set():
+                processor._filter_stacktraces([{"tid": 1, "frames": []}], {1: (1001, 1)})  # noqa SLF001
+
+        sampler_thread = threading.Thread(target=sampler)
+        sampler_thread.start()
+        workers = [threading.Thread(target=requests, args=(worker,)) for worker in range(8)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        stop.set()
+        sampler_thread.join()
+
+        assert processor._trace_refcounts == {}  # noqa SLF001
+        assert processor._span_id_to_trace_id == {}  # noqa SLF001
@@ -34,6 +34,37 @@ def test_distro_env():
     assert len(env_store) > 10
 
 
+def test_performance_profile():
+    env_store = {"SPLUNK_PERFORMANCE_PROFILE": "Low-Overhead"}
+    configure_distro(env_store)
+    assert env_store["OTEL_TRACES_SAMPLER"] == "splunk_throughput"
+    assert env_store["OTEL_BSP_SCHEDULE_DELAY"] == "10000"
+    assert env_store["OTEL_ATTRIBUTE_VALUE_LENGTH_LIMIT"] == "1024"
+    assert env_store["SPLUNK_PROFILER_CALL_STACK_INTERVAL"] == "5000"
+    assert env_store["OTEL_EXPORTER_OTLP_COMPRESSION"] == "gzip"
+    assert env_store["OTEL_TRACES_EXPORTER"] == "otlp"
+
+
+def test_performance_profile_yields_to_env_vars():
+    env_store = {
+        "SPLUNK_PERFORMANCE_PROFILE": "high-fidelity",
+        "OTEL_TRACES_SAMPLER": "parentbased_traceidratio",
+        "OTEL_SPAN_LINK_COUNT_LIMIT": "10",
+    }
+    configure_distro(env_store)
+    assert env_store["OTEL_TRACES_SAMPLER"] == "parentbased_traceidratio"
+    assert env_store["OTEL_SPAN_LINK_COUNT_LIMIT"] == "10"
+    assert env_store["OTEL_BSP_MAX_QUEUE_SIZE"] == "8192"
+
+
+def test_invalid_performance_profile(caplog):
+    env_store = {"SPLUNK_PERFORMANCE_PROFILE": "fastest"}
+    configure_distro(env_store)
+    assert "SPLUNK_PERFORMANCE_PROFILE" in caplog.text
+    assert env_store["OTEL_TRACES_SAMPLER"] == "always_on"
+    assert "OTEL_BSP_SCHEDULE_DELAY" not in env_store
+
+
 def test_access_token():
     env_store = {"SPLUNK_ACCESS_TOKEN": "abc123"}
     configure_distro(env_store)
@@ -199,6 +230,49 @@ def test_callgraphs_propagator_selection_probability():
     assert callgraphs_propagator.selection_probability == 0.5
 
 
+def test_callgraphs_propagator_selection_rate_limit():
+    env_store = {
+        "SPLUNK_SNAPSHOT_PROFILER_ENABLED": "true",
+        "SPLUNK_SNAPSHOT_SELECTION_RATE_LIMIT": "5",
+    }
+    configure_distro(env_store)
+
+    textmap = get_global_textmap()
+    propagators = textmap._propagators  # noqa SLF001
+    callgraphs_propagator = next(p for p in propagators if isinstance(p, CallgraphsPropagator))
+    assert callgraphs_propagator.max_selections_per_second == 5
+
+
+@pytest.mark.parametrize(
+    ("value", "expected"),
+    [("", "baggage"), ("header", "header"), (" Both ", "both"), ("tracestate", "baggage")],
+)
+def test_callgraphs_propagator_selection_carrier(value, expected):
+    env_store = {
+        "SPLUNK_SNAPSHOT_PROFILER_ENABLED": "true",
+        "SPLUNK_SNAPSHOT_SELECTION_CARRIER": value,
+    }
+    configure_distro(env_store)
+
+    textmap = get_global_textmap()
+    propagators = textmap._propagators  # noqa SLF001
+    callgraphs_propagator = next(p for p in propagators if isinstance(p, CallgraphsPropagator))
+    assert callgraphs_propagator.carrier == expected
+
+
+def test_callgraphs_propagator_not_added_for_latency_trigger():
+    env_store = {
+        "SPLUNK_SNAPSHOT_PROFILER_ENABLED": "true",
+        "SPLUNK_SNAPSHOT_PROFILER_TRIGGER": "latency",
+    }
+    configure_distro(env_store)
+
+    textmap = get_global_textmap()
+    propagators = textmap._propagators  # noqa SLF001
+    callgraphs_propagators = [p for p in propagators if isinstance(p, CallgraphsPropagator)]
+    assert len(callgraphs_propagators) == 0
+
+
 def test_callgraphs_propagator_idempotent():
     # Configuring twice with snapshot enabled should not accumulate propagators.
     env_store = {"SPLUNK_SNAPSHOT_PROFILER_ENABLED": "true"}
@@ -255,6 +329,30 @@ def test_logging_instrumentation_enabled_when_not_disabled(monkeypatch):
     assert instrument_calls == [True]
 
 
+def test_async_logging_handler_replaces_instrumentation_handler(monkeypatch):
+    instrument_calls = []
+    install_calls = []
+
+    class LoggingInstrumentorStub:
+        def instrument(self, **kwargs):
+            instrument_calls.append(kwargs)
+
+    monkeypatch.setattr("splunk_otel.distro.LoggingInstrumentor", LoggingInstrumentorStub)
+    monkeypatch.setattr(
+        "splunk_otel.distro.install_async_logging_handler",
+        lambda _env, **kwargs: install_calls.append(kwargs),
+    )
+    configure_distro(
+        {
+            "SPLUNK_LOGS_ASYNC_HANDLER_ENABLED": "true",
+            "OTEL_PYTHON_LOG_HANDLER_LEVEL": "warning",
+            "OTEL_PYTHON_LOG_CODE_ATTRIBUTES": "true",
+        }
+    )
+    assert instrument_calls == [{"enable_log_auto_instrumentation": False}]
+    assert install_calls == [{"level": logging.WARNING, "log_code_attributes": True}]
+
+
 def configure_distro(env_store):
     sd = SplunkDistro()
     sd.env = Env(env_store)
@@ -0,0 +1,181 @@
+# Copyright Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import signal
+import sys
+from unittest.mock import MagicMock, patch
+
+import pytest
+from opentelemetry.sdk.trace import ReadableSpan
+from opentelemetry.trace import SpanContext
+
+from splunk_otel.env import Env
+from splunk_otel.flight_recorder import (
+    _FlightRecorder,
+    _FlightRecorderSpanProcessor,
+    _start_flight_recorder_if_enabled,
+    start_flight_recorder,
+)
+from splunk_otel.profile import _install_signal_handler
+
+
+class _FakeScraper:
+    def __init__(self, thread_states=None):
+        self.thread_states = thread_states or {}
+        self.emitted = []
+
+    def emit(self, stacktraces):
+        self.emitted.append(stacktraces)
+
+
+def _recorder(scraper, stacks, window_seconds=0.03, interval_millis=10):
+    samples = iter(stacks)
+    times = iter(range(1000))
+    return _FlightRecorder(
+        scraper,
+        interval_millis,
+        window_seconds,
+        collect_stacktraces_func=lambda: next(samples),
+        time_func=lambda: float(next(times)),
+    )
+
+
+def test_ring_buffer_keeps_only_the_window():
+    scraper = _FakeScraper()
+    recorder = _recorder(scraper, [[{"tid": 1, "frames": [("f.py", name, 1)]}] for name in "abcde"])
+
+    for _ in range(5):
+        recorder.record()
+    recorder.dump("test")
+
+    [stacktraces] = scraper.emitted
+    assert [st["frames"][0][1] for st in stacktraces] == ["c", "d", "e"]
+    assert [st["time_seconds"] for st in stacktraces] == [2.0, 3.0, 4.0]
+
+
+def test_identical_stacks_are_stored_once():
+    scraper = _FakeScraper()
+    frames = [("f.py", "f", 1), ("g.py", "g", 2)]
+    recorder = _recorder(scraper, [[{"tid": 1, "frames": frames}, {"tid": 2, "frames": list(frames)}]] * 3, 1)
+
+    for _ in range(3):
+        recorder.record()
+
+    assert len(recorder._stacks) == 1  # noqa SLF001
+
+
+def test_dump_keeps_trace_context_from_sample_time_and_clears_buffer():
+    thread_states = {1: (0xAB, 0xCD)}
+    scraper = _FakeScraper(thread_states)
+    recorder = _recorder(scraper, [[{"tid": 1, "frames": [], "labels": {"tenant": "acme"}}]])
+
+    recorder.record()
+    thread_states[1] = None
+    recorder.dump("test")
+    recorder.dump("test")
+
+    assert scraper.emitted[0][0]["trace_context"] == (0xAB, 0xCD)
+    assert scraper.emitted[0][0]["labels"] == {"tenant": "acme"}
+    assert scraper.emitted[1] == []
+
+
+def test_compaction_drops_stacks_outside_the_window():
+    scraper = _FakeScraper()
+    recorder = _recorder(scraper, [[{"tid": 1, "frames": [("f.py", str(i), 1)]}] for i in range(20)], 0.02)
+
+    with patch("splunk_otel.flight_recorder._MAX_INTERNED_STACKS", 4):
+        for _ in range(20):
+            recorder.record()
+    recorder.dump("test")
+
+    assert len(recorder._stacks) <= 6  # noqa SLF001
+    assert [st["frames"][0][1] for st in scraper.emitted[0]] == ["18", "19"]
+
+
+def test_requested_dump_happens_on_next_tick():
+    scraper = _FakeScraper()
+    recorder = _recorder(scraper, [[{"tid": 1, "frames": []}]] * 2)
+
+    recorder._tick()  # noqa SLF001
+    assert scraper.emitted == []
+
+    recorder.request_dump("signal")
+    recorder._tick()  # noqa SLF001
+    assert len(scraper.emitted[0]) == 2
+
+
+def _ended_span(duration_millis, parent=None):
+    span = MagicMock(spec=ReadableSpan)
+    span.parent = parent
+    span.start_time = 0
+    span.end_time = duration_millis * 1_000_000
+    return span
+
+
+def test_span_processor_requests_dump_for_slow_root_span():
+    recorder = MagicMock()
+    processor = _FlightRecorderSpanProcessor(recorder, 100)
+
+    processor.on_end(_ended_span(50))
+    recorder.request_dump.assert_not_called()
+
+    processor.on_end(_ended_span(150, parent=SpanContext(1, 2, is_remote=False)))
+    recorder.request_dump.assert_not_called()
+
+    processor.on_end(_ended_span(150, parent=SpanContext(1, 2, is_remote=True)))
+    recorder.request_dump.assert_called_once_with("slow_span")
+
+
+@patch("splunk_otel.flight_recorder.start_flight_recorder")
+def test_not_started_when_disabled(mock_start):
+    _start_flight_recorder_if_enabled(Env({}))
+    mock_start.assert_not_called()
+
+
+@patch("splunk_otel.flight_recorder.start_flight_recorder")
+def test_started_when_enabled(mock_start):
+    env = Env({"SPLUNK_PROFILER_FLIGHT_RECORDER_ENABLED": "true"})
+    _start_flight_recorder_if_enabled(env)
+    mock_start.assert_called_once_with(env)
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="SIGUSR2 is not available on Windows")
+def test_install_signal_handler_chains_previous_handler():
+    calls = []
+    previous = signal.signal(signal.SIGUSR2, lambda *_: calls.append("previous"))
+    try:
+        assert _install_signal_handler("SIGUSR2", lambda: calls.append("callback"))
+        signal.raise_signal(signal.SIGUSR2)
+    finally:
+        signal.signal(signal.SIGUSR2, previous)
+
+    assert calls == ["callback", "previous"]
+
+
+def test_install_signal_handler_rejects_unknown_signal():
+    assert not _install_signal_handler("SIGBOGUS", lambda: None)
+
+
+@patch("splunk_otel.flight_recorder.atexit", MagicMock())
+@patch("splunk_otel.flight_recorder._install_exception_hooks", MagicMock())
+@patch("splunk_otel.flight_recorder.start_thread_context_tracking", MagicMock())
+@patch("splunk_otel.flight_recorder._FlightRecorder", MagicMock())
+@patch("splunk_otel.flight_recorder._install_signal_handler")
+def test_default_signal_is_not_shared_with_burst_profiling(mock_install_signal_handler, caplog):
+    start_flight_recorder(Env({}))
+    assert mock_install_signal_handler.call_args.args[0] == "SIGURG"
+    assert "both" not in caplog.text
+
+    start_flight_recorder(Env({"SPLUNK_PROFILER_BURST_SIGNAL": "SIGURG"}))
+    assert "dumps the flight recorder and starts a burst" in caplog.text
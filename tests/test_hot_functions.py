@@ -0,0 +1,79 @@
+# Copyright Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from unittest.mock import patch
+
+import pytest
+from opentelemetry.sdk.metrics import MeterProvider
+from opentelemetry.sdk.metrics.export import InMemoryMetricReader
+
+from splunk_otel.env import Env
+from splunk_otel.hot_functions import _HotFunctions, start_hot_functions
+
+
+def _stack(*names):
+    return {"tid": 1, "frames": [("app.py", name, 1) for name in names]}
+
+
+def _hot_functions(count=10, half_life_seconds=10.0):
+    now = [0.0]
+    return _HotFunctions(count, half_life_seconds, time_func=lambda: now[0]), now
+
+
+def test_counts_self_and_inclusive_samples():
+    hot_functions, _ = _hot_functions()
+
+    hot_functions.record([_stack("main", "handle", "parse"), _stack("main", "handle")])
+    hot_functions.record([_stack("main", "recurse", "recurse")])
+
+    inclusive = {counts.function_name: counts.inclusive for counts in hot_functions.top("inclusive")}
+    self_counts = {counts.function_name: counts.self for counts in hot_functions.top("self")}
+    assert inclusive == {"main": 3, "handle": 2, "parse": 1, "recurse": 1}
+    assert self_counts == {"parse": 1, "handle": 1, "recurse": 1}
+
+
+def test_counts_decay_with_half_life():
+    hot_functions, now = _hot_functions(half_life_seconds=10.0)
+    hot_functions.record([_stack("main")] * 8)
+
+    now[0] = 20.0
+
+    [counts] = hot_functions.top("self")
+    assert counts.self == pytest.approx(2.0)
+
+
+def test_reports_top_n_and_bounds_tracked_functions():
+    hot_functions, _ = _hot_functions(count=2)
+
+    for i in range(50):
+        hot_functions.record([_stack(f"f{i}")] * (i + 1))
+
+    assert [counts.function_name for counts in hot_functions.top("self")] == ["f49", "f48"]
+    assert len(hot_functions._functions) <= 20  # noqa SLF001
+
+
+def test_exports_gauges():
+    reader = InMemoryMetricReader()
+    with patch("splunk_otel.hot_functions.get_meter", MeterProvider(metric_readers=[reader]).get_meter):
+        hot_functions = start_hot_functions(Env({"SPLUNK_PROFILER_HOT_FUNCTIONS_COUNT": "1"}))
+    hot_functions.record([_stack("main", "handle"), _stack("main", "parse"), _stack("main", "parse")])
+
+    metrics = {
+        metric.name: [(point.attributes["code.function.name"], point.value) for point in metric.data.data_points]
+        for resource_metrics in reader.get_metrics_data().resource_metrics
+        for scope_metrics in resource_metrics.scope_metrics
+        for metric in scope_metrics.metrics
+    }
+    assert metrics["profiling.function.samples.self"] == [("parse", pytest.approx(2.0, rel=1e-3))]
+    assert metrics["profiling.function.samples.inclusive"] == [("main", pytest.approx(3.0, rel=1e-3))]
@@ -0,0 +1,221 @@
+# Copyright Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import subprocess
+import sys
+import textwrap
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+from opentelemetry.sdk._logs import LoggerProvider
+from opentelemetry.sdk._logs.export import InMemoryLogRecordExporter, SimpleLogRecordProcessor
+from opentelemetry.sdk.metrics import MeterProvider
+from opentelemetry.sdk.metrics.export import InMemoryMetricReader
+from opentelemetry.sdk.trace import TracerProvider
+
+from splunk_otel.env import Env
+from splunk_otel.log_handler import AsyncLoggingHandler, install_async_logging_handler
+
+
+@pytest.fixture
+def exporter():
+    return InMemoryLogRecordExporter()
+
+
+@pytest.fixture
+def handler(exporter):
+    logger_provider = LoggerProvider()
+    logger_provider.add_log_record_processor(SimpleLogRecordProcessor(exporter))
+    handler = AsyncLoggingHandler(logger_provider=logger_provider, max_queue_size=2)
+    yield handler
+    handler.close()
+
+
+def _logger(handler):
+    logger = logging.getLogger("test_log_handler")
+    logger.handlers = [handler]
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    return logger
+
+
+def _pause_worker(handler):
+    handler._stopping.set()  # noqa SLF001
+    handler._wakeup.set()  # noqa SLF001
+    handler._worker.join()  # noqa SLF001
+
+
+def _bodies(exporter):
+    return [log.log_record.body for log in exporter.get_finished_logs()]
+
+
+def test_emits_records_with_context_of_logging_thread(handler, exporter):
+    tracer = TracerProvider().get_tracer("test")
+    with tracer.start_as_current_span("span") as span:
+        _logger(handler).info("in span")
+    handler.flush()
+
+    (log,) = exporter.get_finished_logs()
+    assert log.log_record.body == "in span"
+    assert log.log_record.trace_id == span.get_span_context().trace_id
+    assert log.log_record.span_id == span.get_span_context().span_id
+
+
+def test_flush_waits_for_worker_to_emit(handler, exporter):
+    emitting_threads = []
+    export = exporter.export
+    exporter.export = lambda batch: emitting_threads.append(threading.current_thread()) or export(batch)
+    logger = _logger(handler)
+
+    for i in range(2):
+        logger.info("record %d", i)
+        handler.flush()
+
+    assert _bodies(exporter) == ["record 0", "record 1"]
+    assert set(emitting_threads) == {handler._worker}  # noqa SLF001
+
+
+def test_logging_wakes_idle_worker(handler, exporter):
+    while not handler._idle:  # noqa SLF001
+        time.sleep(0.001)
+
+    _logger(handler).info("woken")
+
+    deadline = time.monotonic() + 5
+    while not exporter.get_finished_logs() and time.monotonic() < deadline:
+        time.sleep(0.001)
+    assert _bodies(exporter) == ["woken"]
+
+
+def test_worker_emits_queued_records(handler, exporter):
+    _logger(handler).info("queued")
+    handler.close()
+    assert _bodies(exporter) == ["queued"]
+
+
+def test_drops_records_when_queue_is_full(handler, exporter):
+    _pause_worker(handler)
+    logger = _logger(handler)
+    for i in range(3):
+        logger.info("record %d", i)
+
+    assert next(handler.observe_dropped(None)).value == 1
+    assert next(handler.observe_queue_size(None)).value == 2
+    handler.flush()
+    assert _bodies(exporter) == ["record 0", "record 1"]
+
+
+def test_logging_does_not_wait_for_handler_lock(handler, exporter):
+    _pause_worker(handler)
+    logger = _logger(handler)
+    with handler.lock:
+        thread = threading.Thread(target=logger.info, args=("unblocked",))
+        thread.start()
+        thread.join(5)
+        assert not thread.is_alive()
+    handler.flush()
+    assert _bodies(exporter) == ["unblocked"]
+
+
+def test_queues_record_prepared_on_logging_thread(handler, exporter):
+    _pause_worker(handler)
+    args = ["before"]
+    try:
+        raise ValueError("boom")  # noqa TRY301
+    except ValueError:
+        _logger(handler).exception("args: %s", args)
+    args[0] = "after"
+
+    ((record, _),) = handler._records  # noqa SLF001
+    assert record.msg == "args: ['before']"
+    assert record.args is None
+    assert "ValueError: boom" in record.exc_text
+
+    handler.flush()
+    (log,) = exporter.get_finished_logs()
+    assert log.log_record.body == "args: ['before']"
+    assert log.log_record.attributes["exception.type"] == "ValueError"
+    assert log.log_record.attributes["exception.message"] == "boom"
+
+
+_EXIT_SCRIPT = textwrap.dedent(
+    """
+    import logging
+
+    from opentelemetry._logs import set_logger_provider
+    from opentelemetry.sdk._logs import LoggerProvider
+    from opentelemetry.sdk._logs.export import BatchLogRecordProcessor, LogRecordExporter, LogRecordExportResult
+
+    from splunk_otel.log_handler import _close_async_logging_handler_at_exit, install_async_logging_handler
+
+
+    class CountingExporter(LogRecordExporter):
+        def __init__(self):
+            self.exported = 0
+
+        def export(self, batch):
+            self.exported += len(batch)
+            return LogRecordExportResult.SUCCESS
+
+        def force_flush(self, timeout_millis=30000):
+            return True
+
+        def shutdown(self):
+            print(self.exported)
+
+
+    # the same order as at startup: the distro installs the handler before the SDK configures the provider
+    handler = install_async_logging_handler()
+    logger_provider = LoggerProvider()
+    logger_provider.add_log_record_processor(BatchLogRecordProcessor(CountingExporter()))
+    set_logger_provider(logger_provider)
+    _close_async_logging_handler_at_exit()
+
+    logging.getLogger().setLevel(logging.INFO)
+    handler._stopping.set()
+    handler._wakeup.set()
+    handler._worker.join()
+    for i in range(100):
+        logging.info("record %d", i)
+    """
+)
+
+
+def test_queued_records_are_exported_at_exit():
+    result = subprocess.run([sys.executable, "-c", _EXIT_SCRIPT], capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "100"
+
+
+def test_install_adds_root_handler_and_reports_metrics(caplog):
+    reader = InMemoryMetricReader()
+    with patch("splunk_otel.log_handler.get_meter", MeterProvider(metric_readers=[reader]).get_meter):
+        handler = install_async_logging_handler(Env({"SPLUNK_LOGS_ASYNC_HANDLER_QUEUE_SIZE": "0"}))
+    try:
+        assert handler in logging.getLogger().handlers
+        assert handler._max_queue_size == 2048  # noqa SLF001
+        assert "SPLUNK_LOGS_ASYNC_HANDLER_QUEUE_SIZE" in caplog.text
+
+        metrics = {
+            metric.name
+            for resource_metrics in reader.get_metrics_data().resource_metrics
+            for scope_metrics in resource_metrics.scope_metrics
+            for metric in scope_metrics.metrics
+        }
+        assert metrics == {"splunk.logs.handler.dropped", "splunk.logs.handler.queue.size"}
+    finally:
+        logging.getLogger().removeHandler(handler)
+        handler.close()
@@ -0,0 +1,145 @@
+# Copyright Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from unittest.mock import MagicMock
+
+from opentelemetry._logs import LogRecord, SeverityNumber
+from opentelemetry.sdk._logs import ReadWriteLogRecord
+from opentelemetry.sdk._logs.export import BatchLogRecordProcessor
+from opentelemetry.sdk.util.instrumentation import InstrumentationScope
+from opentelemetry.trace import TraceFlags
+
+from splunk_otel.env import Env
+from splunk_otel.sampling import _threshold
+from splunk_otel.log_sampling import TraceCorrelatedLogRecordProcessor, _get_export_log_record_processor
+
+_SAMPLED = TraceFlags(TraceFlags.SAMPLED)
+_UNSAMPLED = TraceFlags(TraceFlags.DEFAULT)
+_LOW_TRACE_ID = 0x0BADC0DE_00000000_00000000_00000001
+_HIGH_TRACE_ID = 0x0BADC0DE_000000FF_FFFFFFFF_FFFFFFFF
+
+
+def _record(trace_id=None, trace_flags=None, severity=SeverityNumber.INFO, scope="app"):
+    return ReadWriteLogRecord(
+        LogRecord(
+            trace_id=trace_id, span_id=1 if trace_id else None, trace_flags=trace_flags, severity_number=severity
+        ),
+        instrumentation_scope=InstrumentationScope(scope),
+    )
+
+
+def _kept(processor, record):
+    processor._delegate.on_emit.reset_mock()  # noqa SLF001
+    processor.on_emit(record)
+    return processor._delegate.on_emit.called  # noqa SLF001
+
+
+def test_keeps_logs_of_sampled_traces():
+    processor = TraceCorrelatedLogRecordProcessor(MagicMock())
+    assert _kept(processor, _record(_HIGH_TRACE_ID, _SAMPLED))
+
+
+def test_drops_logs_of_unsampled_traces():
+    processor = TraceCorrelatedLogRecordProcessor(MagicMock())
+    assert not _kept(processor, _record(_LOW_TRACE_ID, _UNSAMPLED))
+
+
+def test_keeps_share_of_unsampled_traces_by_trace_id():
+    # like the throughput sampler, traces with the highest random trace id bits are kept
+    processor = TraceCorrelatedLogRecordProcessor(MagicMock(), unsampled_probability=0.5)
+    assert not _kept(processor, _record(_LOW_TRACE_ID, _UNSAMPLED))
+    assert _kept(processor, _record(_HIGH_TRACE_ID, _UNSAMPLED))
+
+
+def test_keeps_logs_at_or_above_min_severity():
+    processor = TraceCorrelatedLogRecordProcessor(MagicMock(), min_severity=SeverityNumber.ERROR)
+    assert not _kept(processor, _record(_LOW_TRACE_ID, _UNSAMPLED, SeverityNumber.WARN))
+    assert _kept(processor, _record(_LOW_TRACE_ID, _UNSAMPLED, SeverityNumber.ERROR))
+    assert _kept(processor, _record(_LOW_TRACE_ID, _UNSAMPLED, SeverityNumber.FATAL))
+
+
+def test_keeps_profiling_and_secureapp_logs():
+    processor = TraceCorrelatedLogRecordProcessor(MagicMock(), uncorrelated_max_per_second=1)
+    assert _kept(processor, _record(scope="otel.profiling"))
+    assert _kept(processor, _record(scope="otel.profiling"))
+    assert _kept(processor, _record(scope="secureapp"))
+
+
+def test_caps_uncorrelated_logs_per_second():
+    now = [100.0]
+    processor = TraceCorrelatedLogRecordProcessor(MagicMock(), uncorrelated_max_per_second=2, time_func=lambda: now[0])
+
+    assert [_kept(processor, _record()) for _ in range(3)] == [True, True, False]
+    now[0] = 101.5
+    assert _kept(processor, _record())
+
+
+def test_uncorrelated_logs_unlimited_by_default():
+    processor = TraceCorrelatedLogRecordProcessor(MagicMock())
+    assert all(_kept(processor, _record()) for _ in range(100))
+
+
+def test_delegates_flush_and_shutdown():
+    delegate = MagicMock()
+    processor = TraceCorrelatedLogRecordProcessor(delegate)
+
+    processor.force_flush(100)
+    processor.shutdown()
+
+    delegate.force_flush.assert_called_once_with(100)
+    delegate.shutdown.assert_called_once()
+
+
+def test_export_log_record_processor_disabled_by_default():
+    assert _get_export_log_record_processor(Env({})) is None
+
+
+def test_export_log_record_processor_from_env():
+    env = Env(
+        {
+            "SPLUNK_LOGS_SAMPLING_ENABLED": "true",
+            "SPLUNK_LOGS_SAMPLING_MIN_SEVERITY": "error",
+            "SPLUNK_LOGS_SAMPLING_UNSAMPLED_PROBABILITY": "0.5",
+            "SPLUNK_LOGS_SAMPLING_UNCORRELATED_RATE_LIMIT": "10",
+        }
+    )
+    processor = _get_export_log_record_processor(env)(MagicMock())
+    batch_processor = processor._delegate  # noqa SLF001
+    try:
+        assert isinstance(batch_processor, BatchLogRecordProcessor)
+        assert processor._min_severity == SeverityNumber.ERROR.value  # noqa SLF001
+        assert processor._uncorrelated_max_per_second == 10  # noqa SLF001
+        processor._delegate = MagicMock()  # noqa SLF001
+        assert not _kept(processor, _record(_LOW_TRACE_ID, _UNSAMPLED))
+        assert _kept(processor, _record(_HIGH_TRACE_ID, _UNSAMPLED))
+    finally:
+        batch_processor.shutdown()
+
+
+def test_export_log_record_processor_ignores_invalid_values(caplog):
+    env = Env(
+        {
+            "SPLUNK_LOGS_SAMPLING_ENABLED": "true",
+            "SPLUNK_LOGS_SAMPLING_MIN_SEVERITY": "loud",
+            "SPLUNK_LOGS_SAMPLING_UNSAMPLED_PROBABILITY": "2",
+        }
+    )
+    processor = _get_export_log_record_processor(env)(MagicMock())
+    try:
+        assert processor._min_severity == SeverityNumber.WARN.value  # noqa SLF001
+        assert processor._unsampled_threshold == _threshold(0)  # noqa SLF001
+        assert "SPLUNK_LOGS_SAMPLING_MIN_SEVERITY" in caplog.text
+        assert "SPLUNK_LOGS_SAMPLING_UNSAMPLED_PROBABILITY" in caplog.text
+    finally:
+        processor.shutdown()
@@ -13,11 +13,16 @@
 # limitations under the License.
 
 import logging
+from unittest.mock import patch
 
+from opentelemetry._opamp.callbacks import MessageData
 from opentelemetry._opamp.client import OpAMPClient
 from opentelemetry._opamp.proto import opamp_pb2
 from opentelemetry.environment_variables import OTEL_LOGS_EXPORTER
+from opentelemetry.propagate import get_global_textmap
 from opentelemetry.sdk.environment_variables import (
+    OTEL_TRACES_SAMPLER,
+    OTEL_TRACES_SAMPLER_ARG,
     OTEL_EXPORTER_OTLP_ENDPOINT,
     OTEL_EXPORTER_OTLP_LOGS_ENDPOINT,
     OTEL_EXPORTER_OTLP_METRICS_ENDPOINT,
@@ -37,9 +42,17 @@ from splunk_otel.env import (
     SPLUNK_PROFILER_ENABLED,
     SPLUNK_SNAPSHOT_PROFILER_ENABLED,
     SPLUNK_SNAPSHOT_SAMPLING_INTERVAL,
+    SPLUNK_SNAPSHOT_SELECTION_PROBABILITY,
+    SPLUNK_TRACES_SAMPLER_RATE_LIMIT,
+    SPLUNK_TRACES_SAMPLER_TARGET_RATE,
 )
+from splunk_otel.propagator import CallgraphsPropagator
 from splunk_otel.opamp import (
+    _REMOTE_SETTING_ALIASES,
+    _REMOTE_SETTINGS,
     _build_client,
+    _apply_remote_settings,
+    _SplunkCallbacks,
     _sanitize_endpoint_for_reporting,
     _start_agent,
     build_effective_config_report,
@@ -61,14 +74,30 @@ class FakeAgent:
         self.init_kwargs = kwargs
         self.started = False
 
+        self.sent = []
+
     def start(self):
         self.started = True
 
+    def send(self, payload):
+        self.sent.append(opamp_pb2.AgentToServer.FromString(payload))
+
 
 def parse_properties(content):
     return dict(line.split("=", 1) for line in content.splitlines())
 
 
+def remote_config_message(body, content_type="text/plain; format=properties; vendor=splunk; v=1.0.0", config_hash=b"1"):
+    remote_config = opamp_pb2.AgentRemoteConfig(config_hash=config_hash)
+    remote_config.config.config_map["environment"].body = body.encode()
+    remote_config.config.config_map["environment"].content_type = content_type
+    return MessageData(remote_config=remote_config)
+
+
+def opamp_client():
+    return OpAMPClient(endpoint="http://host/opamp", agent_identifying_attributes={})
+
+
 def test_opamp_post_sdk_entry_point_is_registered():
     [entry_point] = entry_points(group="_opentelemetry_opamp", name="post_sdk_init_function")
 
@@ -303,6 +332,150 @@ def test_client_skips_unsupported_resource_attribute(caplog):
     assert "Skipping OpAMP resource attribute custom.mapping with unsupported type dict" in caplog.text
 
 
+def test_callbacks_apply_remote_profiler_settings():
+    env_store = {SPLUNK_PROFILER_ENABLED: "false"}
+    applied = []
+    callbacks = _SplunkCallbacks(Env(env_store), lambda env: applied.append(dict(env.store)))
+    agent = FakeAgent()
+
+    callbacks.on_message(
+        agent,
+        opamp_client(),
+        remote_config_message(
+            f"{SPLUNK_PROFILER_ENABLED}=true\n"
+            f"{SPLUNK_PROFILER_CALL_STACK_INTERVAL}=100\n"
+            "SPLUNK_SNAPSHOT_PROFILER_SAMPLING_INTERVAL=5\n"
+            f"{SPLUNK_SNAPSHOT_SELECTION_PROBABILITY}=0.5\n"
+            "OTEL_SERVICE_NAME=ignored\n"
+        ),
+    )
+
+    assert env_store == {
+        SPLUNK_PROFILER_ENABLED: "true",
+        SPLUNK_PROFILER_CALL_STACK_INTERVAL: "100",
+        SPLUNK_SNAPSHOT_SAMPLING_INTERVAL: "5",
+        SPLUNK_SNAPSHOT_SELECTION_PROBABILITY: "0.5",
+    }
+    assert applied == [env_store]
+    [message] = agent.sent
+    assert message.remote_config_status.last_remote_config_hash == b"1"
+    assert message.remote_config_status.status == opamp_pb2.RemoteConfigStatuses_APPLIED
+    report = parse_properties(message.effective_config.config_map.config_map["environment"].body.decode())
+    assert report[SPLUNK_PROFILER_ENABLED] == "true"
+    assert report[SPLUNK_PROFILER_CALL_STACK_INTERVAL] == "100"
+    assert report["SPLUNK_SNAPSHOT_PROFILER_SAMPLING_INTERVAL"] == "5"
+    assert report[SPLUNK_SNAPSHOT_SELECTION_PROBABILITY] == "0.5"
+
+
+def test_effective_config_report_includes_every_remote_setting():
+    report = parse_properties(build_effective_config_report(Env({})))
+    reported_names = {_REMOTE_SETTING_ALIASES.get(key, key) for key in report}
+
+    assert set(_REMOTE_SETTINGS) <= reported_names
+
+
+def test_callbacks_apply_remote_sampler_settings():
+    env_store = {OTEL_TRACES_SAMPLER: "splunk_adjustable"}
+    callbacks = _SplunkCallbacks(Env(env_store), lambda _env: None)
+    agent = FakeAgent()
+
+    callbacks.on_message(
+        agent,
+        opamp_client(),
+        remote_config_message(f"{OTEL_TRACES_SAMPLER_ARG}=0.25\n{SPLUNK_TRACES_SAMPLER_RATE_LIMIT}=100"),
+    )
+
+    [message] = agent.sent
+    report = parse_properties(message.effective_config.config_map.config_map["environment"].body.decode())
+    assert report[OTEL_TRACES_SAMPLER] == "splunk_adjustable"
+    assert report[OTEL_TRACES_SAMPLER_ARG] == "0.25"
+    assert report[SPLUNK_TRACES_SAMPLER_RATE_LIMIT] == "100.0"
+
+
+def test_effective_config_report_includes_throughput_sampler_target():
+    report = parse_properties(
+        build_effective_config_report(
+            Env({OTEL_TRACES_SAMPLER: "splunk_throughput", SPLUNK_TRACES_SAMPLER_TARGET_RATE: "25"})
+        )
+    )
+
+    assert report[OTEL_TRACES_SAMPLER] == "splunk_throughput"
+    assert report[SPLUNK_TRACES_SAMPLER_TARGET_RATE] == "25"
+
+
+def test_callbacks_accept_json_remote_config():
+    env_store = {}
+    callbacks = _SplunkCallbacks(Env(env_store), lambda _env: None)
+
+    callbacks.on_message(
+        FakeAgent(),
+        opamp_client(),
+        remote_config_message(
+            f'{{"{SPLUNK_SNAPSHOT_PROFILER_ENABLED}": true, "{SPLUNK_SNAPSHOT_SAMPLING_INTERVAL}": 20}}',
+            content_type="application/json",
+        ),
+    )
+
+    assert env_store == {SPLUNK_SNAPSHOT_PROFILER_ENABLED: "true", SPLUNK_SNAPSHOT_SAMPLING_INTERVAL: "20"}
+
+
+def test_callbacks_reject_invalid_remote_config(caplog):
+    env_store = {}
+    applied = []
+    callbacks = _SplunkCallbacks(Env(env_store), applied.append)
+    agent = FakeAgent()
+
+    with caplog.at_level(logging.WARNING, logger="splunk_otel.opamp"):
+        callbacks.on_message(
+            agent,
+            opamp_client(),
+            remote_config_message(f"{SPLUNK_PROFILER_ENABLED}=true\n{SPLUNK_SNAPSHOT_SELECTION_PROBABILITY}=2"),
+        )
+
+    assert env_store == {}
+    assert applied == []
+    [message] = agent.sent
+    assert message.remote_config_status.status == opamp_pb2.RemoteConfigStatuses_FAILED
+    assert f"{SPLUNK_SNAPSHOT_SELECTION_PROBABILITY}=2" in message.remote_config_status.error_message
+    assert "Ignoring invalid OpAMP remote config" in caplog.text
+
+
+def test_callbacks_apply_each_remote_config_once():
+    applied = []
+    callbacks = _SplunkCallbacks(Env({}), applied.append)
+    agent = FakeAgent()
+    client = opamp_client()
+
+    callbacks.on_message(agent, client, remote_config_message(f"{SPLUNK_PROFILER_ENABLED}=true"))
+    callbacks.on_message(agent, client, remote_config_message(f"{SPLUNK_PROFILER_ENABLED}=true"))
+    callbacks.on_message(agent, client, MessageData())
+    callbacks.on_message(agent, client, remote_config_message(f"{SPLUNK_PROFILER_ENABLED}=false", config_hash=b"2"))
+
+    assert len(applied) == 2
+    assert len(agent.sent) == 2
+
+
+@patch("splunk_otel.callgraphs._reconfigure_callgraphs")
+@patch("splunk_otel.profile._reconfigure_profiling")
+@patch("splunk_otel.sampling._reconfigure_sampler")
+def test_apply_remote_settings_reconfigures_sampler_profilers_and_propagator(
+    mock_reconfigure_sampler, mock_reconfigure_profiling, mock_reconfigure_callgraphs
+):
+    env = Env({SPLUNK_SNAPSHOT_PROFILER_ENABLED: "true", SPLUNK_SNAPSHOT_SELECTION_PROBABILITY: "0.5"})
+
+    _apply_remote_settings(env)
+
+    mock_reconfigure_sampler.assert_called_once_with(env)
+    mock_reconfigure_profiling.assert_called_once_with(env)
+    mock_reconfigure_callgraphs.assert_called_once_with(env)
+    [propagator] = [p for p in get_global_textmap()._propagators if isinstance(p, CallgraphsPropagator)]  # noqa SLF001
+    assert propagator.selection_probability == 0.5
+
+    _apply_remote_settings(Env({SPLUNK_SNAPSHOT_PROFILER_ENABLED: "false"}))
+
+    assert not [p for p in get_global_textmap()._propagators if isinstance(p, CallgraphsPropagator)]  # noqa SLF001
+
+
 def test_sanitize_endpoint_for_reporting():
     assert (
         _sanitize_endpoint_for_reporting("https://collector.example.com:4318/v1/traces")
@@ -334,8 +507,12 @@ def test_effective_config_report_uses_defaults():
         "SPLUNK_SNAPSHOT_PROFILER_ENABLED": "false",
         "SPLUNK_SNAPSHOT_PROFILER_SAMPLING_INTERVAL": "10",
         "SPLUNK_PROFILER_CALL_STACK_INTERVAL": "1000",
+        "SPLUNK_SNAPSHOT_SELECTION_PROBABILITY": "0.01",
         "OTEL_CONFIG_FILE": "null",
         "OTEL_EXPERIMENTAL_CONFIG_FILE": "null",
+        "OTEL_TRACES_SAMPLER_ARG": "1.0",
+        "SPLUNK_TRACES_SAMPLER_RATE_LIMIT": "0",
+        "SPLUNK_TRACES_SAMPLER_TARGET_RATE": "10",
     }
 
 
@@ -0,0 +1,122 @@
+# Copyright Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from os.path import abspath, dirname
+from unittest.mock import MagicMock, patch
+
+from splunk_otel.env import Env
+from splunk_otel.perf import _start_perf_map_if_enabled, activate_perf_map, ingest_perf_script, main, parse_perf_script
+
+
+def _perf_script_lines():
+    with open(f"{dirname(abspath(__file__))}/fixtures/perf_script.txt") as f:
+        return f.readlines()
+
+
+def test_parse_perf_script():
+    stacktraces = list(parse_perf_script(_perf_script_lines()))
+
+    assert [(s["tid"], s["perf_time_seconds"]) for s in stacktraces] == [
+        (4243, 1000.0),
+        (999, 1000.5),
+        (4244, 1005.0),
+        (4243, 1012.0),
+    ]
+    assert stacktraces[0]["frames"] == [
+        ("/app/main.py", "<module>", 0),
+        ("/app/views.py", "handler", 0),
+        ("/usr/bin/python3.12", "_PyEval_EvalFrameDefault", 0),
+    ]
+    assert stacktraces[2]["frames"] == [
+        ("/app/xml.py", "parse", 0),
+        ("[unknown]", "[unknown]", 0),
+        ("/usr/lib/libxml2.so.2", "xmlParseDocument", 0),
+    ]
+
+
+def test_parse_perf_script_filters_by_pid():
+    stacktraces = list(parse_perf_script(_perf_script_lines(), pid=4242))
+
+    assert [s["tid"] for s in stacktraces] == [4243, 4244, 4243]
+
+
+def test_ingest_batches_by_capture_time():
+    scraper = MagicMock()
+
+    count = ingest_perf_script(_perf_script_lines(), scraper, pid=4242, batch_seconds=10, end_time_seconds=2000.0)
+
+    assert count == 3
+    batches = [call.args[0] for call in scraper.emit.call_args_list]
+    assert [[s["tid"] for s in batch] for batch in batches] == [[4243, 4244], [4243]]
+    assert [s["time_seconds"] for s in batches[0]] == [1988.0, 1993.0]
+    assert batches[1][0]["time_seconds"] == 2000.0
+    assert all("perf_time_seconds" not in s for batch in batches for s in batch)
+
+
+def test_ingest_empty_input():
+    scraper = MagicMock()
+
+    assert ingest_perf_script([], scraper) == 0
+    scraper.emit.assert_not_called()
+
+
+@patch("splunk_otel.perf.sys")
+def test_activate_perf_map(mock_sys):
+    mock_sys.platform = "linux"
+
+    assert activate_perf_map()
+
+    mock_sys.activate_stack_trampoline.assert_called_once_with("perf")
+
+
+@patch("splunk_otel.perf.sys")
+def test_activate_perf_map_unsupported_build(mock_sys):
+    mock_sys.platform = "linux"
+    mock_sys.activate_stack_trampoline.side_effect = ValueError
+
+    assert not activate_perf_map()
+
+
+@patch("splunk_otel.perf.sys")
+def test_activate_perf_map_requires_linux(mock_sys):
+    mock_sys.platform = "darwin"
+
+    assert not activate_perf_map()
+
+    mock_sys.activate_stack_trampoline.assert_not_called()
+
+
+@patch("splunk_otel.perf.activate_perf_map")
+def test_start_perf_map_if_enabled(mock_activate):
+    _start_perf_map_if_enabled(Env({}))
+    mock_activate.assert_not_called()
+
+    _start_perf_map_if_enabled(Env({"SPLUNK_PROFILER_PERF_MAP_ENABLED": "true"}))
+    mock_activate.assert_called_once()
+
+
+@patch("splunk_otel.distro.SplunkDistro")
+@patch("splunk_otel.perf._mk_exporting_logger_provider")
+def test_main_emits_profile_log_records(mock_logger_provider, mock_distro, monkeypatch):
+    monkeypatch.delenv("OTEL_SERVICE_NAME", raising=False)
+    logger = mock_logger_provider.return_value.get_logger.return_value
+    fixture = f"{dirname(abspath(__file__))}/fixtures/perf_script.txt"
+
+    assert main([fixture, "--service-name", "perf-service", "--pid", "4242", "--batch-seconds", "60"]) == 0
+
+    mock_distro.return_value.configure.assert_called_once()
+    [log_record] = [call.args[0] for call in logger.emit.call_args_list]
+    assert log_record.resource.attributes["service.name"] == "perf-service"
+    assert log_record.log_record.attributes["profiling.data.total.frame.count"] == 7
+    mock_logger_provider.return_value.shutdown.assert_called_once()
@@ -0,0 +1,111 @@
+# Copyright Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import gzip
+import os
+import time
+from unittest.mock import MagicMock, patch
+
+from splunk_otel import profile_pb2
+from splunk_otel.env import Env
+from splunk_otel.pprof_file import _PprofFileWriter, start_pprof_file_writer
+
+
+def _writer(tmp_path, max_bytes=1024 * 1024, max_age_seconds=3600.0, thread_states=None):
+    now = [time.time()]
+    writer = _PprofFileWriter(
+        str(tmp_path), 10, max_bytes, max_age_seconds, thread_states=thread_states or {}, time_func=lambda: now[0]
+    )
+    return writer, now
+
+
+def _read_profile(path) -> profile_pb2.Profile:
+    pb_profile = profile_pb2.Profile()
+    pb_profile.ParseFromString(gzip.decompress(path.read_bytes()))
+    return pb_profile
+
+
+def test_writes_batched_samples_as_standard_pprof(tmp_path):
+    writer, now = _writer(tmp_path, thread_states={1: (0xAB, 0xCD)})
+    writer.record([{"tid": 1, "frames": [("app.py", "main", 1), ("app.py", "handle", 2)]}])
+    now[0] += 1
+    writer.record([{"tid": 2, "frames": [("app.py", "main", 1)]}])
+
+    writer.flush()
+
+    [path] = tmp_path.glob("profile-*.pb.gz")
+    pb_profile = _read_profile(path)
+    strings = pb_profile.string_table
+    assert strings[0] == ""
+    assert [(strings[t.type], strings[t.unit]) for t in pb_profile.sample_type] == [
+        ("samples", "count"),
+        ("wall", "nanoseconds"),
+    ]
+    assert pb_profile.period == 10_000_000
+    assert pb_profile.duration_nanos == 1_000_000_000
+    assert [list(sample.value) for sample in pb_profile.sample] == [[1, 10_000_000]] * 2
+
+    location_ids = {location.id for location in pb_profile.location}
+    function_ids = {function.id for function in pb_profile.function}
+    for sample in pb_profile.sample:
+        assert set(sample.location_id) <= location_ids
+    for location in pb_profile.location:
+        assert {line.function_id for line in location.line} <= function_ids
+
+    labels = {strings[label.key]: strings[label.str] for label in pb_profile.sample[0].label if label.str}
+    assert labels["trace_id"] == f"{0xAB:016x}"
+
+
+def test_flush_without_samples_writes_nothing(tmp_path):
+    writer, _ = _writer(tmp_path)
+
+    writer.flush()
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_rotates_by_age_and_size(tmp_path):
+    writer, now = _writer(tmp_path, max_bytes=1, max_age_seconds=60.0)
+    old = tmp_path / "profile-0000000000001-1-1.pb.gz"
+    old.write_bytes(b"x" * 10)
+    os.utime(old, (now[0] - 120, now[0] - 120))
+    unrelated = tmp_path / "notes.txt"
+    unrelated.write_text("keep")
+
+    writer.record([{"tid": 1, "frames": [("app.py", "main", 1)]}])
+    writer.flush()
+
+    # the new file alone is over max_bytes, so it is removed as well
+    assert list(tmp_path.iterdir()) == [unrelated]
+
+
+def test_keeps_files_within_limits(tmp_path):
+    writer, now = _writer(tmp_path)
+    for _ in range(3):
+        writer.record([{"tid": 1, "frames": [("app.py", "main", 1)]}])
+        now[0] += 1
+        writer.flush()
+
+    assert len(list(tmp_path.glob("profile-*.pb.gz"))) == 3
+
+
+@patch("splunk_otel.pprof_file.atexit")
+@patch("splunk_otel.pprof_file._IntervalTimer", MagicMock())
+def test_start_pprof_file_writer(mock_atexit, tmp_path):
+    directory = tmp_path / "profiles"
+
+    writer = start_pprof_file_writer(Env({"SPLUNK_PROFILER_PPROF_FILE_DIRECTORY": str(directory)}), 100)
+
+    assert directory.is_dir()
+    mock_atexit.register.assert_called_once_with(writer.shutdown)
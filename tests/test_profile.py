@@ -2,15 +2,19 @@ import base64
 import gzip
 import json
 import random
+import sys
+import threading
 import time
 from collections import OrderedDict
 from os.path import abspath, dirname
+from unittest.mock import MagicMock, patch
 
 import pytest
 from google.protobuf.json_format import MessageToDict
 from opentelemetry._logs import Logger
 from opentelemetry.context import attach, detach
 from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
 from opentelemetry.trace import (
     NonRecordingSpan,
     SpanContext,
@@ -19,13 +23,24 @@ from opentelemetry.trace import (
     set_span_in_context,
 )
 from splunk_otel import profile_pb2
+from splunk_otel.env import Env
 from splunk_otel.profile import (
+    ProfilingContext,
     _get_line,
+    _collect_stacktraces,
     _IntervalTimer,
     _pb_profile_to_str,
     _ProfileScraper,
+    _reconfigure_profiling,
     _stacktraces_to_cpu_profile,
     _StringTable,
+    _thread_labels,
+    _thread_root_spans,
+    _thread_states,
+    _timer_thread_ids,
+    profile_labels,
+    start_profiling,
+    start_thread_context_tracking,
 )
 
 
@@ -69,6 +84,23 @@ def test_stacktraces_to_cpu_profile(stacktraces_fixture, pb_profile_fixture, thr
     assert pb_profile_fixture == MessageToDict(profile)
 
 
+def test_stacktraces_to_cpu_profile_prefers_captured_trace_context():
+    stacktraces = [
+        {"tid": 1, "frames": [("f.py", "f", 1)], "trace_context": (0xAB, 0xCD), "time_seconds": 1726760001.5},
+        {"tid": 2, "frames": [("f.py", "f", 1)], "trace_context": None},
+    ]
+    thread_states = {1: (0x11, 0x22), 2: (0x33, 0x44)}
+
+    profile = _stacktraces_to_cpu_profile(stacktraces, thread_states, 10, 1726760000)
+
+    strings = list(profile.string_table)
+    first, second = ({strings[label.key]: label for label in sample.label} for sample in profile.sample)
+    assert strings[first["trace_id"].str] == f"{0xAB:016x}"
+    assert first["source.event.time"].num == 1726760001500
+    assert "trace_id" not in second
+    assert second["source.event.time"].num == 1726760000000
+
+
 def test_get_line():
     line = _get_line(OrderedDict(), _StringTable(), "test", "test", 42)
     assert line.line == 42
@@ -97,6 +129,19 @@ def test_profile_scraper(stacktraces_fixture):
     assert log_record.timestamp == int(time_seconds * 1e9)
     assert len(MessageToDict(_pb_profile_from_str(log_record.body))) == 4  # sanity check
     assert log_record.attributes["profiling.data.total.frame.count"] == 30
+    assert log_record.attributes["profiling.data.type"] == "cpu"
+
+
+def test_profile_scraper_splits_oversized_records():
+    logger = _FakeLogger()
+    ps = _ProfileScraper(Resource({}), {}, 100, logger, time_func=lambda: 1726760000)
+    stacktraces = [{"tid": 1, "frames": [("f.py", "f", 1)] * (i + 1), "time_seconds": i} for i in range(5)]
+
+    with patch("splunk_otel.profile._MAX_RECORD_BYTES", 1):
+        ps.emit(stacktraces)
+
+    frame_counts = [record.log_record.attributes["profiling.data.total.frame.count"] for record in logger.log_records]
+    assert frame_counts == [1, 2, 3, 4, 5]
 
 
 # The "override the current context" stuff for the log record is weird,
@@ -158,6 +203,31 @@ def test_interval_timer_stop_before_start():
     timer.stop()
 
 
+def test_interval_timer_start_after_stop_does_nothing():
+    # a thread can only be started once, so start() after stop() must not raise RuntimeError
+    ticks = []
+    timer = _IntervalTimer(100, lambda: ticks.append(1))
+    timer.stop()
+    timer.start()
+    assert not timer.running
+    assert not timer.thread.is_alive()
+
+
+def test_collect_stacktraces_skips_timer_threads():
+    timer = _IntervalTimer(10, lambda: None)
+    timer.start()
+    try:
+        while timer.thread.ident not in _timer_thread_ids:
+            time.sleep(0.001)
+        thread_ids = {stacktrace["tid"] for stacktrace in _collect_stacktraces()}
+    finally:
+        timer.stop()
+
+    assert timer.thread.ident not in thread_ids
+    assert threading.get_ident() not in thread_ids
+    assert timer.thread.ident not in _timer_thread_ids
+
+
 def test_interval_timer_pause_and_resume():
     # pause_after() should halt ticking; start() should resume it.
     ticks = []
@@ -187,3 +257,340 @@ class _FakeLogger(Logger):
 
     def emit(self, record) -> None:
         self.log_records.append(record)
+
+
+def _profiling_context_with_mock_scraper(on_flush=None):
+    ctx = ProfilingContext("test-service", 1000, on_flush=on_flush)
+    ctx._scraper = MagicMock()  # noqa SLF001
+    return ctx
+
+
+@patch("splunk_otel.profile.get_logger_provider")
+def test_profiling_context_force_flush_samples_and_flushes_logs(mock_get_logger_provider):
+    calls = []
+    ctx = _profiling_context_with_mock_scraper(on_flush=lambda: calls.append("on_flush"))
+    ctx._scraper.tick.side_effect = lambda: calls.append("tick")  # noqa SLF001
+    mock_get_logger_provider.return_value.force_flush.side_effect = lambda _timeout: calls.append("flush") or True
+    ctx.start()
+
+    try:
+        assert ctx.force_flush(5000)
+    finally:
+        ctx.stop()
+
+    assert calls[-3:] == ["tick", "on_flush", "flush"]
+    [timeout_millis] = mock_get_logger_provider.return_value.force_flush.call_args.args
+    assert 0 < timeout_millis <= 5000
+
+
+@patch("splunk_otel.profile.get_logger_provider", MagicMock())
+def test_profiling_context_force_flush_waits_for_timer_tick():
+    ctx = _profiling_context_with_mock_scraper()
+    ctx.set_interval(10)
+    tickers = []
+    ticking = []
+    overlapping = []
+    timer_ticking = threading.Event()
+    release_timer = threading.Event()
+
+    def tick():
+        tickers.append(threading.get_ident())
+        ticking.append(threading.get_ident())
+        if len(ticking) > 1:
+            overlapping.append(ticking[:])
+        if not timer_ticking.is_set():
+            timer_ticking.set()
+            release_timer.wait(1)
+        ticking.pop()
+
+    ctx._scraper.tick.side_effect = tick  # noqa SLF001
+    ctx.start()
+    try:
+        assert timer_ticking.wait(1)
+        flusher = threading.Thread(target=ctx.force_flush)
+        flusher.start()
+        time.sleep(0.05)
+        release_timer.set()
+        flusher.join()
+    finally:
+        ctx.stop()
+
+    assert overlapping == []
+    assert flusher.ident in tickers
+
+
+@patch("splunk_otel.profile.get_logger_provider")
+def test_profiling_context_force_flush_does_not_sample_when_not_running(mock_get_logger_provider):
+    ctx = _profiling_context_with_mock_scraper()
+
+    assert ctx.force_flush()
+
+    ctx._scraper.tick.assert_not_called()  # noqa SLF001
+    mock_get_logger_provider.return_value.force_flush.assert_called_once()
+
+
+@patch("splunk_otel.profile.get_logger_provider")
+def test_profiling_context_shutdown_takes_final_sample_once(mock_get_logger_provider):
+    ctx = _profiling_context_with_mock_scraper()
+    ctx.start()
+    ctx.shutdown()
+    tick_count = ctx._scraper.tick.call_count  # noqa SLF001
+
+    ctx.shutdown()
+
+    assert tick_count >= 1
+    assert ctx._scraper.tick.call_count == tick_count  # noqa SLF001
+    assert not ctx._timer.running  # noqa SLF001
+    mock_get_logger_provider.return_value.force_flush.assert_called_once()
+
+
+@patch("splunk_otel.profile.get_logger_provider", MagicMock())
+def test_profiling_context_shutdown_does_not_sample_while_paused():
+    ctx = _profiling_context_with_mock_scraper()
+    ctx.set_interval(10)
+    ctx.start()
+    ctx.pause_after(0)
+    time.sleep(0.05)
+    tick_count = ctx._scraper.tick.call_count  # noqa SLF001
+
+    ctx.shutdown()
+
+    assert ctx._scraper.tick.call_count == tick_count  # noqa SLF001
+
+
+@patch("splunk_otel.profile.get_logger_provider")
+def test_profiling_context_force_flush_without_sdk_logger_provider(mock_get_logger_provider):
+    mock_get_logger_provider.return_value = object()
+
+    assert _profiling_context_with_mock_scraper().force_flush()
+
+
+@patch("splunk_otel.profile.atexit")
+@patch("splunk_otel.profile.ProfilingContext")
+def test_start_profiling_shuts_down_at_exit(mock_profiling_context, mock_atexit):
+    ctx = start_profiling(Env({"OTEL_SERVICE_NAME": "svc", "SPLUNK_PROFILER_CALL_STACK_INTERVAL": "100"}))
+
+    mock_profiling_context.assert_called_once_with("svc", 100, export_otlp=True, consumers=[])
+    ctx.start.assert_called_once()
+    mock_atexit.register.assert_called_once_with(ctx.shutdown)
+
+
+@patch("splunk_otel.profile.atexit", MagicMock())
+@patch("splunk_otel.hot_functions.start_hot_functions")
+@patch("splunk_otel.profile.ProfilingContext")
+def test_start_profiling_with_hot_functions_exporter(mock_profiling_context, mock_start_hot_functions):
+    start_profiling(Env({"OTEL_SERVICE_NAME": "svc", "SPLUNK_PROFILER_EXPORTER": "hot_functions, bogus"}))
+
+    _, kwargs = mock_profiling_context.call_args
+    assert kwargs == {"export_otlp": False, "consumers": [mock_start_hot_functions.return_value.record]}
+
+
+@patch("splunk_otel.profile._continuous_profiling_context", None)
+@patch("splunk_otel.profile.start_profiling")
+def test_reconfigure_profiling_starts_profiler_when_enabled_later(mock_start_profiling):
+    env = Env({"SPLUNK_PROFILER_ENABLED": "true"})
+
+    _reconfigure_profiling(env)
+
+    mock_start_profiling.assert_called_once_with(env)
+
+
+def test_reconfigure_profiling_updates_running_profiler():
+    ctx = MagicMock()
+    with patch("splunk_otel.profile._continuous_profiling_context", ctx):
+        _reconfigure_profiling(Env({"SPLUNK_PROFILER_ENABLED": "true", "SPLUNK_PROFILER_CALL_STACK_INTERVAL": "50"}))
+
+        ctx.set_interval.assert_called_once_with(50)
+        ctx.start.assert_called_once()
+
+        _reconfigure_profiling(Env({"SPLUNK_PROFILER_ENABLED": "false"}))
+
+        ctx.pause_after.assert_called_once_with(0)
+
+
+def test_profile_scraper_passes_samples_to_consumers():
+    consumed = []
+    logger = MagicMock()
+    stacktraces = [{"tid": 1, "frames": [("f.py", "f", 1)]}]
+    scraper = _ProfileScraper(
+        Resource({}), {}, 1000, logger, lambda: stacktraces, export_otlp=False, consumers=[consumed.append]
+    )
+
+    scraper.tick()
+
+    assert consumed == [stacktraces]
+    logger.emit.assert_not_called()
+
+
+def test_thread_state_tracking_under_concurrency():
+    # exercises the paths that rely on the GIL for atomicity on regular builds, so free-threaded builds
+    # (3.13t/3.14t) don't corrupt thread states or drop samples: the real scraper ticks, pruning included, while
+    # threads attach and detach spans inside labelled blocks
+    errors = []
+    worker_thread_ids = set()
+    start_barrier = threading.Barrier(9)
+    done = threading.Event()
+    timer = _IntervalTimer(1, lambda: None)
+    logger = _FakeLogger()
+    scraper = _ProfileScraper(Resource({}), _thread_states, 1, logger)
+
+    def attach_detach(worker):
+        try:
+            worker_thread_ids.add(threading.get_ident())
+            start_barrier.wait()
+            start_thread_context_tracking()
+            timer.start()
+            i = 0
+            while not done.is_set():
+                i += 1
+                with profile_labels(worker=worker):
+                    span = NonRecordingSpan(SpanContext(worker + 1, i, False, TraceFlags(TraceFlags.SAMPLED)))
+                    token = attach(set_span_in_context(span))
+                    detach(token)
+        except Exception as e:  # noqa: BLE001
+            errors.append(e)
+
+    def sample():
+        try:
+            start_barrier.wait()
+            for _ in range(50):
+                scraper.tick()
+        except Exception as e:  # noqa: BLE001
+            errors.append(e)
+        finally:
+            done.set()
+
+    sampler = threading.Thread(target=sample)
+    workers = [threading.Thread(target=attach_detach, args=(worker,)) for worker in range(8)]
+    sampler.start()
+    for worker in workers:
+        worker.start()
+    sampler.join()
+    for worker in workers:
+        worker.join()
+    timer.stop()
+    scraper.tick()
+
+    assert errors == []
+    labelled_samples = 0
+    for record in logger.log_records:
+        pb_profile = _pb_profile_from_str(record.log_record.body)
+        strings = pb_profile.string_table
+        for sample in pb_profile.sample:
+            labels = {strings[label.key]: strings[label.str] for label in sample.label if label.str}
+            if "worker" in labels:
+                labelled_samples += 1
+                if "trace_id" in labels:
+                    # the trace context and labels of a sample belong to the same thread
+                    assert int(labels["trace_id"], 16) == int(labels["worker"]) + 1
+    assert labelled_samples > 0
+    assert worker_thread_ids.isdisjoint(_thread_states)
+    assert worker_thread_ids.isdisjoint(_thread_labels)
+
+
+def test_profile_scraper_prunes_states_of_exited_threads():
+    thread_states = {}
+    worker = threading.Thread(target=lambda: thread_states.__setitem__(threading.get_ident(), (1, 2)))
+    worker.start()
+    worker.join()
+    thread_states[threading.get_ident()] = (3, 4)
+    scraper = _ProfileScraper(Resource({}), thread_states, 1000, MagicMock())
+
+    scraper.tick()
+
+    assert thread_states == {threading.get_ident(): (3, 4)}
+
+
+def test_profile_scraper_takes_one_thread_snapshot_per_tick():
+    scraper = _ProfileScraper(Resource({}), {}, 1000, MagicMock())
+
+    with patch("splunk_otel.profile.sys._current_frames", wraps=sys._current_frames) as mock_current_frames:  # noqa SLF001
+        scraper.tick()
+
+    mock_current_frames.assert_called_once()
+
+
+def test_profile_labels_nest_and_are_restored():
+    thread_id = threading.get_ident()
+
+    with profile_labels(tenant="acme", job="export"):
+        with profile_labels(job="import", shard=3):
+            assert _thread_labels[thread_id] == {"tenant": "acme", "job": "import", "shard": "3"}
+        assert _thread_labels[thread_id] == {"tenant": "acme", "job": "export"}
+
+    assert thread_id not in _thread_labels
+
+
+def test_profile_labels_are_collected_from_other_threads():
+    entered = threading.Event()
+    release = threading.Event()
+
+    def work():
+        with profile_labels(tenant="acme"):
+            entered.set()
+            release.wait()
+
+    worker = threading.Thread(target=work)
+    worker.start()
+    entered.wait()
+    try:
+        [stacktrace] = [st for st in _collect_stacktraces() if st["tid"] == worker.ident]
+    finally:
+        release.set()
+        worker.join()
+
+    assert stacktrace["labels"] == {"tenant": "acme"}
+
+
+def test_profile_labels_ignore_reserved_keys():
+    with profile_labels(trace_id="x", tenant="acme"):
+        assert _thread_labels[threading.get_ident()] == {"tenant": "acme"}
+
+
+def test_stacktraces_to_cpu_profile_adds_user_labels():
+    stacktraces = [{"tid": 1, "frames": [("f.py", "f", 1)], "labels": {"tenant": "acme"}}]
+
+    pb_profile = _stacktraces_to_cpu_profile(stacktraces, {}, 1000, 1.0)
+
+    strings = pb_profile.string_table
+    labels = {strings[label.key]: strings[label.str] for label in pb_profile.sample[0].label if label.str}
+    assert labels == {"tenant": "acme"}
+
+
+@patch("splunk_otel.profile._span_attribute_label_keys", ("http.route", "messaging.destination.name"))
+def test_samples_are_labelled_with_local_root_span_attributes():
+    start_thread_context_tracking()
+    tracer = TracerProvider().get_tracer(__name__)
+    entered = threading.Event()
+    release = threading.Event()
+    stacktraces = []
+
+    def work(parent_context):
+        with tracer.start_as_current_span("child", context=parent_context), profile_labels(tenant="acme"):
+            entered.set()
+            release.wait()
+
+    with tracer.start_as_current_span("GET") as root_span:
+        # set after the span started, like framework instrumentations do once the request is routed
+        root_span.set_attribute("http.route", "/users/{id}")
+        worker = threading.Thread(target=work, args=(set_span_in_context(root_span),))
+        worker.start()
+        entered.wait()
+        try:
+            stacktraces = [st for st in _collect_stacktraces() if st["tid"] == worker.ident]
+        finally:
+            release.set()
+            worker.join()
+
+    [stacktrace] = stacktraces
+    assert stacktrace["labels"] == {"http.route": "/users/{id}", "tenant": "acme"}
+    assert worker.ident not in _thread_root_spans
+
+
+def test_profiling_context_set_interval():
+    ctx = ProfilingContext("test-service", 1000)
+
+    ctx.set_interval(5)
+
+    assert ctx._timer.interval_seconds == 0.005  # noqa SLF001
+    assert ctx._scraper.interval_millis == 5  # noqa SLF001
@@ -14,7 +14,12 @@
 
 from opentelemetry import baggage, trace
 from opentelemetry.context import Context
-from splunk_otel.propagator import CallgraphsPropagator, ServerTimingResponsePropagator
+from splunk_otel.propagator import (
+    CallgraphsPropagator,
+    ServerTimingResponsePropagator,
+    _get_snapshot_volume,
+    _TokenBucket,
+)
 
 
 def test_inject():
@@ -125,3 +130,139 @@ class TestCallgraphsPropagator:
             results.append(volume)
 
         assert all(r == results[0] for r in results)
+
+    def test_rate_limit_caps_new_selections(self):
+        prop = CallgraphsPropagator(selection_probability=1.0, max_selections_per_second=2)
+
+        volumes = [
+            baggage.get_baggage("splunk.trace.snapshot.volume", prop.extract({}, Context(), None)) for _ in range(5)
+        ]
+
+        assert volumes == ["highest", "highest", "off", "off", "off"]
+
+    def test_rate_limit_does_not_override_upstream_decision(self):
+        prop = CallgraphsPropagator(selection_probability=1.0, max_selections_per_second=1)
+        prop.extract({}, Context(), None)  # use up the only token
+        ctx = baggage.set_baggage("splunk.trace.snapshot.volume", "highest", Context())
+
+        result_ctx = prop.extract({}, ctx, None)
+
+        assert baggage.get_baggage("splunk.trace.snapshot.volume", result_ctx) == "highest"
+
+
+class TestTokenBucket:
+    def test_refills_over_time(self):
+        now = [0.0]
+        bucket = _TokenBucket(2, time_func=lambda: now[0])
+
+        assert bucket.try_acquire()
+        assert bucket.try_acquire()
+        assert not bucket.try_acquire()
+
+        now[0] = 0.5
+        assert bucket.try_acquire()
+        assert not bucket.try_acquire()
+
+    def test_does_not_exceed_capacity(self):
+        now = [0.0]
+        bucket = _TokenBucket(1, capacity=2, time_func=lambda: now[0])
+
+        now[0] = 100.0
+        assert [bucket.try_acquire() for _ in range(3)] == [True, True, False]
+
+
+def _remote_parent_context(trace_id=1):
+    span = trace.NonRecordingSpan(trace.SpanContext(trace_id=trace_id, span_id=2, is_remote=True))
+    return trace.set_span_in_context(span, Context())
+
+
+class TestCallgraphsPropagatorHeaderCarrier:
+    def test_selected_decision_is_injected_as_header_without_baggage(self):
+        prop = CallgraphsPropagator(selection_probability=1.0, carrier="header")
+
+        ctx = prop.extract({}, _remote_parent_context(), None)
+        carrier = {}
+        prop.inject(carrier, ctx)
+
+        assert carrier == {"splunk-snapshot": "1"}
+        assert baggage.get_all(ctx) == {}
+        assert _get_snapshot_volume(ctx) == "highest"
+
+    def test_off_decision_is_not_propagated(self):
+        prop = CallgraphsPropagator(selection_probability=0.0, carrier="header")
+
+        ctx = prop.extract({}, _remote_parent_context(), None)
+        carrier = {}
+        prop.inject(carrier, ctx)
+
+        assert carrier == {}
+        assert baggage.get_all(ctx) == {}
+        assert _get_snapshot_volume(ctx) == "off"
+
+    def test_extract_honors_incoming_header(self):
+        prop = CallgraphsPropagator(selection_probability=0.0, carrier="header")
+
+        ctx = prop.extract({"splunk-snapshot": "1"}, _remote_parent_context())
+
+        assert _get_snapshot_volume(ctx) == "highest"
+
+    def test_extract_honors_incoming_baggage_from_baggage_services(self):
+        prop = CallgraphsPropagator(selection_probability=0.0, carrier="header")
+        ctx = baggage.set_baggage("splunk.trace.snapshot.volume", "highest", _remote_parent_context())
+
+        ctx = prop.extract({}, ctx)
+        carrier = {}
+        prop.inject(carrier, ctx)
+
+        assert carrier == {"splunk-snapshot": "1"}
+
+    def test_both_carrier_adds_baggage_only_when_selected(self):
+        prop = CallgraphsPropagator(selection_probability=1.0, carrier="both")
+        selected = prop.extract({}, _remote_parent_context(), None)
+
+        prop = CallgraphsPropagator(selection_probability=0.0, carrier="both")
+        not_selected = prop.extract({}, _remote_parent_context(), None)
+
+        assert baggage.get_baggage("splunk.trace.snapshot.volume", selected) == "highest"
+        assert baggage.get_all(not_selected) == {}
+
+    def test_rate_limited_decision_is_injected_as_explicit_off(self):
+        prop = CallgraphsPropagator(selection_probability=1.0, max_selections_per_second=1, carrier="header")
+        prop.extract({}, _remote_parent_context(), None)  # use up the only token
+
+        ctx = prop.extract({}, _remote_parent_context(), None)
+        carrier = {}
+        prop.inject(carrier, ctx)
+
+        assert carrier == {"splunk-snapshot": "0"}
+        assert _get_snapshot_volume(ctx) == "off"
+
+    def test_extract_honors_incoming_explicit_off(self):
+        prop = CallgraphsPropagator(selection_probability=1.0, carrier="header")
+
+        ctx = prop.extract({"splunk-snapshot": "0"}, _remote_parent_context())
+        carrier = {}
+        prop.inject(carrier, ctx)
+
+        assert _get_snapshot_volume(ctx) == "off"
+        assert carrier == {"splunk-snapshot": "0"}
+
+    def test_both_carrier_propagates_rate_limited_decision_as_baggage(self):
+        prop = CallgraphsPropagator(selection_probability=1.0, max_selections_per_second=1, carrier="both")
+        prop.extract({}, _remote_parent_context(), None)  # use up the only token
+
+        ctx = prop.extract({}, _remote_parent_context(), None)
+
+        assert baggage.get_baggage("splunk.trace.snapshot.volume", ctx) == "off"
+
+    def test_fields(self):
+        assert CallgraphsPropagator(carrier="baggage").fields() == set()
+        assert CallgraphsPropagator(carrier="header").fields() == {"splunk-snapshot"}
+
+    def test_baggage_carrier_injects_nothing(self):
+        prop = CallgraphsPropagator(selection_probability=1.0)
+
+        carrier = {}
+        prop.inject(carrier, prop.extract({}, _remote_parent_context(), None))
+
+        assert carrier == {}
@@ -0,0 +1,207 @@
+# Copyright Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from unittest.mock import patch
+
+from opentelemetry import trace
+from opentelemetry.sdk.trace.sampling import Decision
+from opentelemetry.trace import NonRecordingSpan, SpanContext, TraceFlags, TraceState
+from opentelemetry.util._importlib_metadata import entry_points
+
+from splunk_otel.env import Env
+from splunk_otel.sampling import (
+    AdjustableSampler,
+    ThroughputSampler,
+    _adjustable_sampler_factory,
+    _RateLimitedRatioSampler,
+    _reconfigure_sampler,
+    _throughput_sampler_factory,
+    _with_threshold,
+)
+
+_MAX_TRACE_ID = (1 << 64) - 1
+
+
+def _sampled(sampler, trace_id=1, parent_context=None) -> bool:
+    return sampler.should_sample(parent_context, trace_id, "span").decision is Decision.RECORD_AND_SAMPLE
+
+
+def test_sampler_entry_point_is_registered():
+    [entry_point] = entry_points(group="opentelemetry_traces_sampler", name="splunk_adjustable")
+
+    assert entry_point.value == "splunk_otel.sampling:_adjustable_sampler_factory"
+
+
+def test_update_swaps_ratio():
+    sampler = AdjustableSampler()
+    assert _sampled(sampler, _MAX_TRACE_ID)
+
+    sampler.update(ratio=0)
+
+    assert not _sampled(sampler, 1)
+    assert sampler.ratio == 0
+    assert sampler.max_per_second == 0
+
+    sampler.update(ratio=1)
+
+    assert _sampled(sampler, _MAX_TRACE_ID)
+
+
+def test_follows_parent_decision():
+    sampler = AdjustableSampler(ratio=0)
+    parent = NonRecordingSpan(SpanContext(1, 2, is_remote=True, trace_flags=TraceFlags(TraceFlags.SAMPLED)))
+
+    assert _sampled(sampler, 1, trace.set_span_in_context(parent))
+
+
+def test_rate_limit_drops_traces_over_limit_per_second():
+    now = [100.0]
+    sampler = _RateLimitedRatioSampler(1.0, 2, time_func=lambda: now[0])
+
+    assert [_sampled(sampler) for _ in range(3)] == [True, True, False]
+
+    now[0] = 101.0
+
+    assert _sampled(sampler)
+
+
+def test_factory_reads_env_and_reconfigure_updates_sampler():
+    with (
+        patch.dict("os.environ", {"OTEL_TRACES_SAMPLER_ARG": "0.5", "SPLUNK_TRACES_SAMPLER_RATE_LIMIT": "10"}),
+        patch("splunk_otel.sampling._sampler", None),
+    ):
+        sampler = _adjustable_sampler_factory("0.5")
+
+        assert (sampler.ratio, sampler.max_per_second) == (0.5, 10)
+
+        _reconfigure_sampler(Env({"OTEL_TRACES_SAMPLER_ARG": "0.1"}))
+
+        assert (sampler.ratio, sampler.max_per_second) == (0.1, 0)
+
+
+def test_invalid_ratio_falls_back_to_default(caplog):
+    with (
+        patch.dict("os.environ", {"OTEL_TRACES_SAMPLER_ARG": "2"}),
+        patch("splunk_otel.sampling._sampler", None),
+    ):
+        sampler = _adjustable_sampler_factory("2")
+
+    assert sampler.ratio == 1.0
+    assert "Invalid value of '2.0' for env var 'OTEL_TRACES_SAMPLER_ARG'" in caplog.text
+
+
+def test_reconfigure_does_nothing_without_distro_sampler():
+    with patch("splunk_otel.sampling._sampler", None):
+        _reconfigure_sampler(Env({"OTEL_TRACES_SAMPLER_ARG": "0.1"}))
+
+
+def _arrive(sampler, count, trace_id=0):
+    return sum(_sampled(sampler, trace_id + i) for i in range(count))
+
+
+def test_throughput_sampler_samples_everything_under_target():
+    now = [100.0]
+    sampler = ThroughputSampler(10, time_func=lambda: now[0])
+
+    for _ in range(3):
+        assert _arrive(sampler, 5) == 5
+        now[0] += 1
+
+    assert sampler.ratio == 1.0
+
+
+def test_throughput_sampler_lowers_ratio_to_target():
+    now = [100.0]
+    sampler = ThroughputSampler(10, time_func=lambda: now[0])
+    _arrive(sampler, 1000)
+    now[0] += 1
+
+    result = sampler.should_sample(None, (1 << 64) - 1, "span")
+
+    assert sampler.ratio == 0.01
+    # the threshold is 1 - 0.01 of 2**56, rounded to 4 hex digits
+    assert result.trace_state.get("ot") == "th:fd71"
+
+
+def test_throughput_sampler_decision_is_consistent_with_threshold():
+    now = [100.0]
+    sampler = ThroughputSampler(1, time_func=lambda: now[0])
+    _arrive(sampler, 4)
+    now[0] += 1
+    _arrive(sampler, 1)
+
+    assert sampler.ratio == 0.25
+    assert not _sampled(sampler, 0xBFFFFFFFFFFFFF)
+    assert _sampled(sampler, 0xC0000000000000)
+    # only the lowest 56 bits of the trace id are random
+    assert _sampled(sampler, (0xAB << 56) | 0xC0000000000000)
+
+
+def test_throughput_sampler_forgets_arrivals_outside_window():
+    now = [100.0]
+    sampler = ThroughputSampler(10, time_func=lambda: now[0])
+    _arrive(sampler, 1000)
+    now[0] = 200.0
+    _arrive(sampler, 1)
+    now[0] += 1
+    _arrive(sampler, 1)
+
+    assert sampler.ratio == 1.0
+
+
+def test_throughput_sampler_averages_over_full_window_at_steady_rate():
+    now = [100.0]
+    sampler = ThroughputSampler(50, time_func=lambda: now[0])
+    for _ in range(30):
+        _arrive(sampler, 100)
+        now[0] += 1
+    _arrive(sampler, 1)
+
+    # 10 complete seconds of 100 traces each, neither more nor fewer, are averaged
+    assert sampler.ratio == 0.5
+    assert len(sampler._root._arrivals) == 10  # noqa SLF001
+
+
+def test_throughput_sampler_update_recomputes_ratio():
+    now = [100.0]
+    sampler = ThroughputSampler(10, time_func=lambda: now[0])
+    _arrive(sampler, 100)
+    now[0] += 1
+    _arrive(sampler, 1)
+
+    sampler.update(50)
+
+    assert sampler.target_per_second == 50
+    assert sampler.ratio == 0.5
+
+
+def test_with_threshold_keeps_other_tracestate_entries():
+    trace_state = TraceState([("vendor", "x"), ("ot", "th:8;rv:01")])
+
+    assert _with_threshold(trace_state, 0).get("ot") == "th:0;rv:01"
+    assert _with_threshold(trace_state, 0).get("vendor") == "x"
+
+
+def test_throughput_factory_reads_env_and_reconfigure_updates_target():
+    with (
+        patch.dict("os.environ", {"SPLUNK_TRACES_SAMPLER_TARGET_RATE": "20"}),
+        patch("splunk_otel.sampling._sampler", None),
+    ):
+        sampler = _throughput_sampler_factory(None)
+
+        assert sampler.target_per_second == 20
+
+        _reconfigure_sampler(Env({"SPLUNK_TRACES_SAMPLER_TARGET_RATE": "5"}))
+
+        assert sampler.target_per_second == 5
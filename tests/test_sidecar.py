@@ -0,0 +1,246 @@
+# Copyright Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import uuid
+from multiprocessing import shared_memory
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from splunk_otel.env import Env
+from splunk_otel.sidecar import (
+    _HEADER,
+    _MAGIC,
+    _MAX_THREADS,
+    _PUBLISH_INTERVAL_MILLIS,
+    _VERSION,
+    _process_start_time,
+    _py_spy_stacktraces,
+    _SidecarProfiler,
+    _start_shared_context_if_enabled,
+    start_shared_context,
+    _ThreadStatePublisher,
+    _ThreadStateReader,
+)
+
+_TRACE_ID = 0x0AF7651916CD43DD8448EB211C80319C
+_SPAN_ID = 0xB7AD6B7169203331
+
+_requires_proc = pytest.mark.skipif(not os.path.exists("/proc/self/stat"), reason="needs /proc")
+
+
+@pytest.fixture
+def shared_memory_name():
+    return f"splunk_otel_test_{os.getpid()}_{uuid.uuid4().hex[:8]}"
+
+
+class TestSharedThreadStates:
+    @pytest.fixture(autouse=True)
+    def same_process_resource_tracker(self):
+        # the reader normally runs in another process; here it must not unregister the publisher's segment
+        with patch("splunk_otel.sidecar.resource_tracker"):
+            yield
+
+    def test_reader_sees_published_thread_states(self, shared_memory_name):
+        thread_states = {}
+        publisher = _ThreadStatePublisher(thread_states, shared_memory_name)
+        reader = _ThreadStateReader(shared_memory_name)
+        try:
+            assert reader.read() == {}
+
+            thread_states[140000000000001] = (_TRACE_ID, _SPAN_ID)
+            thread_states[2] = (1, 2)
+            publisher.publish()
+            assert reader.read() == {140000000000001: (_TRACE_ID, _SPAN_ID), 2: (1, 2)}
+
+            del thread_states[2]
+            publisher.publish()
+            assert reader.read() == {140000000000001: (_TRACE_ID, _SPAN_ID)}
+        finally:
+            reader.close()
+            publisher.close()
+
+    def test_caps_published_threads(self, shared_memory_name):
+        thread_states = dict.fromkeys(range(_MAX_THREADS + 10), (1, 2))
+        publisher = _ThreadStatePublisher(thread_states, shared_memory_name)
+        reader = _ThreadStateReader(shared_memory_name)
+        try:
+            publisher.publish()
+            assert len(reader.read()) == _MAX_THREADS
+        finally:
+            reader.close()
+            publisher.close()
+
+    def test_publisher_only_writes_changes(self, shared_memory_name):
+        thread_states = {1: (_TRACE_ID, _SPAN_ID)}
+        publisher = _ThreadStatePublisher(thread_states, shared_memory_name)
+        try:
+            publisher.publish()
+            sequence = publisher._sequence  # noqa: SLF001
+            publisher.publish()
+            assert publisher._sequence == sequence  # noqa: SLF001
+
+            thread_states[1] = (_TRACE_ID, _SPAN_ID + 1)
+            publisher.publish()
+            assert publisher._sequence > sequence  # noqa: SLF001
+        finally:
+            publisher.close()
+
+    def test_reader_gives_up_while_write_in_progress(self, shared_memory_name):
+        publisher = _ThreadStatePublisher({}, shared_memory_name)
+        reader = _ThreadStateReader(shared_memory_name)
+        try:
+            publisher._sequence += 1  # noqa: SLF001
+            publisher._write({1: (1, 2)})  # noqa: SLF001 leaves an odd sequence number
+            assert reader.read() is None
+        finally:
+            reader.close()
+            publisher.close()
+
+    @staticmethod
+    def _stale_segment(name, owner_start_time):
+        stale = shared_memory.SharedMemory(name=name, create=True, size=_HEADER.size)
+        _HEADER.pack_into(stale.buf, 0, _MAGIC, _VERSION, 0, 0, os.getpid(), owner_start_time)
+        stale.close()
+
+    @_requires_proc
+    def test_publisher_replaces_stale_segment(self, shared_memory_name, caplog):
+        # same pid, different start time: an earlier process whose pid was reused
+        self._stale_segment(shared_memory_name, _process_start_time(os.getpid()) + 1)
+        publisher = _ThreadStatePublisher({1: (_TRACE_ID, _SPAN_ID)}, shared_memory_name)
+        reader = _ThreadStateReader(shared_memory_name)
+        try:
+            publisher.publish()
+            assert reader.read() == {1: (_TRACE_ID, _SPAN_ID)}
+            assert "stale shared memory segment" in caplog.text
+        finally:
+            reader.close()
+            publisher.close()
+
+    @pytest.mark.parametrize("owner_start_time", [None, 0])
+    def test_publisher_keeps_segment_of_live_or_unknown_owner(self, shared_memory_name, owner_start_time):
+        if owner_start_time is None:
+            owner_start_time = _process_start_time(os.getpid())
+        self._stale_segment(shared_memory_name, owner_start_time)
+        try:
+            with pytest.raises(FileExistsError):
+                _ThreadStatePublisher({}, shared_memory_name)
+        finally:
+            segment = shared_memory.SharedMemory(name=shared_memory_name)
+            segment.close()
+            segment.unlink()
+
+    def test_publisher_keeps_foreign_segment(self, shared_memory_name):
+        foreign = shared_memory.SharedMemory(name=shared_memory_name, create=True, size=16)
+        try:
+            with pytest.raises(FileExistsError):
+                _ThreadStatePublisher({}, shared_memory_name)
+        finally:
+            foreign.close()
+            foreign.unlink()
+
+
+@patch("splunk_otel.sidecar._IntervalTimer")
+@patch("splunk_otel.sidecar.start_thread_context_tracking", MagicMock())
+@patch("splunk_otel.sidecar._ThreadStatePublisher", MagicMock(side_effect=PermissionError))
+def test_start_shared_context_failure_only_disables_publisher(mock_timer, caplog):
+    assert start_shared_context() is None
+    mock_timer.assert_not_called()
+    assert "sidecar profiler is disabled" in caplog.text
+
+
+@patch("splunk_otel.sidecar._IntervalTimer")
+@patch("splunk_otel.sidecar.start_thread_context_tracking", MagicMock())
+@patch("splunk_otel.sidecar._ThreadStatePublisher", MagicMock(side_effect=FileExistsError))
+def test_start_shared_context_warns_when_segment_in_use(mock_timer, caplog):
+    assert start_shared_context() is None
+    mock_timer.assert_not_called()
+    assert "may still be in use" in caplog.text
+
+
+@patch("splunk_otel.sidecar.atexit", MagicMock())
+@patch("splunk_otel.sidecar._IntervalTimer")
+@patch("splunk_otel.sidecar.start_thread_context_tracking", MagicMock())
+@patch("splunk_otel.sidecar._ThreadStatePublisher")
+def test_start_shared_context_publishes_on_short_fixed_interval(mock_publisher, mock_timer):
+    assert start_shared_context() is mock_publisher.return_value
+    mock_timer.assert_called_once_with(_PUBLISH_INTERVAL_MILLIS, mock_publisher.return_value.publish)
+    mock_timer.return_value.start.assert_called_once()
+
+
+@patch("splunk_otel.sidecar.subprocess")
+def test_py_spy_stacktraces(mock_subprocess):
+    mock_subprocess.run.return_value = MagicMock(
+        returncode=0,
+        stdout=json.dumps(
+            [
+                {
+                    "thread_id": 140000000000001,
+                    "frames": [
+                        {"name": "handler", "filename": "/app/views.py", "line": 12},
+                        {"name": "<module>", "filename": "/app/main.py", "line": 3},
+                    ],
+                }
+            ]
+        ),
+    )
+
+    stacktraces = _py_spy_stacktraces(4242)
+
+    assert stacktraces == [
+        {"tid": 140000000000001, "frames": [("/app/main.py", "<module>", 3), ("/app/views.py", "handler", 12)]}
+    ]
+    assert mock_subprocess.run.call_args.args[0][:4] == ["py-spy", "dump", "--pid", "4242"]
+
+
+@patch("splunk_otel.sidecar.subprocess")
+def test_py_spy_stacktraces_when_process_is_gone(mock_subprocess):
+    mock_subprocess.run.return_value = MagicMock(returncode=1, stderr="no such process")
+
+    assert _py_spy_stacktraces(4242) is None
+
+
+class TestSidecarProfiler:
+    def test_labels_stacks_with_published_trace_context(self):
+        scraper = MagicMock()
+        reader = MagicMock()
+        reader.read.return_value = {1: (_TRACE_ID, _SPAN_ID)}
+        stacks = [{"tid": 1, "frames": [("a.py", "a", 1)]}, {"tid": 2, "frames": [("b.py", "b", 1)]}]
+        profiler = _SidecarProfiler(4242, scraper, reader, lambda _pid: stacks)
+
+        assert profiler.tick()
+
+        [emitted] = scraper.emit.call_args.args
+        assert emitted[0]["trace_context"] == (_TRACE_ID, _SPAN_ID)
+        assert "trace_context" not in emitted[1]
+        assert all("time_seconds" in stacktrace for stacktrace in emitted)
+
+    def test_stops_when_process_is_gone(self):
+        scraper = MagicMock()
+        profiler = _SidecarProfiler(4242, scraper, None, lambda _pid: None)
+
+        assert not profiler.tick()
+        scraper.emit.assert_not_called()
+
+
+@patch("splunk_otel.sidecar.start_shared_context")
+def test_start_shared_context_if_enabled(mock_start):
+    _start_shared_context_if_enabled(Env({}))
+    mock_start.assert_not_called()
+
+    env = Env({"SPLUNK_PROFILER_SHARED_CONTEXT_ENABLED": "true"})
+    _start_shared_context_if_enabled(env)
+    mock_start.assert_called_once_with()
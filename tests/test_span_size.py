@@ -0,0 +1,154 @@
+# Copyright Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from unittest.mock import MagicMock, patch
+
+from opentelemetry.sdk.metrics import MeterProvider
+from opentelemetry.sdk.metrics.export import InMemoryMetricReader
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+from splunk_otel.env import Env
+from splunk_otel.span_size import SpanSizeSpanProcessor, _estimate_size, _get_export_span_processor
+
+
+def _mk_provider(reader=None, **kwargs):
+    exporter = InMemorySpanExporter()
+    with patch("splunk_otel.span_size.get_meter", MeterProvider(metric_readers=[reader] if reader else []).get_meter):
+        processor = SpanSizeSpanProcessor(SimpleSpanProcessor(exporter), **kwargs)
+    provider = TracerProvider()
+    provider.add_span_processor(processor)
+    return provider, exporter
+
+
+def _metrics(reader):
+    return {
+        metric.name: metric.data.data_points
+        for resource_metrics in reader.get_metrics_data().resource_metrics
+        for scope_metrics in resource_metrics.scope_metrics
+        for metric in scope_metrics.metrics
+    }
+
+
+def test_estimate_grows_with_attributes_and_events():
+    provider, exporter = _mk_provider()
+    tracer = provider.get_tracer("test")
+    with tracer.start_as_current_span("small"):
+        pass
+    with tracer.start_as_current_span("large", attributes={"payload": "x" * 1000}) as span:
+        span.add_event("event", {"detail": "y" * 500})
+
+    small, large = exporter.get_finished_spans()
+    assert _estimate_size(small) < 100
+    assert _estimate_size(large) > _estimate_size(small) + 1500
+
+
+def test_passes_spans_within_budget_unchanged():
+    provider, exporter = _mk_provider(max_bytes=1000)
+    with provider.get_tracer("test").start_as_current_span("span", attributes={"key": "value"}) as span:
+        span.add_event("event")
+
+    (exported,) = exporter.get_finished_spans()
+    assert exported.attributes == {"key": "value"}
+    assert len(exported.events) == 1
+    assert exported.dropped_attributes == 0
+    assert exported.dropped_events == 0
+
+
+def _export_trimmed(max_bytes):
+    provider, exporter = _mk_provider(max_bytes=max_bytes)
+    with provider.get_tracer("test").start_as_current_span(
+        "span", attributes={"big": "b" * 400, "medium": "m" * 200, "small": "s"}
+    ) as span:
+        span.add_event("large event", {"detail": "d" * 300})
+        span.add_event("small event")
+    (exported,) = exporter.get_finished_spans()
+    assert _estimate_size(exported) <= max_bytes
+    assert exported.name == "span"
+    assert exported.instrumentation_scope.name == "test"
+    return exported
+
+
+def test_trims_largest_events_first():
+    exported = _export_trimmed(800)
+
+    assert [event.name for event in exported.events] == ["small event"]
+    assert exported.dropped_events == 1
+    assert len(exported.attributes) == 3
+    assert exported.dropped_attributes == 0
+
+
+def test_trims_largest_attributes_after_events():
+    exported = _export_trimmed(600)
+
+    assert list(exported.events) == []
+    assert exported.dropped_events == 2
+    assert dict(exported.attributes) == {"medium": "m" * 200, "small": "s"}
+    assert exported.dropped_attributes == 1
+
+
+def test_reports_sizes_and_trimmed_spans_per_scope():
+    reader = InMemoryMetricReader()
+    provider, _ = _mk_provider(reader, max_bytes=500, report_sizes=True)
+    with provider.get_tracer("http").start_as_current_span("request", attributes={"body": "x" * 1000}):
+        pass
+    with provider.get_tracer("db").start_as_current_span("query"):
+        pass
+
+    metrics = _metrics(reader)
+    sizes = {point.attributes["otel.scope.name"]: point for point in metrics["splunk.span.size"]}
+    assert sizes["http"].count == 1
+    assert sizes["http"].sum > 1000
+    assert sizes["db"].count == 1
+    assert sizes["db"].sum < 100
+    trimmed = {point.attributes["otel.scope.name"]: point.value for point in metrics["splunk.span.trimmed"]}
+    assert trimmed == {"http": 1}
+
+
+def test_delegates_flush_and_shutdown():
+    delegate = MagicMock()
+    processor = SpanSizeSpanProcessor(delegate)
+
+    processor.force_flush(100)
+    processor.shutdown()
+
+    delegate.force_flush.assert_called_once_with(100)
+    delegate.shutdown.assert_called_once()
+
+
+def test_export_span_processor_disabled_by_default():
+    assert _get_export_span_processor(Env({})) is None
+
+
+def test_export_span_processor_from_env():
+    mk_processor = _get_export_span_processor(Env({"SPLUNK_SPAN_MAX_BYTES": "4096"}))
+    processor = mk_processor(InMemorySpanExporter())
+    try:
+        assert isinstance(processor, SpanSizeSpanProcessor)
+        assert isinstance(processor._delegate, BatchSpanProcessor)  # noqa SLF001
+        assert processor._max_bytes == 4096  # noqa SLF001
+        assert processor._size_histogram is None  # noqa SLF001
+    finally:
+        processor.shutdown()
+
+
+def test_export_span_processor_ignores_negative_budget(caplog):
+    env = Env({"SPLUNK_SPAN_MAX_BYTES": "-1", "SPLUNK_SPAN_SIZE_METRICS_ENABLED": "true"})
+    mk_delegate = MagicMock()
+    processor = _get_export_span_processor(env, mk_delegate)(InMemorySpanExporter())
+
+    assert processor._max_bytes == 0  # noqa SLF001
+    assert processor._delegate is mk_delegate.return_value  # noqa SLF001
+    assert "SPLUNK_SPAN_MAX_BYTES" in caplog.text
@@ -0,0 +1,213 @@
+# Copyright Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import random
+from unittest.mock import MagicMock
+
+from opentelemetry import trace
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+from opentelemetry.sdk.trace.id_generator import RandomIdGenerator
+from opentelemetry.sdk.trace.sampling import Decision
+from opentelemetry.trace import Status, StatusCode
+
+from splunk_otel.env import Env
+from splunk_otel.sampling import ThroughputSampler, _threshold
+from splunk_otel.tail_retention import TailRetentionSpanProcessor, _get_export_span_processor, _parse_attributes
+
+
+class _TraceIds(RandomIdGenerator):
+    def __init__(self, trace_ids):
+        self._trace_ids = iter(trace_ids)
+
+    def generate_trace_id(self) -> int:
+        return next(self._trace_ids)
+
+
+def _mk_tracer(trace_ids=None, **kwargs):
+    exporter = InMemorySpanExporter()
+    processor = TailRetentionSpanProcessor(SimpleSpanProcessor(exporter), **{"keep_probability": 0, **kwargs})
+    provider = TracerProvider(id_generator=_TraceIds(trace_ids) if trace_ids else None)
+    provider.add_span_processor(processor)
+    return provider.get_tracer("test"), exporter, processor
+
+
+def _exported_names(exporter):
+    return [span.name for span in exporter.get_finished_spans()]
+
+
+def test_drops_fast_successful_trace():
+    tracer, exporter, _ = _mk_tracer()
+
+    with tracer.start_as_current_span("root"), tracer.start_as_current_span("child"):
+        pass
+
+    assert _exported_names(exporter) == []
+
+
+def test_keeps_trace_with_failed_span():
+    tracer, exporter, _ = _mk_tracer()
+
+    with tracer.start_as_current_span("root"):
+        with tracer.start_as_current_span("child") as child:
+            child.set_status(Status(StatusCode.ERROR))
+        with tracer.start_as_current_span("sibling"):
+            pass
+
+    assert _exported_names(exporter) == ["child", "sibling", "root"]
+
+
+def test_keeps_slow_trace():
+    tracer, exporter, _ = _mk_tracer(latency_threshold_millis=100)
+
+    tracer.start_span("fast", start_time=0).end(end_time=99_000_000)
+    tracer.start_span("slow", start_time=0).end(end_time=100_000_000)
+
+    assert _exported_names(exporter) == ["slow"]
+
+
+def test_keeps_trace_with_matching_attribute():
+    tracer, exporter, _ = _mk_tracer(attributes={"tenant": "gold", "debug": None})
+
+    for name, attributes in (
+        ("silver", {"tenant": "silver"}),
+        ("gold", {"tenant": "gold"}),
+        ("debug", {"debug": False}),
+    ):
+        with tracer.start_as_current_span(name, attributes=attributes):
+            pass
+
+    assert _exported_names(exporter) == ["gold", "debug"]
+
+
+def test_keep_probability_is_decided_by_trace_id():
+    tracer, exporter, _ = _mk_tracer(trace_ids=[(1 << 55) - 1, 1 << 55, (0xFF << 56) | 1], keep_probability=0.5)
+
+    for name in ("low", "high", "low_with_high_bits"):
+        with tracer.start_as_current_span(name):
+            pass
+
+    assert _exported_names(exporter) == ["high"]
+
+
+def test_keep_probability_applies_to_traces_the_head_sampler_kept():
+    now = [0.0]
+    sampler = ThroughputSampler(500, time_func=lambda: now[0])
+    for trace_id in range(1000):
+        sampler.should_sample(None, trace_id, "warmup")
+    now[0] = 1.0  # 1000 traces in the first second, so the head sampler keeps about half of them from now on
+
+    rng = random.Random(42)
+    trace_ids = [rng.getrandbits(128) for _ in range(20000)]
+    sampled = [
+        trace_id
+        for trace_id in trace_ids
+        if sampler.should_sample(None, trace_id, "root").decision is Decision.RECORD_AND_SAMPLE
+    ]
+    tracer, exporter, _ = _mk_tracer(trace_ids=sampled, keep_probability=0.1)
+    for _ in sampled:
+        with tracer.start_as_current_span("root"):
+            pass
+
+    # the traces kept are a tenth of all traces, i.e. a fifth of those the head sampler kept
+    assert 0.45 < len(sampled) / len(trace_ids) < 0.55
+    assert 0.09 < len(exporter.get_finished_spans()) / len(trace_ids) < 0.11
+
+
+def test_spans_ending_after_local_root_follow_decision():
+    tracer, exporter, _ = _mk_tracer()
+
+    root = tracer.start_span("root")
+    root.set_status(Status(StatusCode.ERROR))
+    late = tracer.start_span("late", context=trace.set_span_in_context(root))
+    root.end()
+    late.end()
+
+    assert _exported_names(exporter) == ["root", "late"]
+
+
+def test_decides_oldest_trace_early_when_full():
+    tracer, exporter, _ = _mk_tracer(max_spans=1)
+
+    first = tracer.start_span("first")
+    first_child = tracer.start_span("first_child", context=trace.set_span_in_context(first))
+    first_child.set_status(Status(StatusCode.ERROR))
+    first_child.end()
+    with tracer.start_as_current_span("second"), tracer.start_as_current_span("second_child"):
+        pass
+
+    assert _exported_names(exporter) == ["first_child"]
+
+    first.end()
+
+    assert _exported_names(exporter) == ["first_child", "first"]
+
+
+def test_shutdown_decides_buffered_traces():
+    tracer, exporter, processor = _mk_tracer()
+    root = tracer.start_span("root")
+    child = tracer.start_span("child", context=trace.set_span_in_context(root))
+    child.set_status(Status(StatusCode.ERROR))
+    child.end()
+
+    processor.shutdown()
+
+    assert _exported_names(exporter) == ["child"]
+
+
+def test_force_flush_delegates():
+    delegate = MagicMock()
+    processor = TailRetentionSpanProcessor(delegate)
+
+    processor.force_flush(100)
+
+    delegate.force_flush.assert_called_once_with(100)
+
+
+def test_parse_attributes():
+    assert _parse_attributes("tenant=gold, debug ,,http.route = /checkout") == {
+        "tenant": "gold",
+        "debug": None,
+        "http.route": "/checkout",
+    }
+
+
+def test_export_span_processor_is_none_when_disabled():
+    assert _get_export_span_processor(Env({})) is None
+
+
+def test_export_span_processor_wraps_batch_span_processor():
+    factory = _get_export_span_processor(
+        Env({"SPLUNK_TAIL_RETENTION_ENABLED": "true", "SPLUNK_TAIL_RETENTION_KEEP_PROBABILITY": "2"})
+    )
+
+    processor = factory(InMemorySpanExporter())
+    try:
+        assert isinstance(processor, TailRetentionSpanProcessor)
+        assert isinstance(processor._delegate, BatchSpanProcessor)  # noqa SLF001
+        assert processor._keep_threshold == _threshold(0.1)  # noqa SLF001
+    finally:
+        processor.shutdown()
+
+
+def test_export_span_processor_wraps_given_delegate():
+    mk_delegate = MagicMock()
+    factory = _get_export_span_processor(Env({"SPLUNK_TAIL_RETENTION_ENABLED": "true"}), mk_delegate)
+
+    exporter = InMemorySpanExporter()
+    processor = factory(exporter)
+
+    mk_delegate.assert_called_once_with(exporter)
+    assert processor._delegate is mk_delegate.return_value  # noqa SLF001
@@ -0,0 +1,431 @@
+"""Benchmark Splunk OpenTelemetry Python overhead.
+
+Runs micro- and end-to-end benchmarks and writes the results as JSON so they can
+be compared between releases, e.g.:
+
+    python tools/benchmark.py --output before.json
+    python tools/benchmark.py --output after.json --compare before.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+
+DEFAULT_THREAD_COUNTS = (1, 10, 100, 1000)
+DEFAULT_STACK_DEPTHS = (10, 50, 100, 200)
+DEFAULT_REPEAT = 5
+DEFAULT_REQUESTS = 2000
+DEFAULT_REGRESSION_THRESHOLD = 1.25
+
+PROFILING_MODES = ("off", "continuous", "snapshot")
+
+
+def measure(func: Callable[[], Any], iterations: int, repeat: int) -> dict[str, float | int]:
+    """Time `func` in `repeat` rounds of `iterations` calls and return per-call stats in microseconds."""
+    per_call_us = []
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        for _ in range(iterations):
+            func()
+        elapsed = time.perf_counter_ns() - start
+        per_call_us.append(elapsed / iterations / 1e3)
+    return {
+        "iterations": iterations,
+        "repeat": repeat,
+        "mean_us": statistics.fmean(per_call_us),
+        "median_us": statistics.median(per_call_us),
+        "min_us": min(per_call_us),
+        "stdev_us": statistics.stdev(per_call_us) if len(per_call_us) > 1 else 0.0,
+    }
+
+
+def result(benchmark: str, params: dict[str, Any], stats: dict[str, float | int]) -> dict[str, Any]:
+    return {"benchmark": benchmark, "params": params, **stats}
+
+
+class ParkedThreads:
+    """Starts `count` threads that each block at a stack depth of `depth` frames until stopped."""
+
+    def __init__(self, count: int, depth: int):
+        self.count = count
+        self.depth = depth
+        self.ready = threading.Barrier(count + 1)
+        self.release = threading.Event()
+        self.threads = [threading.Thread(target=self._descend, args=(depth,), daemon=True) for _ in range(count)]
+
+    def __enter__(self):
+        for thread in self.threads:
+            thread.start()
+        self.ready.wait()
+        return self
+
+    def __exit__(self, *_exc) -> None:
+        self.release.set()
+        for thread in self.threads:
+            thread.join()
+
+    def _descend(self, remaining: int) -> None:
+        if remaining > 0:
+            self._descend(remaining - 1)
+            return
+        self.ready.wait()
+        self.release.wait()
+
+
+def bench_profiler(thread_counts: Iterable[int], depths: Iterable[int], repeat: int) -> list[dict[str, Any]]:
+    from opentelemetry import context, trace
+
+    from splunk_otel import profile
+
+    out = []
+    for thread_count in thread_counts:
+        for depth in depths:
+            params = {"threads": thread_count, "depth": depth}
+            iterations = max(1, 2000 // (thread_count * max(1, depth // 10)))
+            with ParkedThreads(thread_count, depth) as parked:
+                thread_states = {
+                    thread.ident: (0x0AF7651916CD43DD8448EB211C80319C, 0xB7AD6B7169203331) for thread in parked.threads
+                }
+                out.append(
+                    result(
+                        "collect_stacktraces",
+                        params,
+                        measure(profile._collect_stacktraces, iterations, repeat),  # noqa: SLF001
+                    )
+                )
+                stacktraces = profile._collect_stacktraces()  # noqa: SLF001
+
+            def to_profile(stacktraces=stacktraces, thread_states=thread_states):
+                return profile._stacktraces_to_cpu_profile(stacktraces, thread_states, 10, time.time())  # noqa: SLF001
+
+            out.append(result("stacktraces_to_cpu_profile", params, measure(to_profile, iterations, repeat)))
+
+            pb_profile = to_profile()
+            out.append(
+                result(
+                    "pb_profile_to_str",
+                    params,
+                    measure(lambda pb_profile=pb_profile: profile._pb_profile_to_str(pb_profile), iterations, repeat),  # noqa: SLF001
+                )
+            )
+
+    span = trace.NonRecordingSpan(
+        trace.SpanContext(trace_id=1, span_id=2, is_remote=False, trace_flags=trace.TraceFlags(0x01))
+    )
+    ctx = trace.set_span_in_context(span)
+    attach = getattr(context.attach, "__wrapped__", context.attach)
+    detach = getattr(context.detach, "__wrapped__", context.detach)
+
+    def attach_detach_unwrapped():
+        detach(attach(ctx))
+
+    def attach_detach_wrapped():
+        token = profile._wrap_context_attach(attach, None, (ctx,), {})  # noqa: SLF001
+        profile._wrap_context_detach(detach, None, (token,), {})  # noqa: SLF001
+
+    iterations = 20000
+    out.append(
+        result("context_attach_detach", {"wrapped": False}, measure(attach_detach_unwrapped, iterations, repeat))
+    )
+    out.append(result("context_attach_detach", {"wrapped": True}, measure(attach_detach_wrapped, iterations, repeat)))
+    return out
+
+
+def make_wsgi_app(tracer):
+    from opentelemetry import baggage, context
+
+    from splunk_otel.propagator import _SPLUNK_TRACE_SNAPSHOT_VOLUME
+
+    def app(environ, start_response):
+        parent = baggage.set_baggage(_SPLUNK_TRACE_SNAPSHOT_VOLUME, environ["bench.snapshot.volume"], context.Context())
+        with tracer.start_as_current_span("GET /bench", context=parent):
+            total = 0
+            for i in range(2000):
+                total += i * i
+            body = str(total).encode()
+        start_response("200 OK", [("Content-Type", "text/plain"), ("Content-Length", str(len(body)))])
+        return [body]
+
+    return app
+
+
+def bench_wsgi(mode: str, requests: int, repeat: int, interval_millis: int) -> dict[str, Any]:
+    from wsgiref.util import setup_testing_defaults
+
+    from opentelemetry.sdk.trace import TracerProvider
+
+    from splunk_otel.callgraphs.span_processor import CallgraphsSpanProcessor
+    from splunk_otel.profile import ProfilingContext
+
+    tracer_provider = TracerProvider()
+    profiling_context = None
+    environ: dict[str, Any] = {"bench.snapshot.volume": "off"}
+    setup_testing_defaults(environ)
+
+    if mode == "continuous":
+        profiling_context = ProfilingContext("benchmark", interval_millis)
+        profiling_context.start()
+    elif mode == "snapshot":
+        processor = CallgraphsSpanProcessor("benchmark", interval_millis)
+        tracer_provider.add_span_processor(processor)
+        environ["bench.snapshot.volume"] = "highest"
+
+    app = make_wsgi_app(tracer_provider.get_tracer("benchmark"))
+
+    def start_response(_status, _headers):
+        return None
+
+    def handle_request():
+        for _ in app(environ, start_response):
+            pass
+
+    try:
+        stats = measure(handle_request, requests, repeat)
+    finally:
+        if profiling_context is not None:
+            profiling_context.stop()
+        tracer_provider.shutdown()
+
+    return result("wsgi_request", {"profiling": mode, "interval_millis": interval_millis}, stats)
+
+
+def bench_samplers(repeat: int) -> list[dict[str, Any]]:
+    import random
+
+    from opentelemetry.sdk.trace.sampling import ALWAYS_ON, ParentBasedTraceIdRatio
+
+    from splunk_otel.sampling import AdjustableSampler, ThroughputSampler
+
+    samplers = {
+        "always_on": ALWAYS_ON,
+        "parentbased_traceidratio": ParentBasedTraceIdRatio(0.1),
+        "splunk_adjustable": AdjustableSampler(0.1),
+        "splunk_adjustable_rate_limited": AdjustableSampler(0.1, 100),
+        "splunk_throughput": ThroughputSampler(100),
+    }
+    rng = random.Random(0)  # noqa: S311
+    trace_ids = [rng.getrandbits(128) for _ in range(1024)]
+    iterations = 20000
+
+    out = []
+    for name, sampler in samplers.items():
+        ids = iter(trace_ids * (iterations // len(trace_ids) + 1) * repeat)
+
+        def should_sample(sampler=sampler, ids=ids):
+            sampler.should_sample(None, next(ids), "span")
+
+        out.append(result("sampler_should_sample", {"sampler": name}, measure(should_sample, iterations, repeat)))
+    return out
+
+
+def run_sampler_suite(args: argparse.Namespace) -> list[dict[str, Any]]:
+    return bench_samplers(args.repeat)
+
+
+def bench_logging_handlers(repeat: int) -> list[dict[str, Any]]:
+    import logging
+
+    from opentelemetry.instrumentation.logging.handler import LoggingHandler
+    from opentelemetry.sdk._logs import LoggerProvider
+    from opentelemetry.sdk._logs.export import BatchLogRecordProcessor, LogRecordExportResult
+
+    from splunk_otel.log_handler import AsyncLoggingHandler
+
+    class DiscardingExporter:
+        def export(self, _batch):
+            return LogRecordExportResult.SUCCESS
+
+        def shutdown(self):
+            pass
+
+        def force_flush(self, _timeout_millis=30000):
+            return True
+
+    iterations = 20000
+    out = []
+    for name in ("stock", "async"):
+        logger_provider = LoggerProvider(shutdown_on_exit=False)
+        logger_provider.add_log_record_processor(BatchLogRecordProcessor(DiscardingExporter()))
+        if name == "stock":
+            handler = LoggingHandler(logger_provider=logger_provider)
+        else:
+            # large enough that no record is dropped, so both handlers do the same work
+            handler = AsyncLoggingHandler(logger_provider=logger_provider, max_queue_size=iterations * repeat)
+        logger = logging.getLogger(f"benchmark.{name}")
+        logger.handlers = [handler]
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+        try:
+            out.append(
+                result(
+                    "logging_handler_emit",
+                    {"handler": name},
+                    measure(lambda logger=logger: logger.info("request %s handled", "abc"), iterations, repeat),
+                )
+            )
+        finally:
+            handler.close()
+            logger_provider.shutdown()
+    return out
+
+
+def run_logging_suite(args: argparse.Namespace) -> list[dict[str, Any]]:
+    return bench_logging_handlers(args.repeat)
+
+
+def run_profiler_suite(args: argparse.Namespace) -> list[dict[str, Any]]:
+    out = bench_profiler(args.threads, args.depths, args.repeat)
+    # "off" must run first whatever order the modes were given in: enabling a profiling mode permanently wraps
+    # opentelemetry.context.attach/detach, so a later "off" run would measure the wrapped functions
+    modes = sorted(set(args.profiling_modes), key=PROFILING_MODES.index)
+    out.extend(bench_wsgi(mode, args.requests, args.repeat, args.interval) for mode in modes)
+    return out
+
+
+SUITES: dict[str, Callable[[argparse.Namespace], list[dict[str, Any]]]] = {
+    "logging": run_logging_suite,
+    "profiler": run_profiler_suite,
+    "sampler": run_sampler_suite,
+}
+
+
+def environment_metadata() -> dict[str, Any]:
+    from splunk_otel.__about__ import __version__
+
+    return {
+        "splunk_otel_version": __version__,
+        "python_version": platform.python_version(),
+        "python_implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "timestamp": int(time.time()),
+    }
+
+
+def result_key(item: dict[str, Any]) -> str:
+    return item["benchmark"] + json.dumps(item["params"], sort_keys=True)
+
+
+def compare(current: list[dict[str, Any]], baseline: list[dict[str, Any]], threshold: float) -> list[dict[str, Any]]:
+    """Return the benchmarks whose median got slower than `threshold` times the baseline median."""
+    baseline_by_key = {result_key(item): item for item in baseline}
+    regressions = []
+    for item in current:
+        base = baseline_by_key.get(result_key(item))
+        if base is None or base["median_us"] <= 0:
+            continue
+        ratio = item["median_us"] / base["median_us"]
+        if ratio > threshold:
+            regressions.append(
+                {
+                    "benchmark": item["benchmark"],
+                    "params": item["params"],
+                    "baseline_median_us": base["median_us"],
+                    "median_us": item["median_us"],
+                    "ratio": ratio,
+                }
+            )
+    return regressions
+
+
+def parse_int_list(value: str) -> list[int]:
+    return [int(item) for item in value.split(",") if item.strip()]
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--suite",
+        action="append",
+        choices=sorted(SUITES),
+        help="Benchmark suite to run. May be repeated. Defaults to all suites.",
+    )
+    parser.add_argument(
+        "--threads",
+        type=parse_int_list,
+        default=list(DEFAULT_THREAD_COUNTS),
+        help="Comma-separated thread counts for the profiler micro-benchmarks.",
+    )
+    parser.add_argument(
+        "--depths",
+        type=parse_int_list,
+        default=list(DEFAULT_STACK_DEPTHS),
+        help="Comma-separated stack depths for the profiler micro-benchmarks.",
+    )
+    parser.add_argument(
+        "--profiling-modes",
+        type=lambda value: [mode for mode in value.split(",") if mode],
+        default=list(PROFILING_MODES),
+        help="Comma-separated profiling modes for the WSGI benchmark: off, continuous, snapshot.",
+    )
+    parser.add_argument(
+        "--interval",
+        type=int,
+        default=10,
+        help="Sampling interval in milliseconds used by the WSGI benchmark's profiling modes.",
+    )
+    parser.add_argument("--requests", type=int, default=DEFAULT_REQUESTS, help="WSGI requests per round.")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="Rounds per benchmark.")
+    parser.add_argument("--output", default="-", help="Output file path, or '-' for stdout.")
+    parser.add_argument("--compare", type=Path, default=None, help="Baseline results file to compare against.")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_REGRESSION_THRESHOLD,
+        help="Median slowdown ratio above which --compare reports a regression.",
+    )
+    args = parser.parse_args(argv)
+    unknown_modes = set(args.profiling_modes) - set(PROFILING_MODES)
+    if unknown_modes:
+        parser.error(f"unknown profiling modes: {', '.join(sorted(unknown_modes))}")
+    return args
+
+
+def run(args: argparse.Namespace) -> dict[str, Any]:
+    results = []
+    for suite in args.suite or list(SUITES):
+        results.extend(SUITES[suite](args))
+    out: dict[str, Any] = {"metadata": environment_metadata(), "results": results}
+    if args.compare is not None:
+        baseline = json.loads(args.compare.read_text())
+        out["regressions"] = compare(results, baseline["results"], args.threshold)
+    return out
+
+
+def write_output(output: str, data: dict[str, Any]) -> None:
+    text = json.dumps(data, indent=2) + "\n"
+    if output == "-":
+        sys.stdout.write(text)
+        return
+    path = Path(output)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    data = run(args)
+    write_output(args.output, data)
+    regressions = data.get("regressions", [])
+    for regression in regressions:
+        sys.stderr.write(
+            f"regression: {regression['benchmark']} {json.dumps(regression['params'], sort_keys=True)} "
+            f"{regression['ratio']:.2f}x slower\n"
+        )
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
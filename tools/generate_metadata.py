@@ -281,6 +281,134 @@ SETTINGS: list[dict[str, str]] = [
         "type": TYPE_STRING,
         "category": SETTING_SAMPLER,
     },
+    {
+        "property": "splunk.traces.sampler.rate.limit",
+        "env": "SPLUNK_TRACES_SAMPLER_RATE_LIMIT",
+        "description": "Maximum number of new traces sampled per second by the splunk_adjustable sampler. 0 means no limit.",
+        "default": "0",
+        "type": TYPE_DOUBLE,
+        "category": SETTING_SAMPLER,
+    },
+    {
+        "property": "splunk.traces.sampler.target.rate",
+        "env": "SPLUNK_TRACES_SAMPLER_TARGET_RATE",
+        "description": "Number of new traces the splunk_throughput sampler aims to sample per second.",
+        "default": "10",
+        "type": TYPE_DOUBLE,
+        "category": SETTING_SAMPLER,
+    },
+    {
+        "property": "splunk.performance.profile",
+        "env": "SPLUNK_PERFORMANCE_PROFILE",
+        "description": "Preset of sampler, batch processor, span limit, profiler interval and compression defaults: low-overhead, balanced or high-fidelity. Settings set explicitly take precedence.",
+        "default": "",
+        "type": TYPE_STRING,
+        "category": SETTING_GENERAL,
+    },
+    {
+        "property": "splunk.tail.retention.enabled",
+        "env": "SPLUNK_TAIL_RETENTION_ENABLED",
+        "description": "Holds spans per trace and only exports the traces that match a retention policy, plus a probabilistic share of the others.",
+        "default": "false",
+        "type": TYPE_BOOLEAN,
+        "category": SETTING_SAMPLER,
+    },
+    {
+        "property": "splunk.tail.retention.latency.threshold",
+        "env": "SPLUNK_TAIL_RETENTION_LATENCY_THRESHOLD",
+        "description": "Duration in milliseconds from which the local root span of a trace is slow enough for tail retention to keep the trace.",
+        "default": "1000",
+        "type": TYPE_INT,
+        "category": SETTING_SAMPLER,
+    },
+    {
+        "property": "splunk.tail.retention.attributes",
+        "env": "SPLUNK_TAIL_RETENTION_ATTRIBUTES",
+        "description": "Comma-separated span attributes, as key or key=value, that make tail retention keep a trace.",
+        "default": "",
+        "type": TYPE_STRING,
+        "category": SETTING_SAMPLER,
+    },
+    {
+        "property": "splunk.tail.retention.keep.probability",
+        "env": "SPLUNK_TAIL_RETENTION_KEEP_PROBABILITY",
+        "description": "Probability that tail retention keeps a trace that matches no policy.",
+        "default": "0.1",
+        "type": TYPE_DOUBLE,
+        "category": SETTING_SAMPLER,
+    },
+    {
+        "property": "splunk.tail.retention.max.spans",
+        "env": "SPLUNK_TAIL_RETENTION_MAX_SPANS",
+        "description": "Maximum number of spans held by tail retention before the oldest traces are decided early.",
+        "default": "10000",
+        "type": TYPE_INT,
+        "category": SETTING_SAMPLER,
+    },
+    {
+        "property": "splunk.span.max.bytes",
+        "env": "SPLUNK_SPAN_MAX_BYTES",
+        "description": "Estimated encoded size above which spans lose their largest events, then their largest attributes, before export. 0 means no limit.",
+        "default": "0",
+        "type": TYPE_INT,
+        "category": SETTING_LIMITS,
+    },
+    {
+        "property": "splunk.span.size.metrics.enabled",
+        "env": "SPLUNK_SPAN_SIZE_METRICS_ENABLED",
+        "description": "Reports the estimated encoded size of exported spans per instrumentation scope in the splunk.span.size histogram.",
+        "default": "false",
+        "type": TYPE_BOOLEAN,
+        "category": SETTING_LIMITS,
+    },
+    {
+        "property": "splunk.logs.async.handler.enabled",
+        "env": "SPLUNK_LOGS_ASYNC_HANDLER_ENABLED",
+        "description": "Replaces the logging handler with one that queues records and emits them on a worker thread.",
+        "default": "false",
+        "type": TYPE_BOOLEAN,
+        "category": SETTING_INSTRUMENTATION,
+    },
+    {
+        "property": "splunk.logs.async.handler.queue.size",
+        "env": "SPLUNK_LOGS_ASYNC_HANDLER_QUEUE_SIZE",
+        "description": "Maximum number of log records waiting in the asynchronous logging handler before new records are dropped.",
+        "default": "2048",
+        "type": TYPE_INT,
+        "category": SETTING_INSTRUMENTATION,
+    },
+    {
+        "property": "splunk.logs.sampling.enabled",
+        "env": "SPLUNK_LOGS_SAMPLING_ENABLED",
+        "description": "Drops log records of unsampled traces and caps log records emitted outside of traces.",
+        "default": "false",
+        "type": TYPE_BOOLEAN,
+        "category": SETTING_SAMPLER,
+    },
+    {
+        "property": "splunk.logs.sampling.min.severity",
+        "env": "SPLUNK_LOGS_SAMPLING_MIN_SEVERITY",
+        "description": "Severity (TRACE, DEBUG, INFO, WARN, ERROR or FATAL) from which log records are always kept by log sampling.",
+        "default": "WARN",
+        "type": TYPE_STRING,
+        "category": SETTING_SAMPLER,
+    },
+    {
+        "property": "splunk.logs.sampling.unsampled.probability",
+        "env": "SPLUNK_LOGS_SAMPLING_UNSAMPLED_PROBABILITY",
+        "description": "Probability that log sampling keeps the log records of an unsampled trace.",
+        "default": "0",
+        "type": TYPE_DOUBLE,
+        "category": SETTING_SAMPLER,
+    },
+    {
+        "property": "splunk.logs.sampling.uncorrelated.rate.limit",
+        "env": "SPLUNK_LOGS_SAMPLING_UNCORRELATED_RATE_LIMIT",
+        "description": "Maximum number of log records emitted outside of traces that log sampling keeps per second. 0 means no limit.",
+        "default": "0",
+        "type": TYPE_DOUBLE,
+        "category": SETTING_SAMPLER,
+    },
     {
         "property": "splunk.trace-response-header.enabled",
         "env": "SPLUNK_TRACE_RESPONSE_HEADER_ENABLED",
@@ -329,6 +457,150 @@ SETTINGS: list[dict[str, str]] = [
         "type": TYPE_STRING,
         "category": SETTING_PROFILING,
     },
+    {
+        "property": "splunk.profiler.flight.recorder.enabled",
+        "env": "SPLUNK_PROFILER_FLIGHT_RECORDER_ENABLED",
+        "description": "Activates the in-memory flight recorder of recent stack samples.",
+        "default": "false",
+        "type": TYPE_BOOLEAN,
+        "category": SETTING_PROFILING,
+    },
+    {
+        "property": "splunk.profiler.flight.recorder.window",
+        "env": "SPLUNK_PROFILER_FLIGHT_RECORDER_WINDOW",
+        "description": "Seconds of stack samples kept in memory by the flight recorder.",
+        "default": "30",
+        "type": TYPE_DOUBLE,
+        "category": SETTING_PROFILING,
+    },
+    {
+        "property": "splunk.profiler.flight.recorder.interval",
+        "env": "SPLUNK_PROFILER_FLIGHT_RECORDER_INTERVAL",
+        "description": "Frequency in milliseconds for flight recorder stack sample collection.",
+        "default": "10",
+        "type": TYPE_INT,
+        "category": SETTING_PROFILING,
+    },
+    {
+        "property": "splunk.profiler.flight.recorder.span.threshold",
+        "env": "SPLUNK_PROFILER_FLIGHT_RECORDER_SPAN_THRESHOLD",
+        "description": "Local root span duration in milliseconds that exports the flight recorder window. 0 disables.",
+        "default": "0",
+        "type": TYPE_INT,
+        "category": SETTING_PROFILING,
+    },
+    {
+        "property": "splunk.profiler.flight.recorder.signal",
+        "env": "SPLUNK_PROFILER_FLIGHT_RECORDER_SIGNAL",
+        "description": "Signal that exports the flight recorder window.",
+        "default": "SIGURG",
+        "type": TYPE_STRING,
+        "category": SETTING_PROFILING,
+    },
+    {
+        "property": "splunk.profiler.perf.map.enabled",
+        "env": "SPLUNK_PROFILER_PERF_MAP_ENABLED",
+        "description": "Activates the perf trampoline on startup so Linux perf can attribute samples to Python functions (Python 3.12+).",
+        "default": "false",
+        "type": TYPE_BOOLEAN,
+        "category": SETTING_PROFILING,
+    },
+    {
+        "property": "splunk.profiler.shared.context.enabled",
+        "env": "SPLUNK_PROFILER_SHARED_CONTEXT_ENABLED",
+        "description": "Publishes the trace context of each thread in shared memory for the out-of-process sidecar profiler.",
+        "default": "false",
+        "type": TYPE_BOOLEAN,
+        "category": SETTING_PROFILING,
+    },
+    {
+        "property": "splunk.profiler.exporter",
+        "env": "SPLUNK_PROFILER_EXPORTER",
+        "description": "Comma-separated list of continuous profiling exporters: otlp, hot_functions and pprof_file.",
+        "default": "otlp",
+        "type": TYPE_STRING,
+        "category": SETTING_PROFILING,
+    },
+    {
+        "property": "splunk.profiler.hot.functions.count",
+        "env": "SPLUNK_PROFILER_HOT_FUNCTIONS_COUNT",
+        "description": "Number of functions reported by the hot_functions profiler exporter.",
+        "default": "20",
+        "type": TYPE_INT,
+        "category": SETTING_PROFILING,
+    },
+    {
+        "property": "splunk.profiler.hot.functions.half.life",
+        "env": "SPLUNK_PROFILER_HOT_FUNCTIONS_HALF_LIFE",
+        "description": "Seconds after which a sample counts half as much in the hot_functions profiler exporter.",
+        "default": "60",
+        "type": TYPE_DOUBLE,
+        "category": SETTING_PROFILING,
+    },
+    {
+        "property": "splunk.profiler.pprof.file.directory",
+        "env": "SPLUNK_PROFILER_PPROF_FILE_DIRECTORY",
+        "description": "Directory the pprof_file profiler exporter writes to. Defaults to splunk-otel-profiles in the temporary directory.",
+        "default": "",
+        "type": TYPE_STRING,
+        "category": SETTING_PROFILING,
+    },
+    {
+        "property": "splunk.profiler.pprof.file.max.size",
+        "env": "SPLUNK_PROFILER_PPROF_FILE_MAX_SIZE",
+        "description": "Megabytes of pprof files kept in the directory before the oldest are removed.",
+        "default": "100",
+        "type": TYPE_INT,
+        "category": SETTING_PROFILING,
+    },
+    {
+        "property": "splunk.profiler.pprof.file.max.age",
+        "env": "SPLUNK_PROFILER_PPROF_FILE_MAX_AGE",
+        "description": "Seconds pprof files are kept in the directory.",
+        "default": "86400",
+        "type": TYPE_INT,
+        "category": SETTING_PROFILING,
+    },
+    {
+        "property": "splunk.profiler.burst.signal",
+        "env": "SPLUNK_PROFILER_BURST_SIGNAL",
+        "description": "Signal that starts a burst of high-frequency profiling.",
+        "default": "",
+        "type": TYPE_STRING,
+        "category": SETTING_PROFILING,
+    },
+    {
+        "property": "splunk.profiler.burst.socket",
+        "env": "SPLUNK_PROFILER_BURST_SOCKET",
+        "description": "Path of a Unix domain socket that accepts burst profiling commands.",
+        "default": "",
+        "type": TYPE_STRING,
+        "category": SETTING_PROFILING,
+    },
+    {
+        "property": "splunk.profiler.burst.duration",
+        "env": "SPLUNK_PROFILER_BURST_DURATION",
+        "description": "Default burst profiling duration in seconds.",
+        "default": "30",
+        "type": TYPE_DOUBLE,
+        "category": SETTING_PROFILING,
+    },
+    {
+        "property": "splunk.profiler.burst.interval",
+        "env": "SPLUNK_PROFILER_BURST_INTERVAL",
+        "description": "Default interval between stack samples during a burst, in milliseconds.",
+        "default": "5",
+        "type": TYPE_INT,
+        "category": SETTING_PROFILING,
+    },
+    {
+        "property": "splunk.profiler.span.attribute.labels",
+        "env": "SPLUNK_PROFILER_SPAN_ATTRIBUTE_LABELS",
+        "description": "Comma-separated local root span attributes added as labels to profiling samples.",
+        "default": "http.route,messaging.destination.name",
+        "type": TYPE_STRING,
+        "category": SETTING_PROFILING,
+    },
     {
         "property": "splunk.snapshot.profiler.enabled",
         "env": "SPLUNK_SNAPSHOT_PROFILER_ENABLED",
@@ -353,6 +625,84 @@ SETTINGS: list[dict[str, str]] = [
         "type": TYPE_DOUBLE,
         "category": SETTING_PROFILING,
     },
+    {
+        "property": "splunk.snapshot.selection.carrier",
+        "env": "SPLUNK_SNAPSHOT_SELECTION_CARRIER",
+        "description": (
+            "How the snapshot selection decision is propagated: `baggage`, a compact `header` sent only for "
+            "selected traces, or `both`."
+        ),
+        "default": "baggage",
+        "type": TYPE_STRING,
+        "category": SETTING_TRACE_PROPAGATION,
+    },
+    {
+        "property": "splunk.snapshot.selection.rate.limit",
+        "env": "SPLUNK_SNAPSHOT_SELECTION_RATE_LIMIT",
+        "description": "Maximum number of new traces selected for snapshot profiling per second. 0 means no limit.",
+        "default": "0",
+        "type": TYPE_DOUBLE,
+        "category": SETTING_PROFILING,
+    },
+    {
+        "property": "splunk.snapshot.max.concurrent.traces",
+        "env": "SPLUNK_SNAPSHOT_MAX_CONCURRENT_TRACES",
+        "description": "Maximum number of traces snapshot profiled at the same time per process. 0 means no limit.",
+        "default": "0",
+        "type": TYPE_INT,
+        "category": SETTING_PROFILING,
+    },
+    {
+        "property": "splunk.snapshot.profiler.trigger",
+        "env": "SPLUNK_SNAPSHOT_PROFILER_TRIGGER",
+        "description": (
+            "What triggers snapshot profiling: `selection` profiles traces selected up front, `latency` profiles "
+            "local root spans that are slow or fail."
+        ),
+        "default": "selection",
+        "type": TYPE_STRING,
+        "category": SETTING_PROFILING,
+    },
+    {
+        "property": "splunk.snapshot.latency.threshold",
+        "env": "SPLUNK_SNAPSHOT_LATENCY_THRESHOLD",
+        "description": "Minimum local root span duration in milliseconds for the latency snapshot trigger.",
+        "default": "1000",
+        "type": TYPE_INT,
+        "category": SETTING_PROFILING,
+    },
+    {
+        "property": "splunk.snapshot.bundle.enabled",
+        "env": "SPLUNK_SNAPSHOT_BUNDLE_ENABLED",
+        "description": "Emits snapshot samples as one profile per trace when the trace's local root spans end.",
+        "default": "false",
+        "type": TYPE_BOOLEAN,
+        "category": SETTING_PROFILING,
+    },
+    {
+        "property": "splunk.snapshot.bundle.timeout",
+        "env": "SPLUNK_SNAPSHOT_BUNDLE_TIMEOUT",
+        "description": "Maximum time in milliseconds snapshot samples of a trace are held before being emitted.",
+        "default": "30000",
+        "type": TYPE_INT,
+        "category": SETTING_PROFILING,
+    },
+    {
+        "property": "splunk.snapshot.max.samples.per.trace",
+        "env": "SPLUNK_SNAPSHOT_MAX_SAMPLES_PER_TRACE",
+        "description": "Maximum number of snapshot samples held per trace by bundling and the latency trigger.",
+        "default": "1000",
+        "type": TYPE_INT,
+        "category": SETTING_PROFILING,
+    },
+    {
+        "property": "splunk.snapshot.profiler.mode",
+        "env": "SPLUNK_SNAPSHOT_PROFILER_MODE",
+        "description": "How selected traces are profiled: sampling, or tracing to record exact call trees (Python 3.12+).",
+        "default": "sampling",
+        "type": TYPE_STRING,
+        "category": SETTING_PROFILING,
+    },
 ]
 
 RESOURCE_DETECTORS = [